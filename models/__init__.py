@@ -0,0 +1,27 @@
+"""
+Модели прогноза итоговой таблицы чемпионата:
+- result — предсказывает исход матча (П1, X, П2);
+- score — предсказывает счёт (распределение Пуассона);
+- score_diff — предсказывает разницу мячей.
+
+Пример использования из кода:
+
+    from models import fit, simulate, event_probability, simulate_conditional, probabilities_table
+
+    league = fit("score", "data/ITA22.xlsx")
+    team_positions, num_simulations = simulate(league, num_simulations=100000, seed=1)
+    print(probabilities_table(league["teams"], team_positions, num_simulations))
+
+    # Вероятность редкого события выборкой по значимости: «Интер» в зоне вылета
+    probability, error, _ = event_probability(league, "INT", range(18, 21), num_simulations=20000)
+
+    # «Что, если»: вероятности мест при победе «Наполи» над «Миланом» 2:1 (на общих случайных числах)
+    _, scenario_positions, errors, num_simulations = simulate_conditional(league, ["NAP MIL 2:1"])
+
+Запуск из командной строки: python -m models --help
+"""
+from .league import (
+    MODEL_TYPES, fit, fit_cached, fit_leagues, simulate, event_probability, simulate_conditional, fixture_impact, impact_table,
+    bootstrap, default_weighting, probabilities_table, write_probabilities,
+)
+from .tiebreak import CRITERIA, LEAGUE_RULES, league_rules, rank_teams
@@ -0,0 +1,181 @@
+# Неинтерактивный запуск моделей: python -m models ФАЙЛ.xlsx [ФАЙЛ.xlsx ...] --model score ...
+import argparse
+import os
+
+import numpy as np
+
+from .montecarlo import SAMPLING_METHODS, position_standard_errors
+from .league import (
+    MODEL_TYPES, fit, fit_leagues, simulate, event_probability, simulate_conditional, fixture_impact, impact_table, bootstrap,
+    probabilities_table, write_probabilities,
+)
+from .tiebreak import LEAGUE_RULES
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m models",
+        description="Обучает модели и считает вероятности итоговых мест для одного или нескольких чемпионатов.",
+    )
+    parser.add_argument("data", nargs="+", help="Excel файлы чемпионатов (как в папке data)")
+    parser.add_argument("-m", "--model", action="append", choices=MODEL_TYPES, required=True,
+                        help="модель для запуска (можно указать несколько раз)")
+    parser.add_argument("-n", "--simulations", type=int, default=None,
+                        help="количество симуляций (по умолчанию — значение модели)")
+    parser.add_argument("-s", "--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="количество процессов для симуляции и бутстрэпа (по умолчанию 1)")
+    parser.add_argument("-o", "--output", default="results",
+                        help="папка для таблиц <чемпионат>_<модель>.xlsx или путь .xlsx, если таблица одна")
+    parser.add_argument("--season-weight-factor", type=float, default=None,
+                        help="коэффициент затухания веса сезонов (по умолчанию — значение модели)")
+    parser.add_argument("--half-life-days", type=float, default=None,
+                        help="вес сезонов по периоду полураспада в днях вместо --season-weight-factor "
+                             "(дат матчей нет, поэтому вес одинаков для всех матчей сезона)")
+    parser.add_argument("--exact", action=argparse.BooleanOptionalAction, default=None,
+                        help="точный режим simulateExact для модели result (по умолчанию включён)")
+    parser.add_argument("--tiebreak", choices=["league", *LEAGUE_RULES], default=None,
+                        help="дополнительные показатели при равенстве очков: регламент чемпионата по названию файла "
+                             "или названию лиги (по умолчанию — правила модели)")
+    parser.add_argument("--target-error", type=float, default=None,
+                        help="симулировать до стандартной ошибки вероятностей не больше заданной (например, 0.001); "
+                             "тогда --simulations — наибольшее количество симуляций")
+    parser.add_argument("--sampling", choices=SAMPLING_METHODS, default="plain",
+                        help="способ получения случайных чисел: независимые, антитетические пары "
+                             "или стратифицированные (меньше разброс при том же количестве симуляций)")
+    parser.add_argument("--event", nargs=3, metavar=("TEAM", "FROM", "TO"), default=None,
+                        help="вместо таблицы оценить вероятность того, что команда TEAM займёт место с FROM по TO, "
+                             "выборкой по значимости (для редких событий, например --event INT 18 20)")
+    # Сценарии и значимость матчей считаются своими прогонами, поэтому вместе не задаются
+    special_runs = parser.add_mutually_exclusive_group()
+    special_runs.add_argument("--what-if", action="append", metavar="MATCHES", default=None,
+                              help="сценарий с заданными результатами несыгранных матчей, например "
+                                   "\"INT NAP 2:1, MIL JUV 0:0\" (можно указать несколько раз); таблица сценария k "
+                                   "записывается рядом с основной с окончанием _if<k>")
+    special_runs.add_argument("--impact", nargs=2, type=int, metavar=("FROM", "TO"), default=None,
+                              help="таблица значимости оставшихся матчей для мест с FROM по TO (например, "
+                                   "--impact 1 1 — чемпионство), записывается рядом с основной с окончанием _impact")
+    parser.add_argument("--save-outcomes", metavar="DIR", default=None,
+                        help="записать места и очки команд в каждой симуляции в DIR/<чемпионат>_<модель> "
+                             "для совместных и условных запросов (models.outcomes)")
+    parser.add_argument("--parameter-uncertainty", action="store_true",
+                        help="учитывать неопределённость обученных параметров: каждый блок симуляций получает свой "
+                             "набор параметров из нормального приближения (матрица Гессе функции потерь)")
+    parser.add_argument("--bootstrap", type=int, metavar="N", default=None,
+                        help="бутстрэп-интервалы параметров модели по N переобучениям (процессов — --workers), "
+                             "записываются рядом с основной таблицей с окончанием _params")
+    parser.add_argument("--batch-fit", action="store_true",
+                        help="обучать все чемпионаты одной оптимизацией для каждой модели (fit_leagues)")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш разобранных файлов")
+    args = parser.parse_args(argv)
+
+    # Прогоны --what-if и --impact не поддерживают настройки обычной симуляции
+    if args.what_if is not None or args.impact is not None:
+        run = "--what-if" if args.what_if is not None else "--impact"
+        unsupported = {
+            "--target-error": args.target_error is not None,
+            "--save-outcomes": args.save_outcomes is not None,
+            "--parameter-uncertainty": args.parameter_uncertainty,
+            "--exact/--no-exact": args.exact is not None,
+            # С --bootstrap процессы используются для переобучений
+            "--workers": args.workers is not None and args.bootstrap is None,
+        }
+        for option, given in unsupported.items():
+            if given:
+                parser.error(f"{option} не поддерживается вместе с {run}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    single_table = len(args.data) * len(args.model) == 1 and args.output.endswith(".xlsx")
+
+    fitted = {}
+    if args.batch_fit:
+        for model_type in args.model:
+            leagues = fit_leagues(
+                model_type, args.data, args.season_weight_factor, use_cache=not args.no_cache,
+                half_life_days=args.half_life_days
+            )
+            fitted.update({(file_path, model_type): league for file_path, league in zip(args.data, leagues)})
+
+    # Все чемпионаты и модели обрабатываются в одном процессе: модули и кэш данных загружаются один раз
+    for file_path in args.data:
+        for model_type in args.model:
+            league = fitted.get((file_path, model_type)) or fit(
+                model_type, file_path, args.season_weight_factor, use_cache=not args.no_cache,
+                half_life_days=args.half_life_days
+            )
+            if args.event is not None:
+                team, first, last = args.event[0], int(args.event[1]), int(args.event[2])
+                probability, error, tilt = event_probability(
+                    league, team, range(first, last + 1), args.simulations, seed=args.seed, tiebreak=args.tiebreak
+                )
+                print(f"{league['name']} ({model_type}): P({team} на местах {first}-{last}) = "
+                      f"{100 * probability:.4f}% ± {196 * error:.4f} п.п. (95%), сдвиг рейтинга {tilt:+.2f}")
+                continue
+
+            if args.what_if is not None:
+                # Сценарии и основная таблица считаются за один прогон на общих случайных числах
+                team_positions, scenario_positions, errors, num_simulations = simulate_conditional(
+                    league, args.what_if, args.simulations, seed=args.seed, tiebreak=args.tiebreak,
+                    sampling=args.sampling
+                )
+            elif args.impact is not None:
+                # Основная таблица и значимость матчей считаются за один прогон
+                team_positions, home_idx, away_idx, outcome_positions, num_simulations = fixture_impact(
+                    league, args.simulations, seed=args.seed, tiebreak=args.tiebreak, sampling=args.sampling
+                )
+            else:
+                team_positions, num_simulations = simulate(
+                    league, args.simulations, seed=args.seed, num_workers=args.workers or 1,
+                    exact=args.exact is not False,
+                    tiebreak=args.tiebreak, target_error=args.target_error, sampling=args.sampling,
+                    output=None if args.save_outcomes is None else os.path.join(
+                        args.save_outcomes, f"{league['name']}_{model_type}"
+                    ),
+                    parameter_uncertainty=args.parameter_uncertainty
+                )
+
+            if single_table:
+                output_path = args.output
+            else:
+                output_path = os.path.join(args.output, f"{league['name']}_{model_type}.xlsx")
+            write_probabilities(probabilities_table(league["teams"], team_positions, num_simulations), output_path)
+            print(f"{league['name']} ({model_type}, {num_simulations} симуляций): {output_path}")
+            if args.target_error is not None:
+                max_error = position_standard_errors(team_positions, num_simulations).max()
+                print(f"  наибольшая стандартная ошибка {100 * max_error:.3f} п.п. "
+                      f"(95% интервал ± {196 * max_error:.3f} п.п.)")
+
+            if args.bootstrap is not None:
+                params_path = f"{os.path.splitext(output_path)[0]}_params.xlsx"
+                _, params_table = bootstrap(league, args.bootstrap, num_workers=args.workers or 1, seed=args.seed)
+                write_probabilities(params_table, params_path)
+                print(f"  бутстрэп-интервалы параметров ({args.bootstrap} выборок): {params_path}")
+
+            if args.impact is not None:
+                first, last = args.impact
+                impact_path = f"{os.path.splitext(output_path)[0]}_impact.xlsx"
+                impact = impact_table(league["teams"], home_idx, away_idx, outcome_positions, range(first, last + 1))
+                write_probabilities(impact, impact_path)
+                print(f"  значимость матчей для мест {first}-{last}: {impact_path}")
+                for row in impact.head(3).itertuples(index=False):
+                    print(f"    {row.Home} - {row.Away}: {row.Team} {row[3]} / {row[4]} / {row[5]} "
+                          f"(размах {row.Swing} п.п.)")
+
+            for k, scenario in enumerate(args.what_if or [], start=1):
+                scenario_path = f"{os.path.splitext(output_path)[0]}_if{k}.xlsx"
+                write_probabilities(
+                    probabilities_table(league["teams"], scenario_positions[k - 1], num_simulations), scenario_path
+                )
+                # Наибольший сдвиг вероятности места относительно основной таблицы
+                shift = (scenario_positions[k - 1] - team_positions) / num_simulations
+                team, place = np.unravel_index(np.abs(shift).argmax(), shift.shape)
+                print(f"  если {scenario}: {scenario_path}; наибольший сдвиг — {league['teams'][team]} на месте "
+                      f"{place + 1}: {100 * shift[team, place]:+.1f} ± {196 * errors[k - 1][team, place]:.1f} п.п. (95%)")
+
+
+# Запуск только при выполнении как скрипта: процессы симуляции импортируют модули заново
+if __name__ == "__main__":
+    main()
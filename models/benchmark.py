@@ -0,0 +1,256 @@
+# Замеры скорости обучения и симуляции для всех чемпионатов и моделей
+# Запуск из корня репозитория: python -m models.benchmark [--help]
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .league import MODEL_TYPES, fit, simulate
+from .match_store import build_match_store, load_match_store
+
+try:
+    import resource  # Пиковая память процесса (нет в Windows)
+except ImportError:
+    resource = None
+
+# Чемпионаты по умолчанию и файл истории замеров
+DATA_FILES = (os.path.join("data", "ESP22.xlsx"), os.path.join("data", "ITA22.xlsx"), os.path.join("data", "RUS21.xlsx"))
+HISTORY_FILE = os.path.join("benchmarks", "history.json")
+
+# Показатели, по которым сравниваются запуски, и направление улучшения (+1 — больше лучше)
+METRICS = {
+    "parse_seconds": -1,
+    "load_seconds": -1,
+    "loss_evals_per_second": +1,
+    "minimize_seconds": -1,
+    "sims_per_second": +1,
+    "peak_rss_mb": -1,
+}
+
+
+def _loss_setup(model_type, model, matches, num_teams):
+    """
+    Функция потерь и её аргументы в том виде, в котором их использует model.fit.
+    """
+    if model_type == "score_diff":
+        return model.LOSS_BACKENDS["skellam"], (model.group_matches(matches), num_teams)
+    return model.loss_goals, (matches, num_teams)
+
+
+def _peak_rss_mb():
+    """
+    Пиковая память текущего процесса в МБ (None, если её нельзя узнать).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if platform.system() == "Darwin" else peak / 2 ** 10  # В macOS — байты, в Linux — КБ
+
+
+def _timed(function, min_seconds):
+    """
+    Вызывает function, пока не пройдёт min_seconds, и возвращает число вызовов в секунду.
+    """
+    calls, start = 0, time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return calls / elapsed
+
+
+def benchmark_case(model_type, file_path, num_simulations=20000, block_size=2000, seed=0, min_seconds=0.5):
+    """
+    Замеры одной пары (модель, чемпионат). Лучше вызывать в отдельном процессе,
+    чтобы пиковая память относилась только к этому замеру.
+
+    Параметры:
+    - model_type: название модели ("result", "score" или "score_diff").
+    - file_path: Excel файл с сезонами чемпионата.
+    - num_simulations: количество симуляций для замера simulateScore.
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел.
+    - min_seconds: минимальная длительность замеров загрузки, обучения и функции потерь.
+
+    Возвращает:
+    - case: словарь с показателями из METRICS и параметрами замера.
+    """
+    data_preprocess = importlib.import_module(f"{__package__}.{model_type}.data_preprocess")
+    model = importlib.import_module(f"{__package__}.{model_type}.model")
+
+    # Разбор Excel файла без кэша и загрузка из кэша .npz
+    start = time.perf_counter()
+    build_match_store(file_path)
+    parse_seconds = time.perf_counter() - start
+
+    load_match_store(file_path)  # Создаём кэш, если его ещё нет
+    teams, matches, _ = data_preprocess.load_league(file_path, model.SEASON_WEIGHT_FACTOR)
+    load_seconds = 1 / _timed(lambda: data_preprocess.load_league(file_path, model.SEASON_WEIGHT_FACTOR), min_seconds)
+
+    # Обучение модели (только minimize, без загрузки данных); быстрые шаги повторяются для устойчивости замера
+    minimize_seconds = 1 / _timed(lambda: model.fit(matches, len(teams)), min_seconds)
+    league = fit(model_type, file_path)
+
+    # Скорость функции потерь в точке оптимума
+    loss, args = _loss_setup(model_type, model, matches, len(teams))
+    loss_evals_per_second = _timed(lambda: loss(league["params"], *args), min_seconds)
+
+    # Скорость простой симуляции Монте-Карло в одном процессе (после короткого прогрева)
+    simulate(league, block_size, seed=seed, exact=False, block_size=block_size)
+    start = time.perf_counter()
+    simulate(league, num_simulations, seed=seed, exact=False, block_size=block_size)
+    sims_per_second = num_simulations / (time.perf_counter() - start)
+
+    return {
+        "model": model_type,
+        "league": league["name"],
+        "num_teams": len(teams),
+        "num_matches": len(matches[0]),
+        "num_simulations": num_simulations,
+        "parse_seconds": parse_seconds,
+        "load_seconds": load_seconds,
+        "loss_evals_per_second": loss_evals_per_second,
+        "minimize_seconds": minimize_seconds,
+        "sims_per_second": sims_per_second,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _git_commit():
+    """
+    Текущий коммит репозитория (None вне git).
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(file_paths=DATA_FILES, model_types=MODEL_TYPES, num_simulations=20000, block_size=2000, seed=0):
+    """
+    Замеряет все пары (модель, чемпионат) по очереди, каждую в новом процессе.
+
+    Возвращает:
+    - run: словарь с описанием окружения и списком замеров cases.
+    """
+    cases = []
+    for file_path in file_paths:
+        for model_type in model_types:
+            # Новый процесс на каждый замер (свой пул с одной задачей): пиковая память и прогрев
+            # не переходят между замерами
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                case = executor.submit(
+                    benchmark_case, model_type, file_path, num_simulations, block_size, seed
+                ).result()
+            cases.append(case)
+            print(
+                f"{case['league']:>6} {model_type:>10}: обучение {case['minimize_seconds']:.3f} с, "
+                f"{case['loss_evals_per_second']:.0f} вызовов потерь/с, {case['sims_per_second']:.0f} симуляций/с"
+            )
+
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cases": cases,
+    }
+
+
+def load_history(path=HISTORY_FILE):
+    """
+    Загружает список прошлых запусков (пустой, если файла ещё нет).
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def append_history(run, path=HISTORY_FILE):
+    """
+    Добавляет запуск в конец истории (запись через временный файл).
+    """
+    history = load_history(path) + [run]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+    return history
+
+
+def compare_runs(previous, current, threshold=0.1):
+    """
+    Сравнивает два запуска по METRICS.
+
+    Параметры:
+    - previous, current: запуски из истории.
+    - threshold: относительное ухудшение, начиная с которого показатель считается регрессией.
+
+    Возвращает:
+    - rows: список (чемпионат, модель, показатель, было, стало, изменение, регрессия).
+    """
+    old_cases = {(case["league"], case["model"]): case for case in previous["cases"]}
+    rows = []
+    for case in current["cases"]:
+        old_case = old_cases.get((case["league"], case["model"]))
+        if old_case is None:
+            continue
+        for metric, direction in METRICS.items():
+            old, new = old_case.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            rows.append((case["league"], case["model"], metric, old, new, change, direction * change < -threshold))
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m models.benchmark",
+        description="Замеры скорости подготовки данных, обучения и симуляции; результаты дописываются в историю JSON.",
+    )
+    parser.add_argument("data", nargs="*", default=list(DATA_FILES), help="Excel файлы чемпионатов")
+    parser.add_argument("-m", "--model", action="append", choices=MODEL_TYPES, default=None,
+                        help="модель (можно указать несколько раз; по умолчанию все)")
+    parser.add_argument("-n", "--simulations", type=int, default=20000, help="количество симуляций для замера")
+    parser.add_argument("--block-size", type=int, default=2000, help="симуляций за один проход")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="зерно генератора случайных чисел")
+    parser.add_argument("--history", default=HISTORY_FILE, help="файл истории замеров")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="относительное ухудшение, которое считается регрессией")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ["TQDM_DISABLE"] = "1"  # Полосы прогресса в процессах замеров только мешают
+    run = run_benchmarks(args.data, args.model or MODEL_TYPES, args.simulations, args.block_size, args.seed)
+    history = append_history(run, args.history)
+    print(f"Результаты записаны в {args.history}")
+
+    if len(history) < 2:
+        return
+    regressions = [row for row in compare_runs(history[-2], run, args.threshold) if row[-1]]
+    print(f"Сравнение с запуском {history[-2]['timestamp']} ({history[-2]['commit']}):")
+    if not regressions:
+        print("регрессий нет")
+    for league_name, model_type, metric, old, new, change, _ in regressions:
+        print(f"РЕГРЕССИЯ {league_name} {model_type} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+
+
+# Запуск только при выполнении как скрипта: процессы замеров импортируют модуль заново
+if __name__ == "__main__":
+    main()
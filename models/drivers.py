@@ -0,0 +1,592 @@
+# Общие для всех моделей прогоны симуляции сезона
+#
+# Модель задаётся модулем simulate своей папки (result, score, score_diff): функции здесь берут из него
+# только fixture_table (таблица несыгранных матчей по параметрам), fixture_tables (то же для многих
+# наборов параметров), simulate_block (розыгрыш блока матчей), log_likelihood_ratio (отношение
+# правдоподобий для выборки по значимости), значения по умолчанию NUM_SIMULATIONS и TIEBREAK_RULES
+# и, если модель разыгрывает только исход матча, scenario_goals (счёт сценария «что, если» в её записи).
+# Параметры модели передаются одним массивом, как res.x: силы команд, затем остальные параметры
+# в порядке аргументов fixture_table.
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+import queue
+from .tiebreak import rank_teams, season_points, team_places
+from .outcomes import prepare_directory, write_block
+from .uncertainty import laplace_draws
+from .montecarlo import (
+    position_standard_errors, difference_standard_errors, importance_estimate, choose_tilt
+)
+from tqdm import tqdm
+
+
+def model_fixtures(simulate_module, season, params):
+    """
+    Таблица несыгранных матчей модели по массиву параметров (силы команд, затем остальные параметры).
+    """
+    num_teams = len(season[2])
+    return simulate_module.fixture_table(season, params[:num_teams], *params[num_teams:])
+
+
+def season_block(home_goals, away_goals, fixtures, home, away):
+    """
+    Накладывает разыгранные матчи блока на уже сыгранные.
+
+    Параметры:
+    - home_goals, away_goals: матрицы голов уже сыгранных матчей.
+    - fixtures: таблица несыгранных матчей модели.
+    - home, away: массивы (симуляции × число матчей) с голами хозяев и гостей из simulate_block.
+
+    Возвращает:
+    - sim_home_goals, sim_away_goals: массивы (симуляции × N × N) голов во всех матчах сезона.
+    """
+    home_idx, away_idx = fixtures["home"], fixtures["away"]
+    sim_home_goals = np.repeat(home_goals[None], len(home), axis=0)
+    sim_away_goals = np.repeat(away_goals[None], len(home), axis=0)
+    sim_home_goals[:, home_idx, away_idx], sim_away_goals[:, home_idx, away_idx] = home, away
+    return sim_home_goals, sim_away_goals
+
+
+def simulate_positions(simulate_block, home_goals, away_goals, fixtures, team_strengths, num_simulations, block_size,
+                       seed_seq, tiebreak_rules, sampling="plain", output=None, progress=None):
+    """
+    Основной цикл симуляции: разыгрывает num_simulations сезонов блоками по block_size.
+
+    Параметры:
+    - simulate_block: функция розыгрыша блока матчей модели (simulate_block её модуля simulate).
+    - home_goals, away_goals: матрицы голов уже сыгранных матчей.
+    - fixtures: таблица несыгранных матчей из fixture_table или список таблиц fixture_tables
+      (блок k разыгрывается по таблице k).
+    - team_strengths: рейтинг силы каждой команды (для дополнительного показателя "strength").
+    - num_simulations: количество симуляций.
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed_seq: numpy.random.SeedSequence (или зерно), задающий поток случайных чисел.
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков.
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+    - output: путь и начало имени файлов для мест и очков каждой симуляции (см. outcomes.write_block;
+      None — не записывать).
+    - progress: функция, которая вызывается с числом завершённых симуляций после каждого блока.
+
+    Возвращает:
+    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    """
+    num_teams = len(home_goals)
+    rng = np.random.default_rng(seed_seq)
+    team_positions = np.zeros((num_teams, num_teams))  # Матрица финишных позиций команд
+
+    for start in range(0, num_simulations, block_size):
+        n = min(block_size, num_simulations - start)
+
+        # У всех таблиц fixture_tables одни и те же матчи
+        block_fixtures = fixtures[start // block_size] if isinstance(fixtures, list) else fixtures
+        sim_home_goals, sim_away_goals = season_block(
+            home_goals, away_goals, block_fixtures, *simulate_block(block_fixtures, n, rng, sampling)
+        )
+
+        order = rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, team_strengths)
+        if output is not None:
+            write_block(output, start, team_places(order), season_points(sim_home_goals, sim_away_goals))
+
+        # Обновляем матрицу финишных позиций
+        team_positions += np.bincount(
+            (order * num_teams + np.arange(num_teams)).ravel(), minlength=num_teams * num_teams
+        ).reshape(num_teams, num_teams)
+        if progress is not None:
+            progress(n)
+
+    return team_positions
+
+
+def _simulate_shard(args, progress_queue):
+    """
+    Точка входа процесса-воркера: симулирует свою часть сезонов и сообщает о прогрессе поблочно.
+    """
+    return simulate_positions(*args, progress=progress_queue.put)
+
+
+def simulateScore(simulate_module, season, params, num_simulations=None, block_size=2000, seed=None, num_workers=1,
+                  tiebreak_rules=None, sampling="plain", output=None, hessian=None):
+    """
+    Симулирует оставшиеся матчи сезона и определяет распределение вероятностей финишных позиций команд.
+
+    Все несыгранные матчи разыгрываются сразу для блока из block_size симуляций
+    в виде целочисленных массивов (симуляции × матчи).
+
+    При num_workers > 1 симуляции делятся между процессами. Каждый процесс получает
+    свой дочерний поток numpy.random.SeedSequence(seed), поэтому результат воспроизводим
+    при одинаковых seed и num_workers. Процессы возвращают только свои матрицы позиций,
+    которые затем складываются.
+
+    Параметры:
+    - simulate_module: модуль simulate модели (например, models.score.simulate).
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - params: параметры модели, как res.x (силы команд, бонус домашнего поля и, у модели result, фактор ничьей).
+    - num_simulations: количество симуляций (None — NUM_SIMULATIONS модели).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - num_workers: количество процессов для симуляции.
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (см. tiebreak.LEAGUE_RULES;
+      None — TIEBREAK_RULES модели).
+    - sampling: способ получения случайных чисел: "plain", "antithetic" или "stratified"
+      (см. montecarlo.draw_uniforms). Последние два уменьшают дисперсию при том же количестве симуляций.
+    - output: папка, в которую по мере симуляции записываются места и очки команд в каждой симуляции
+      (блоками .npy, память не растёт с количеством симуляций; запросы — в outcomes.py). Исходы прошлого
+      прогона в папке удаляются (outcomes.prepare_directory). None — не записывать.
+    - hessian: матрица Гессе функции потерь в точке параметров (model.hessian). Если задана, каждый блок
+      симуляций разыгрывается со своим набором параметров из нормального приближения
+      (uncertainty.laplace_draws), и вероятности мест учитывают неопределённость обученных параметров.
+      Наборов столько же, сколько блоков, поэтому таблицы матчей всех блоков считаются одним проходом
+      (fixture_tables). Дополнительный показатель "strength" берёт силы команд из params.
+      None — все блоки с одними параметрами.
+
+    Возвращает:
+    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+    tiebreak_rules = simulate_module.TIEBREAK_RULES if tiebreak_rules is None else tiebreak_rules
+
+    # Таблица матчей не меняется между симуляциями, поэтому считаем её один раз
+    fixtures = model_fixtures(simulate_module, season, params)
+
+    # Независимые потоки случайных чисел и число симуляций для каждого процесса
+    # (с hessian — ещё один поток для наборов параметров)
+    seed_seqs = np.random.SeedSequence(seed).spawn(num_workers + (hessian is not None))
+    shard_sizes = [num_simulations // num_workers + (k < num_simulations % num_workers) for k in range(num_workers)]
+    shard_fixtures = [fixtures] * num_workers
+    if hessian is not None:
+        # Один набор параметров на каждый блок каждого процесса
+        num_blocks = np.cumsum([0] + [-(-size // block_size) for size in shard_sizes])
+        draws = laplace_draws(np.asarray(params), hessian, num_blocks[-1], np.random.default_rng(seed_seqs.pop()))
+        tables = simulate_module.fixture_tables(season, draws, num_teams)
+        shard_fixtures = [tables[num_blocks[k]:num_blocks[k + 1]] or fixtures for k in range(num_workers)]
+    if output is not None:
+        prepare_directory(output)
+    shards = [
+        (simulate_module.simulate_block, home_goals, away_goals, shard_fixtures[k], params[:num_teams], size,
+         block_size, seed_seq, tiebreak_rules, sampling, None if output is None else os.path.join(output, f"part{k:03d}"))
+        for k, (size, seed_seq) in enumerate(zip(shard_sizes, seed_seqs))
+    ]
+
+    with tqdm(total=num_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        if num_workers == 1:
+            return simulate_positions(*shards[0], progress=pbar.update)
+
+        with Manager() as manager, ProcessPoolExecutor(max_workers=num_workers) as executor:
+            progress_queue = manager.Queue()
+            futures = [executor.submit(_simulate_shard, shard, progress_queue) for shard in shards]
+
+            # Собираем прогресс всех процессов, пока они работают
+            while pbar.n < num_simulations and not all(future.done() for future in futures):
+                try:
+                    pbar.update(progress_queue.get(timeout=0.1))
+                except queue.Empty:
+                    pass
+
+            team_positions = sum(future.result() for future in futures)
+            pbar.update(num_simulations - pbar.n)
+
+    return team_positions
+
+
+def simulateAdaptive(simulate_module, season, params, target_error=0.001, max_simulations=1000000,
+                     min_simulations=2000, block_size=2000, seed=None, num_workers=1, tiebreak_rules=None,
+                     sampling="plain", output=None):
+    """
+    Симулирует сезоны порциями, пока стандартная ошибка каждой вероятности места не станет
+    меньше target_error (или пока не будет сделано max_simulations симуляций).
+
+    После каждой порции (block_size симуляций на каждый процесс) считается ошибка Монте-Карло
+    sqrt(p (1 - p) / n) каждой клетки team_positions. Места, которые уже решены, дают нулевую
+    ошибку, поэтому в конце сезона остановка наступает намного раньше, чем при фиксированном
+    количестве симуляций. Порции получают дочерние потоки numpy.random.SeedSequence(seed),
+    поэтому результат воспроизводим при одинаковых seed, block_size и num_workers.
+
+    Параметры:
+    - simulate_module: модуль simulate модели.
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - params: параметры модели, как res.x.
+    - target_error: допустимая стандартная ошибка вероятности (0.001 — 0.1 процентного пункта).
+    - max_simulations: наибольшее количество симуляций (больше нуля).
+    - min_simulations: наименьшее количество симуляций до первой проверки остановки.
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - num_workers: количество процессов для симуляции.
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (None — TIEBREAK_RULES модели).
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+    - output: папка для мест и очков каждой симуляции, как у simulateScore (None — не записывать).
+
+    Возвращает:
+    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    - num_simulations: сделанное количество симуляций.
+    - errors: стандартные ошибки вероятностей мест (доверительные интервалы —
+      montecarlo.confidence_intervals(team_positions, num_simulations)).
+    """
+    if max_simulations <= 0:
+        raise ValueError(f"Ошибка: наибольшее количество симуляций должно быть положительным, а не {max_simulations}!")
+
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    tiebreak_rules = simulate_module.TIEBREAK_RULES if tiebreak_rules is None else tiebreak_rules
+
+    # Таблица матчей не меняется между симуляциями, поэтому считаем её один раз
+    fixtures = model_fixtures(simulate_module, season, params)
+
+    seed_seq = np.random.SeedSequence(seed)
+    team_positions = np.zeros((num_teams, num_teams))
+    num_simulations = 0
+    if output is not None:
+        prepare_directory(output)
+    executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+
+    with tqdm(total=max_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        try:
+            while num_simulations < max_simulations:
+                n = min(block_size * num_workers, max_simulations - num_simulations)
+                shard_sizes = [n // num_workers + (k < n % num_workers) for k in range(num_workers)]
+                shards = [
+                    (simulate_module.simulate_block, home_goals, away_goals, fixtures, params[:num_teams], size,
+                     block_size, child_seq, tiebreak_rules, sampling,
+                     None if output is None else os.path.join(output, f"sim{num_simulations:010d}_part{k:03d}"))
+                    for k, (size, child_seq) in enumerate(zip(shard_sizes, seed_seq.spawn(num_workers)))
+                ]
+                if executor is None:
+                    team_positions += simulate_positions(*shards[0])
+                else:
+                    team_positions += sum(future.result() for future in [
+                        executor.submit(simulate_positions, *shard) for shard in shards
+                    ])
+                num_simulations += n
+                pbar.update(n)
+
+                errors = position_standard_errors(team_positions, num_simulations)
+                pbar.set_postfix_str(f"ошибка {100 * errors.max():.3f} п.п.")
+                if num_simulations >= min_simulations and errors.max() <= target_error:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    return team_positions, num_simulations, errors
+
+
+def simulateDifference(simulate_module, season, params_a, params_b, num_simulations=None, block_size=2000, seed=None,
+                       sampling="plain", tiebreak_rules=None):
+    """
+    Сравнивает вероятности мест для двух наборов параметров модели на общих случайных числах.
+
+    Оба набора параметров разыгрываются из одного и того же состояния генератора, то есть на одних
+    и тех же равномерных числах, поэтому результат матча меняется только там, где заметно сдвинулось
+    его распределение. Разность вероятностей получается с гораздо меньшей ошибкой, чем у двух
+    независимых прогонов simulateScore.
+
+    Параметры:
+    - simulate_module: модуль simulate модели.
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - params_a, params_b: параметры модели, как res.x.
+    - num_simulations: количество симуляций (None — NUM_SIMULATIONS модели).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (None — TIEBREAK_RULES модели).
+
+    Возвращает:
+    - team_positions_a, team_positions_b: матрицы финишных позиций для каждого набора параметров.
+    - errors: стандартные ошибки разности вероятностей мест (см. montecarlo.difference_standard_errors).
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+    tiebreak_rules = simulate_module.TIEBREAK_RULES if tiebreak_rules is None else tiebreak_rules
+    rng = np.random.default_rng(seed)
+
+    param_sets = (params_a, params_b)
+    fixtures = [model_fixtures(simulate_module, season, params) for params in param_sets]
+
+    team_positions = np.zeros((2, num_teams, num_teams))
+    squared_differences = np.zeros((num_teams, num_teams))
+    cells = np.arange(num_teams) * num_teams  # Начало строки команды в развёрнутой матрице
+
+    with tqdm(total=num_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        for start in range(0, num_simulations, block_size):
+            n = min(block_size, num_simulations - start)
+            state = rng.bit_generator.state
+
+            places = []
+            for k, params in enumerate(param_sets):
+                # Второй набор разыгрывается с того же состояния генератора, что и первый
+                rng.bit_generator.state = state
+                sim_home_goals, sim_away_goals = season_block(
+                    home_goals, away_goals, fixtures[k], *simulate_module.simulate_block(fixtures[k], n, rng, sampling)
+                )
+                order = rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, params[:num_teams])
+
+                place = team_places(order)  # place[s, i] — место команды i в симуляции s
+                team_positions[k] += np.bincount(
+                    (cells + place).ravel(), minlength=num_teams * num_teams
+                ).reshape(num_teams, num_teams)
+                places.append(place)
+
+            # D^2 = 1 в обоих местах команды, если прогоны поставили её на разные места
+            moved = places[0] != places[1]
+            squared_differences += np.bincount(
+                np.concatenate([(cells + places[0])[moved], (cells + places[1])[moved]]),
+                minlength=num_teams * num_teams
+            ).reshape(num_teams, num_teams)
+            pbar.update(n)
+
+    errors = difference_standard_errors(team_positions[0], team_positions[1], squared_differences, num_simulations)
+    return team_positions[0], team_positions[1], errors
+
+
+def simulateConditional(simulate_module, season, params, scenarios, num_simulations=None, block_size=2000, seed=None,
+                        sampling="plain", tiebreak_rules=None):
+    """
+    Вероятности мест при заданных исходах отдельных несыгранных матчей («что, если»).
+
+    Все сценарии разыгрываются на общих случайных числах с обычной симуляцией: в каждом блоке матчи
+    разыгрываются один раз, а для каждого сценария заданные матчи заменяются его результатом и таблица
+    пересчитывается. Остальные матчи в сценарии и в обычной симуляции совпадают, поэтому сдвиг
+    вероятностей от сценария получается с небольшой ошибкой, а каждый сценарий стоит только
+    дополнительного ранжирования блока.
+
+    Если модель разыгрывает только исход матча, в её модуле simulate есть функция scenario_goals,
+    которая переводит счёт сценария в ту же запись (например, 1:0, 0:0 или 0:1 у модели result).
+
+    Параметры:
+    - simulate_module: модуль simulate модели.
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - params: параметры модели, как res.x.
+    - scenarios: список сценариев; сценарий — список кортежей (хозяева, гости, голы хозяев, голы гостей)
+      с индексами команд, как у update.add_results.
+    - num_simulations: количество симуляций (None — NUM_SIMULATIONS модели).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (None — TIEBREAK_RULES модели).
+
+    Возвращает:
+    - team_positions: матрица финишных позиций без условий.
+    - scenario_positions: массив (сценарии × N × N) матриц финишных позиций при каждом сценарии.
+    - errors: массив (сценарии × N × N) стандартных ошибок разности вероятностей мест сценария
+      и обычной симуляции (см. montecarlo.difference_standard_errors).
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+    tiebreak_rules = simulate_module.TIEBREAK_RULES if tiebreak_rules is None else tiebreak_rules
+    team_strengths = params[:num_teams]
+    rng = np.random.default_rng(seed)
+
+    fixtures = model_fixtures(simulate_module, season, params)
+    for scenario in scenarios:
+        for home, away, _, _ in scenario:
+            if home == away or played[home, away]:
+                raise ValueError(f"Ошибка: матч {home} - {away} уже сыгран или не входит в оставшиеся матчи!")
+    if hasattr(simulate_module, "scenario_goals"):
+        scenarios = [
+            [(home, away, *simulate_module.scenario_goals(goals_home, goals_away))
+             for home, away, goals_home, goals_away in scenario]
+            for scenario in scenarios
+        ]
+
+    team_positions = np.zeros((1 + len(scenarios), num_teams, num_teams))
+    squared_differences = np.zeros((len(scenarios), num_teams, num_teams))
+    cells = np.arange(num_teams) * num_teams  # Начало строки команды в развёрнутой матрице
+
+    with tqdm(total=num_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        for start in range(0, num_simulations, block_size):
+            n = min(block_size, num_simulations - start)
+            sim_home_goals, sim_away_goals = season_block(
+                home_goals, away_goals, fixtures, *simulate_module.simulate_block(fixtures, n, rng, sampling)
+            )
+
+            base = team_places(rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, team_strengths))
+            team_positions[0] += np.bincount((cells + base).ravel(), minlength=num_teams * num_teams).reshape(
+                num_teams, num_teams
+            )
+
+            for k, scenario in enumerate(scenarios):
+                # Заменяем результат заданных матчей, ранжируем и возвращаем разыгранный для следующего сценария
+                home, away = [match[0] for match in scenario], [match[1] for match in scenario]
+                drawn_home, drawn_away = sim_home_goals[:, home, away], sim_away_goals[:, home, away]
+                sim_home_goals[:, home, away] = [match[2] for match in scenario]
+                sim_away_goals[:, home, away] = [match[3] for match in scenario]
+                place = team_places(rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, team_strengths))
+                sim_home_goals[:, home, away], sim_away_goals[:, home, away] = drawn_home, drawn_away
+
+                team_positions[k + 1] += np.bincount(
+                    (cells + place).ravel(), minlength=num_teams * num_teams
+                ).reshape(num_teams, num_teams)
+                # D^2 = 1 в обоих местах команды, если сценарий поставил её на другое место
+                moved = place != base
+                squared_differences[k] += np.bincount(
+                    np.concatenate([(cells + base)[moved], (cells + place)[moved]]), minlength=num_teams * num_teams
+                ).reshape(num_teams, num_teams)
+            pbar.update(n)
+
+    errors = np.array([
+        difference_standard_errors(team_positions[k + 1], team_positions[0], squared_differences[k], num_simulations)
+        for k in range(len(scenarios))
+    ]).reshape(len(scenarios), num_teams, num_teams)
+    return team_positions[0], team_positions[1:], errors
+
+
+def simulateFixtureImpact(simulate_module, season, params, num_simulations=None, block_size=2000, seed=None,
+                          sampling="plain", tiebreak_rules=None):
+    """
+    Значимость оставшихся матчей: вероятности мест при каждом исходе каждого несыгранного матча за один прогон.
+
+    В каждой симуляции запоминается исход каждого матча (победа хозяев, ничья, победа гостей) вместе
+    с итоговыми местами команд. Доля симуляций с местом j команды i среди симуляций, где матч
+    закончился исходом o, — условная вероятность места при этом исходе. Все матчи и исходы
+    получаются из одной обычной симуляции, без отдельного прогона на каждый матч.
+
+    Параметры:
+    - simulate_module: модуль simulate модели.
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - params: параметры модели, как res.x.
+    - num_simulations: количество симуляций (None — NUM_SIMULATIONS модели).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (None — TIEBREAK_RULES модели).
+
+    Возвращает:
+    - team_positions: матрица финишных позиций, как у simulateScore.
+    - home_idx, away_idx: индексы хозяев и гостей несыгранных матчей.
+    - outcome_positions: массив (матчи × 3 × N × N), (f, o, i, j) — сколько раз команда i заняла место j
+      в симуляциях, где матч f закончился исходом o (0 — победа хозяев, 1 — ничья, 2 — победа гостей).
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+    tiebreak_rules = simulate_module.TIEBREAK_RULES if tiebreak_rules is None else tiebreak_rules
+    rng = np.random.default_rng(seed)
+
+    fixtures = model_fixtures(simulate_module, season, params)
+    home_idx, away_idx = fixtures["home"], fixtures["away"]
+
+    team_positions = np.zeros(num_teams * num_teams)
+    outcome_positions = np.zeros((len(home_idx), 3, num_teams * num_teams))
+    cells = np.arange(num_teams) * num_teams  # Начало строки команды в развёрнутой матрице
+
+    with tqdm(total=num_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        for start in range(0, num_simulations, block_size):
+            n = min(block_size, num_simulations - start)
+            home, away = simulate_module.simulate_block(fixtures, n, rng, sampling)
+            sim_home_goals, sim_away_goals = season_block(home_goals, away_goals, fixtures, home, away)
+            place = team_places(rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, params[:num_teams]))
+
+            # Индикаторы (симуляции × N·N) мест команд; произведение с индикаторами исходов
+            # (симуляции × матчи) сразу даёт счётчики для всех матчей
+            finished = np.zeros((n, num_teams * num_teams))
+            finished[np.arange(n)[:, None], cells + place] = 1
+            team_positions += finished.sum(axis=0)
+            outcome = np.sign(away.astype(int) - home) + 1
+            for o in range(3):
+                outcome_positions[:, o] += (outcome == o).T.astype(float) @ finished
+            pbar.update(n)
+
+    return (
+        team_positions.reshape(num_teams, num_teams), home_idx, away_idx,
+        outcome_positions.reshape(len(home_idx), 3, num_teams, num_teams)
+    )
+
+
+def importance_block(simulate_module, home_goals, away_goals, fixtures, tilted_fixtures, team_strengths, team, places,
+                     num_simulations, rng, tiebreak_rules):
+    """
+    Разыгрывает блок симуляций по сдвинутой таблице матчей и взвешивает попадания в событие.
+
+    Параметры:
+    - simulate_module: модуль simulate модели.
+    - home_goals, away_goals: матрицы голов уже сыгранных матчей.
+    - fixtures: таблица несыгранных матчей по модели.
+    - tilted_fixtures: таблица несыгранных матчей со сдвинутыми параметрами, по которой разыгрываются матчи.
+    - team_strengths: рейтинг силы каждой команды (без сдвига, для дополнительных показателей).
+    - team: индекс команды события.
+    - places: места события (с нуля).
+    - num_simulations: количество симуляций в блоке.
+    - rng: генератор случайных чисел numpy.random.Generator.
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков.
+
+    Возвращает:
+    - values: массив (num_simulations) значений w * [событие], w — отношение правдоподобий.
+    """
+    home, away = simulate_module.simulate_block(tilted_fixtures, num_simulations, rng)
+    sim_home_goals, sim_away_goals = season_block(home_goals, away_goals, tilted_fixtures, home, away)
+    log_weights = simulate_module.log_likelihood_ratio(fixtures, tilted_fixtures, home, away)
+
+    order = rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, team_strengths)
+    hits = np.isin(np.argmax(order == team, axis=1), places)
+    return np.exp(log_weights) * hits
+
+
+def simulateImportance(simulate_module, season, params, team, positions, num_simulations=None, tilt=None,
+                       block_size=2000, seed=None, tiebreak_rules=None):
+    """
+    Оценивает вероятность редкого события «команда team займёт одно из мест positions» выборкой по значимости.
+
+    Матчи разыгрываются по таблице модели, в которой рейтинг силы команды team сдвинут на tilt
+    (отрицательный сдвиг чаще опускает команду вниз таблицы, положительный — поднимает). Каждая симуляция
+    получает вес — отношение вероятностей её результатов по модели и по сдвинутой модели
+    (log_likelihood_ratio модуля модели), поэтому оценка остаётся несмещённой, а события с вероятностью
+    около 0.1% выпадают в заметной доле симуляций.
+
+    Параметры:
+    - simulate_module: модуль simulate модели.
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - params: параметры модели, как res.x.
+    - team: индекс команды события.
+    - positions: места события, начиная с 1 (например, range(18, 21) — зона вылета).
+    - num_simulations: количество симуляций (None — NUM_SIMULATIONS модели).
+    - tilt: сдвиг рейтинга силы команды (None — выбирается пробным прогоном, см. montecarlo.choose_tilt).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (None — TIEBREAK_RULES модели).
+
+    Возвращает:
+    - probability: оценка вероятности события.
+    - error: стандартная ошибка оценки.
+    - tilt: использованный сдвиг рейтинга.
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+    tiebreak_rules = simulate_module.TIEBREAK_RULES if tiebreak_rules is None else tiebreak_rules
+    team_strengths = params[:num_teams]
+    rng = np.random.default_rng(seed)
+    places = np.asarray(positions) - 1
+
+    fixtures = model_fixtures(simulate_module, season, params)
+
+    def tilted(tilt):
+        tilted_params = np.array(params, dtype=float)
+        tilted_params[team] += tilt
+        return model_fixtures(simulate_module, season, tilted_params)
+
+    if tilt is None:
+        # Пробный прогон: по одному блоку на каждый сдвиг из montecarlo.IMPORTANCE_TILTS
+        tilt = choose_tilt(lambda tilt: importance_block(
+            simulate_module, home_goals, away_goals, fixtures, tilted(tilt), team_strengths, team, places,
+            min(block_size, num_simulations), rng, tiebreak_rules
+        ))
+    tilted_fixtures = tilted(tilt)
+
+    weighted_hits = weighted_hits_squared = 0.0
+    with tqdm(total=num_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        for start in range(0, num_simulations, block_size):
+            n = min(block_size, num_simulations - start)
+            values = importance_block(
+                simulate_module, home_goals, away_goals, fixtures, tilted_fixtures, team_strengths, team, places, n,
+                rng, tiebreak_rules
+            )
+            weighted_hits += values.sum()
+            weighted_hits_squared += (values ** 2).sum()
+            pbar.update(n)
+
+    probability, error = importance_estimate(weighted_hits, weighted_hits_squared, num_simulations)
+    return probability, error, tilt
@@ -0,0 +1,217 @@
+# Сравнение моделей с OPTA (model_metrics) в зависимости от числа симуляций и времени работы
+# Запуск из корня репозитория: python -m models.evaluate [--help]
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .league import MODEL_TYPES, fit_cached, simulate
+from .montecarlo import SAMPLING_METHODS
+
+# Чемпионаты по умолчанию и папка с эталонными таблицами
+DATA_FILES = (os.path.join("data", "ESP22.xlsx"), os.path.join("data", "ITA22.xlsx"), os.path.join("data", "RUS21.xlsx"))
+METRICS_DIR = "model_metrics"
+
+# Папка model_metrics для каждой модели и название страны по коду чемпионата
+METRICS_FOLDERS = {"result": "result", "score": "score", "score_diff": "diff_score"}
+COUNTRIES = {"ITA": "Italy", "ESP": "Spain", "RUS": "Russia"}
+
+# Полные названия команд в таблицах model_metrics -> коды команд в файлах data (в РПЛ совпадают)
+TEAM_CODES = {
+    "Atalanta": "ATA", "Bologna": "BOL", "Cagliari": "CAG", "Como": "COM", "Empoli": "EMP",
+    "Fiorentina": "FIO", "Genoa": "GEN", "Hellas Verona": "VER", "Internazionale": "INT", "Juventus": "JUV",
+    "Lazio": "LAZ", "Lecce": "LEC", "Milan": "MIL", "Monza": "MON", "Napoli": "NAP", "Parma": "PAR",
+    "Roma": "ROM", "Torino": "TOR", "Udinese": "UDI", "Venezia": "VEN",
+    "Deportivo Alavés": "ALA", "Athletic Club": "ATH", "Atlético Madrid": "ATM", "Barcelona": "BAR",
+    "Real Betis": "BET", "Celta de Vigo": "CEL", "Espanyol": "ESP", "Getafe": "GET", "Girona": "GIR",
+    "Las Palmas": "LPA", "Leganés": "LEG", "Mallorca": "MLL", "Osasuna": "OSA", "Rayo Vallecano": "RAY",
+    "Real Madrid": "RMA", "Real Sociedad": "RSO", "Sevilla": "SEV", "Valencia": "VAL",
+    "Real Valladolid": "VLL", "Villarreal": "VIL",
+}
+
+# Порог «вероятных исходов». В сохранённых таблицах model_metrics столбец «MAE >1%» посчитан
+# по клеткам, где вероятность OPTA больше 2%: с этим порогом числа совпадают с таблицами
+PROBABLE_THRESHOLD = 0.02
+
+# Количества симуляций по умолчанию
+SIM_COUNTS = (1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+
+def reference_path(model_type, league_name):
+    """
+    Путь к таблице model_metrics для модели и чемпионата (например, "ITA22").
+    """
+    folder = METRICS_FOLDERS[model_type]
+    return os.path.join(METRICS_DIR, folder, f"{COUNTRIES[league_name[:3].upper()]}_{folder}.xlsx")
+
+
+def load_reference(path, teams):
+    """
+    Загружает вероятности мест OPTA (второй лист таблицы model_metrics).
+
+    Параметры:
+    - path: путь к таблице model_metrics.
+    - teams: список команд чемпионата (коды из файла data).
+
+    Возвращает:
+    - reference: матрица, где (i, j) — вероятность OPTA того, что команда teams[i] займёт место j.
+    """
+    table = pd.read_excel(path, sheet_name=1)
+    table["Team"] = [TEAM_CODES.get(team, team) for team in table["Team"]]
+    missing = set(teams) - set(table["Team"])
+    if missing:
+        raise ValueError(f"Ошибка: в таблице {path} нет команд {', '.join(sorted(missing))}!")
+    return table.set_index("Team").loc[teams].to_numpy(dtype=float)
+
+
+def position_errors(position_probs, reference, threshold=PROBABLE_THRESHOLD):
+    """
+    Считает MAE и MAE на вероятных исходах (вероятность OPTA больше threshold).
+
+    Параметры:
+    - position_probs: матрица вероятностей мест модели.
+    - reference: матрица вероятностей мест OPTA той же формы.
+    - threshold: порог вероятных исходов.
+
+    Возвращает:
+    - mae, mae_probable: средние модули разности по всем и по вероятным клеткам.
+    """
+    errors = np.abs(position_probs - reference)
+    return errors.mean(), errors[reference > threshold].mean()
+
+
+def evaluate_league(file_path, model_types=MODEL_TYPES, sim_counts=SIM_COUNTS, seed=0, exact=True, sampling="plain"):
+    """
+    Прогоняет модели на одном чемпионате для каждого количества симуляций.
+
+    Параметры модели берутся из кэша fit_cached, поэтому повторные прогоны не обучают модель заново.
+
+    Параметры:
+    - file_path: Excel файл с сезонами чемпионата.
+    - model_types: модели для сравнения.
+    - sim_counts: количества симуляций.
+    - seed: зерно генератора случайных чисел.
+    - exact: для модели result использовать точный режим simulateExact.
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+
+    Возвращает:
+    - rows: список словарей league, model, sampling, num_simulations, seconds, mae, mae_probable.
+    """
+    rows = []
+    for model_type in model_types:
+        league = fit_cached(model_type, file_path)
+        reference = load_reference(reference_path(model_type, league["name"]), league["teams"])
+
+        for num_simulations in sim_counts:
+            start = time.perf_counter()
+            team_positions, _ = simulate(league, num_simulations, seed=seed, exact=exact, sampling=sampling)
+            seconds = time.perf_counter() - start
+
+            mae, mae_probable = position_errors(team_positions / num_simulations, reference)
+            rows.append({
+                "league": league["name"],
+                "model": model_type,
+                "sampling": sampling,
+                "num_simulations": num_simulations,
+                "seconds": seconds,
+                "mae": mae,
+                "mae_probable": mae_probable,
+            })
+    return rows
+
+
+def run_evaluation(file_paths=DATA_FILES, model_types=MODEL_TYPES, sim_counts=SIM_COUNTS, seed=0, exact=True,
+                   num_workers=None, samplings=("plain",)):
+    """
+    Прогоняет evaluate_league для всех чемпионатов и способов получения случайных чисел samplings,
+    по одному процессу на пару (чемпионат, способ).
+
+    Возвращает:
+    - results: таблица pandas.DataFrame со строками evaluate_league всех чемпионатов.
+    """
+    num_workers = num_workers or min(len(file_paths) * len(samplings), os.cpu_count())
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(evaluate_league, file_path, model_types, sim_counts, seed, exact, sampling)
+            for file_path in file_paths for sampling in samplings
+        ]
+        rows = [row for future in futures for row in future.result()]
+    return pd.DataFrame(rows)
+
+
+def summarize(results):
+    """
+    Средние по чемпионатам ошибка и время для каждой модели, способа получения случайных чисел
+    и количества симуляций.
+    """
+    return results.groupby(["model", "sampling", "num_simulations"], as_index=False)[["seconds", "mae", "mae_probable"]].mean()
+
+
+def cheapest_simulations(results, budget, metric="mae"):
+    """
+    Наименьшее количество симуляций, при котором средняя по чемпионатам ошибка не больше budget.
+
+    Параметры:
+    - results: таблица run_evaluation.
+    - budget: допустимая ошибка (доля, например 0.009).
+    - metric: "mae" или "mae_probable".
+
+    Возвращает:
+    - choice: словарь (модель, способ) -> количество симуляций (None, если бюджет не достигнут).
+    """
+    summary = summarize(results)
+    choice = {}
+    for (model_type, sampling), group in summary.groupby(["model", "sampling"]):
+        within_budget = group[group[metric] <= budget]
+        choice[model_type, sampling] = int(within_budget["num_simulations"].min()) if len(within_budget) else None
+    return choice
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m models.evaluate",
+        description="Сравнивает модели с OPTA (model_metrics) при разном количестве симуляций.",
+    )
+    parser.add_argument("data", nargs="*", default=list(DATA_FILES), help="Excel файлы чемпионатов")
+    parser.add_argument("-m", "--model", action="append", choices=MODEL_TYPES, default=None,
+                        help="модель (можно указать несколько раз; по умолчанию все)")
+    parser.add_argument("-n", "--simulations", type=int, nargs="+", default=list(SIM_COUNTS),
+                        help="количества симуляций")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="зерно генератора случайных чисел")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="количество процессов (по умолчанию — по одному на чемпионат)")
+    parser.add_argument("--exact", action=argparse.BooleanOptionalAction, default=True,
+                        help="точный режим simulateExact для модели result")
+    parser.add_argument("--sampling", nargs="+", choices=SAMPLING_METHODS, default=["plain"],
+                        help="способы получения случайных чисел для сравнения")
+    parser.add_argument("--budget", type=float, default=None, help="допустимая средняя ошибка (например, 0.009)")
+    parser.add_argument("--metric", choices=["mae", "mae_probable"], default="mae", help="ошибка для --budget")
+    parser.add_argument("-o", "--output", default=os.path.join("results", "evaluation.csv"),
+                        help="файл с результатами по каждому чемпионату")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ["TQDM_DISABLE"] = "1"  # Полосы прогресса параллельных процессов только мешают
+
+    results = run_evaluation(
+        args.data, args.model or MODEL_TYPES, args.simulations, args.seed, args.exact, args.workers, args.sampling
+    )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    print(summarize(results).to_string(index=False))
+    print(f"Результаты по чемпионатам записаны в {args.output}")
+
+    if args.budget is not None:
+        for (model_type, sampling), num_simulations in cheapest_simulations(results, args.budget, args.metric).items():
+            print(f"{model_type} ({sampling}): {num_simulations or 'бюджет не достигнут'}")
+
+
+# Запуск только при выполнении как скрипта: процессы чемпионатов импортируют модуль заново
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,584 @@
+# Общий интерфейс трёх моделей: обучение и симуляция чемпионата без интерактивного ввода
+import hashlib
+import importlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import pandas as pd  # Для создания таблицы с результатами
+
+from . import drivers
+from .match_store import build_match_store, load_match_store, match_seasons
+from .outcomes import write_metadata
+from .tiebreak import league_rules
+from .uncertainty import bootstrap_weights
+
+# Доступные модели (подпакеты models)
+MODEL_TYPES = ("result", "score", "score_diff")
+
+# Подобранные коэффициенты затухания весов матчей (python -m models.tune) в корне репозитория
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_config.json")
+
+
+def _load_modules(model_type):
+    """
+    Возвращает модули data_preprocess, model и simulate выбранной модели.
+    """
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Ошибка: неизвестная модель {model_type}! Доступны: {', '.join(MODEL_TYPES)}")
+    return tuple(
+        importlib.import_module(f"{__package__}.{model_type}.{name}")
+        for name in ("data_preprocess", "model", "simulate")
+    )
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    Загружает подобранные настройки моделей: словарь модель -> {"season_weight_factor", "half_life_days"}
+    (пустой словарь, если файла нет).
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def default_weighting(model_type, path=CONFIG_FILE):
+    """
+    Затухание весов матчей по умолчанию: значения из файла настроек (python -m models.tune),
+    иначе SEASON_WEIGHT_FACTOR модели.
+
+    Возвращает:
+    - season_weight_factor: коэффициент затухания веса сезонов.
+    - half_life_days: период полураспада в днях для веса сезонов (None — по season_weight_factor).
+    """
+    _, model, _ = _load_modules(model_type)
+    config = load_config(path).get(model_type, {})
+    return config.get("season_weight_factor") or model.SEASON_WEIGHT_FACTOR, config.get("half_life_days")
+
+
+def _weighting(model_type, season_weight_factor, half_life_days):
+    """
+    Затухание весов по аргументам fit: если не задано ни то, ни другое — default_weighting.
+    """
+    if season_weight_factor is None and half_life_days is None:
+        return default_weighting(model_type)
+    if season_weight_factor is None:
+        season_weight_factor = _load_modules(model_type)[1].SEASON_WEIGHT_FACTOR
+    return season_weight_factor, half_life_days
+
+
+def _load_league(data_preprocess, file_path, season_weight_factor, half_life_days, use_cache=True):
+    """
+    data_preprocess.load_league и метки сезонов его матчей (match_store.match_seasons) из одного разбора файла.
+    """
+    store = load_match_store(file_path) if use_cache else build_match_store(file_path)
+    teams, matches, season = data_preprocess.load_league(
+        file_path, season_weight_factor, half_life_days=half_life_days, store=store
+    )
+    return teams, matches, match_seasons(store), season
+
+
+def fit(model_type, file_path, season_weight_factor=None, use_cache=True, initial_params=None, callback=None,
+        half_life_days=None, **fit_options):
+    """
+    Загружает чемпионат из Excel файла и обучает выбранную модель.
+
+    Параметры:
+    - model_type: название модели ("result", "score" или "score_diff").
+    - file_path: Excel файл с сезонами чемпионата.
+    - season_weight_factor: коэффициент затухания веса сезонов (None — из файла настроек CONFIG_FILE,
+      если он есть, иначе значение модели по умолчанию, см. default_weighting).
+    - use_cache: использовать кэш разобранного файла (см. match_store.load_match_store).
+    - initial_params: начальные параметры оптимизации (None — нули).
+    - callback: функция, которая вызывается после каждой итерации оптимизатора.
+    - half_life_days: период полураспада в днях, по которому считается вес каждого сезона
+      (match_store.decay_weights), вместо season_weight_factor (None — по season_weight_factor).
+    - fit_options: дополнительные аргументы model.fit (например, likelihood у score_diff).
+
+    Возвращает:
+    - league: словарь с ключами model, name, teams, matches, match_season (метка сезона каждого матча:
+      0 — последний сезон, -1 — предыдущий, ...), season, params, season_weight_factor, half_life_days.
+    """
+    data_preprocess, model, _ = _load_modules(model_type)
+    season_weight_factor, half_life_days = _weighting(model_type, season_weight_factor, half_life_days)
+
+    teams, matches, match_season, season = _load_league(
+        data_preprocess, file_path, season_weight_factor, half_life_days, use_cache
+    )
+    res = model.fit(matches, len(teams), initial_params=initial_params, callback=callback, **fit_options)
+
+    return {
+        "model": model_type,
+        "name": os.path.splitext(os.path.basename(file_path))[0],
+        "teams": teams,
+        "matches": matches,
+        "match_season": match_season,
+        "season": season,
+        "params": res.x,
+        "season_weight_factor": season_weight_factor,
+        "half_life_days": half_life_days,
+    }
+
+
+def fit_leagues(model_type, file_paths, season_weight_factor=None, use_cache=True, callback=None, half_life_days=None,
+                **fit_options):
+    """
+    Обучает выбранную модель сразу для нескольких чемпионатов одной оптимизацией.
+
+    Чемпионаты независимы, поэтому их матчи складываются в общие массивы, а команды нумеруются
+    подряд (индексы команд чемпионата сдвигаются на число команд предыдущих). Функция потерь
+    и градиент всех чемпионатов считаются одним проходом по массивам (у каждого чемпионата свой
+    бонус хозяев и, у модели result, фактор ничьей), поэтому время обучения растёт с числом матчей,
+    а не с числом отдельных оптимизаций.
+
+    Параметры:
+    - model_type: название модели ("result", "score" или "score_diff").
+    - file_paths: Excel файлы чемпионатов.
+    - season_weight_factor, use_cache, callback, half_life_days, fit_options: как у fit.
+
+    Возвращает:
+    - leagues: список словарей, как у fit, по одному на чемпионат (в порядке file_paths).
+    """
+    data_preprocess, model, _ = _load_modules(model_type)
+    season_weight_factor, half_life_days = _weighting(model_type, season_weight_factor, half_life_days)
+
+    loaded = [
+        _load_league(data_preprocess, file_path, season_weight_factor, half_life_days, use_cache)
+        for file_path in file_paths
+    ]
+    num_teams = [len(teams) for teams, _, _, _ in loaded]
+    offsets = np.cumsum([0] + num_teams)
+
+    # Общие массивы матчей: хозяева и гости со сдвигом индексов, остальные массивы подряд
+    stacked = [
+        np.concatenate([matches[k].astype(np.intp) + offset for (_, matches, _, _), offset in zip(loaded, offsets)])
+        for k in range(2)
+    ] + [np.concatenate([matches[k] for _, matches, _, _ in loaded]) for k in range(2, len(loaded[0][1]))]
+    team_league = np.repeat(np.arange(len(loaded)), num_teams)
+
+    res = model.fit(tuple(stacked), offsets[-1], callback=callback, team_league=team_league, **fit_options)
+
+    # После сил всех команд идут параметры чемпионатов: бонусы хозяев (и, у result, факторы ничьей)
+    league_params = res.x[offsets[-1]:].reshape(-1, len(loaded))
+    return [
+        {
+            "model": model_type,
+            "name": os.path.splitext(os.path.basename(file_path))[0],
+            "teams": teams,
+            "matches": matches,
+            "match_season": match_season,
+            "season": season,
+            "params": np.concatenate([res.x[offsets[k]:offsets[k + 1]], league_params[:, k]]),
+            "season_weight_factor": season_weight_factor,
+            "half_life_days": half_life_days,
+        }
+        for k, (file_path, (teams, matches, match_season, season)) in enumerate(zip(file_paths, loaded))
+    ]
+
+
+def fit_cached(model_type, file_path, season_weight_factor=None, cache_dir=None, half_life_days=None, **fit_options):
+    """
+    То же, что fit, но оптимизированные параметры сохраняются в кэш и при повторном вызове
+    берутся оттуда, если не изменились матчи, коэффициент затухания и настройки обучения.
+
+    Кэш лежит в файле .npz в папке ".match_cache" рядом с Excel файлом (или в cache_dir).
+
+    Параметры:
+    - model_type, file_path, season_weight_factor, half_life_days, fit_options: как у fit.
+    - cache_dir: папка для кэша параметров.
+
+    Возвращает:
+    - league: словарь, как у fit.
+    """
+    data_preprocess, model, _ = _load_modules(model_type)
+    season_weight_factor, half_life_days = _weighting(model_type, season_weight_factor, half_life_days)
+    teams, matches, match_season, season = _load_league(data_preprocess, file_path, season_weight_factor, half_life_days)
+
+    # Ключ кэша: модель, настройки обучения и содержимое массивов матчей
+    key = hashlib.sha256(repr((model_type, season_weight_factor, sorted(fit_options.items()))).encode())
+    for array in matches:
+        key.update(np.ascontiguousarray(array).tobytes())
+    key = key.hexdigest()
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), ".match_cache")
+    cache_path = os.path.join(cache_dir, f"{name}_{model_type}_params.npz")
+
+    params = None
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["key"]) == key:
+                params = cached["params"]
+
+    if params is None:
+        params = model.fit(matches, len(teams), **fit_options).x
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as f:
+            np.savez(f, key=key, params=params)
+        os.replace(cache_path + ".tmp", cache_path)
+
+    return {
+        "model": model_type,
+        "name": name,
+        "teams": teams,
+        "matches": matches,
+        "match_season": match_season,
+        "season": season,
+        "params": params,
+        "season_weight_factor": season_weight_factor,
+        "half_life_days": half_life_days,
+    }
+
+
+def _bootstrap_shard(model_type, matches, match_season, num_teams, params, num_refits, seed_seq, fit_options):
+    """
+    Точка входа процесса-воркера bootstrap: обучает модель на num_refits бутстрэп-выборках.
+    """
+    _, model, _ = _load_modules(model_type)
+    rng = np.random.default_rng(seed_seq)
+    samples = np.empty((num_refits, len(params)))
+    for k in range(num_refits):
+        refit_matches = matches[:-1] + (bootstrap_weights(matches[-1], match_season, rng),)
+        samples[k] = model.fit(refit_matches, num_teams, initial_params=params, **fit_options).x
+    return samples
+
+
+def bootstrap(league, num_refits=1000, num_workers=None, seed=None, quantiles=(0.025, 0.5, 0.975), **fit_options):
+    """
+    Бутстрэп-интервалы параметров модели: модель заново обучается на выборках матчей с возвращением
+    (внутри каждого сезона, см. uncertainty.bootstrap_weights).
+
+    Каждое обучение начинается с параметров league (тёплый старт), поэтому оптимизатору хватает
+    нескольких итераций. Обучения делятся между процессами; каждый процесс получает свой дочерний
+    поток numpy.random.SeedSequence(seed), поэтому результат воспроизводим при одинаковых seed и num_workers.
+
+    Силы команд определены с точностью до общего сдвига, поэтому средняя сила каждой выборки
+    приводится к средней силе league.
+
+    Параметры:
+    - league: словарь, который вернула fit.
+    - num_refits: количество бутстрэп-выборок.
+    - num_workers: количество процессов (None — по числу ядер).
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - quantiles: уровни квантилей параметров.
+    - fit_options: дополнительные аргументы model.fit, как у fit.
+
+    Возвращает:
+    - samples: массив (num_refits × параметры) параметров всех выборок.
+    - table: таблица pandas.DataFrame: строки — параметры (команды, home_bonus, у модели result — draw_factor),
+      столбцы — оценка league и квантили.
+    """
+    num_teams = len(league["teams"])
+    num_workers = num_workers or os.cpu_count()
+    params = np.asarray(league["params"], dtype=float)
+
+    seed_seqs = np.random.SeedSequence(seed).spawn(num_workers)
+    shard_sizes = [num_refits // num_workers + (k < num_refits % num_workers) for k in range(num_workers)]
+    shards = [
+        (league["model"], league["matches"], league["match_season"], num_teams, params, size, seed_seq, fit_options)
+        for size, seed_seq in zip(shard_sizes, seed_seqs) if size > 0
+    ]
+    if len(shards) == 1:
+        samples = _bootstrap_shard(*shards[0])
+    else:
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            samples = np.concatenate(list(executor.map(_bootstrap_shard, *zip(*shards))))
+
+    samples[:, :num_teams] += params[:num_teams].mean() - samples[:, :num_teams].mean(axis=1, keepdims=True)
+
+    names = list(league["teams"]) + ["home_bonus", "draw_factor"][:len(params) - num_teams]
+    table = pd.DataFrame({"Parameter": names, "Estimate": params})
+    for level, values in zip(quantiles, np.quantile(samples, quantiles, axis=0)):
+        table[f"Q{100 * level:g}%"] = values
+    return samples, table
+
+
+def _tiebreak_rules(league, simulate_module, tiebreak):
+    """
+    Порядок дополнительных показателей по аргументу tiebreak функций simulate и event_probability.
+    """
+    if tiebreak is None:
+        return simulate_module.TIEBREAK_RULES
+    if isinstance(tiebreak, str):
+        return league_rules(league["name"] if tiebreak == "league" else tiebreak)
+    return tuple(tiebreak)
+
+
+def simulate(league, num_simulations=None, seed=None, num_workers=1, exact=True, block_size=2000, tiebreak=None,
+             target_error=None, sampling="plain", output=None, parameter_uncertainty=False):
+    """
+    Симулирует оставшиеся матчи обученного чемпионата.
+
+    Параметры:
+    - league: словарь, который вернула fit.
+    - num_simulations: количество симуляций (None — значение модели по умолчанию).
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - num_workers: количество процессов для simulateScore.
+    - exact: для модели result использовать точный режим simulateExact (у остальных моделей его нет).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - tiebreak: дополнительные показатели при равенстве очков: None — правила модели по умолчанию,
+      "league" — регламент чемпионата по названию файла (ITA, ESP, RUS), название из tiebreak.LEAGUE_RULES
+      или свой список показателей из tiebreak.CRITERIA.
+    - target_error: если задано, симуляции идут порциями до стандартной ошибки каждой вероятности места
+      не больше target_error (simulateAdaptive), а num_simulations — наибольшее количество симуляций
+      (None — миллион).
+    - sampling: способ получения случайных чисел: "plain", "antithetic" или "stratified"
+      (см. montecarlo.SAMPLING_METHODS).
+    - output: папка, в которую записываются места и очки команд в каждой симуляции для запросов
+      из outcomes.py (старые исходы в папке удаляются). Точный режим при этом не используется.
+    - parameter_uncertainty: учитывать неопределённость обученных параметров: каждый блок симуляций
+      получает свой набор параметров из нормального приближения с матрицей Гессе функции потерь
+      (model.hessian, см. simulateScore). Точный режим при этом не используется, target_error не поддерживается.
+
+    Возвращает:
+    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    - num_simulations: количество симуляций, по которому посчитана team_positions.
+    """
+    _, model, simulate_module = _load_modules(league["model"])
+
+    # После сил команд параметры идут в том же порядке, что и аргументы fixture_table модели
+    # (бонус домашнего поля и, у модели result, фактор ничьей)
+    num_teams = len(league["teams"])
+    team_strengths, other_params = league["params"][:num_teams], league["params"][num_teams:]
+
+    tiebreak_rules = _tiebreak_rules(league, simulate_module, tiebreak)
+
+    hessian = None
+    if parameter_uncertainty:
+        if target_error is not None:
+            raise ValueError("Ошибка: неопределённость параметров не поддерживается вместе с target_error!")
+        hessian = model.hessian(league["params"], league["matches"], num_teams)
+
+    if target_error is not None:
+        team_positions, num_simulations, _ = drivers.simulateAdaptive(
+            simulate_module, league["season"], league["params"], target_error=target_error,
+            max_simulations=num_simulations or 1000000, block_size=block_size, seed=seed, num_workers=num_workers,
+            tiebreak_rules=tiebreak_rules, sampling=sampling, output=output
+        )
+    elif exact and output is None and hessian is None and hasattr(simulate_module, "simulateExact"):
+        num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+        team_positions, _ = simulate_module.simulateExact(
+            league["season"], team_strengths, *other_params, num_simulations, block_size=block_size, seed=seed,
+            tiebreak_rules=tiebreak_rules, sampling=sampling
+        )
+    else:
+        num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+        team_positions = drivers.simulateScore(
+            simulate_module, league["season"], league["params"], num_simulations, block_size=block_size, seed=seed,
+            num_workers=num_workers, tiebreak_rules=tiebreak_rules, sampling=sampling, output=output, hessian=hessian
+        )
+
+    if output is not None:
+        write_metadata(output, league, num_simulations)
+    return team_positions, num_simulations
+
+
+def _team_index(league, team):
+    """
+    Индекс команды в league["teams"] по названию (или сам индекс, если передано число).
+    """
+    if isinstance(team, str):
+        if team not in league["teams"]:
+            raise ValueError(f"Ошибка: команды {team} нет в чемпионате {league['name']}!")
+        return league["teams"].index(team)
+    return team
+
+
+def parse_results(text):
+    """
+    Разбирает результаты матчей из строки "ХОЗЯЕВА ГОСТИ X:Y, ХОЗЯЕВА ГОСТИ X:Y, ..."
+    (формат аргументов update.py, несколько матчей через запятую).
+
+    Возвращает:
+    - results: список кортежей (хозяева, гости, голы хозяев, голы гостей).
+    """
+    results = []
+    for match in text.split(","):
+        home, away, score = match.strip().rsplit(maxsplit=2)
+        goals_home, goals_away = (int(goals) for goals in score.split(":"))
+        results.append((home, away, goals_home, goals_away))
+    return results
+
+
+def event_probability(league, team, positions, num_simulations=None, tilt=None, seed=None, block_size=2000,
+                      tiebreak=None):
+    """
+    Оценивает вероятность редкого события «команда team займёт одно из мест positions»
+    выборкой по значимости (simulateImportance).
+
+    Параметры:
+    - league: словарь, который вернула fit.
+    - team: команда (название из league["teams"] или индекс).
+    - positions: места события, начиная с 1 (например, range(18, 21) — зона вылета).
+    - num_simulations: количество симуляций (None — значение модели по умолчанию).
+    - tilt: сдвиг рейтинга силы команды для выборки (None — выбирается пробным прогоном).
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - tiebreak: дополнительные показатели при равенстве очков, как у simulate.
+
+    Возвращает:
+    - probability: оценка вероятности события.
+    - error: стандартная ошибка оценки.
+    - tilt: использованный сдвиг рейтинга.
+    """
+    _, _, simulate_module = _load_modules(league["model"])
+
+    return drivers.simulateImportance(
+        simulate_module, league["season"], league["params"], _team_index(league, team), positions,
+        num_simulations or simulate_module.NUM_SIMULATIONS, tilt=tilt, block_size=block_size, seed=seed,
+        tiebreak_rules=_tiebreak_rules(league, simulate_module, tiebreak)
+    )
+
+
+def simulate_conditional(league, scenarios, num_simulations=None, seed=None, block_size=2000, tiebreak=None,
+                         sampling="plain"):
+    """
+    Вероятности мест при заданных исходах отдельных несыгранных матчей (simulateConditional).
+
+    Сценарии разыгрываются на общих случайных числах с обычной симуляцией, поэтому каждый
+    сценарий стоит малой доли полного прогона, а сдвиг вероятностей от него имеет небольшую ошибку.
+
+    Параметры:
+    - league: словарь, который вернула fit.
+    - scenarios: список сценариев; сценарий — строка "ХОЗЯЕВА ГОСТИ X:Y, ..." (см. parse_results)
+      или список кортежей (хозяева, гости, голы хозяев, голы гостей) с названиями или индексами команд.
+    - num_simulations: количество симуляций (None — значение модели по умолчанию).
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - tiebreak: дополнительные показатели при равенстве очков, как у simulate.
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+
+    Возвращает:
+    - team_positions: матрица финишных позиций без условий.
+    - scenario_positions: массив (сценарии × N × N) матриц финишных позиций при каждом сценарии.
+    - errors: стандартные ошибки разности вероятностей мест сценария и обычной симуляции.
+    - num_simulations: количество симуляций.
+    """
+    _, _, simulate_module = _load_modules(league["model"])
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+
+    scenarios = [
+        [
+            (_team_index(league, home), _team_index(league, away), goals_home, goals_away)
+            for home, away, goals_home, goals_away in (parse_results(scenario) if isinstance(scenario, str) else scenario)
+        ]
+        for scenario in scenarios
+    ]
+    played = league["season"][2]
+    for home, away, _, _ in (match for scenario in scenarios for match in scenario):
+        if home == away or played[home, away]:
+            raise ValueError(f"Ошибка: матча {league['teams'][home]} - {league['teams'][away]} нет среди оставшихся!")
+
+    team_positions, scenario_positions, errors = drivers.simulateConditional(
+        simulate_module, league["season"], league["params"], scenarios, num_simulations,
+        block_size=block_size, seed=seed, sampling=sampling,
+        tiebreak_rules=_tiebreak_rules(league, simulate_module, tiebreak)
+    )
+    return team_positions, scenario_positions, errors, num_simulations
+
+
+def fixture_impact(league, num_simulations=None, seed=None, block_size=2000, tiebreak=None, sampling="plain"):
+    """
+    Вероятности мест при каждом исходе каждого несыгранного матча за один прогон (simulateFixtureImpact).
+
+    Параметры:
+    - league: словарь, который вернула fit.
+    - num_simulations: количество симуляций (None — значение модели по умолчанию).
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - tiebreak: дополнительные показатели при равенстве очков, как у simulate.
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+
+    Возвращает:
+    - team_positions: матрица финишных позиций, как у simulate.
+    - home_idx, away_idx: индексы хозяев и гостей несыгранных матчей.
+    - outcome_positions: массив (матчи × 3 × N × N) финишных позиций при победе хозяев, ничьей и победе гостей.
+    - num_simulations: количество симуляций.
+    """
+    _, _, simulate_module = _load_modules(league["model"])
+    num_simulations = num_simulations or simulate_module.NUM_SIMULATIONS
+
+    team_positions, home_idx, away_idx, outcome_positions = drivers.simulateFixtureImpact(
+        simulate_module, league["season"], league["params"], num_simulations,
+        block_size=block_size, seed=seed, sampling=sampling,
+        tiebreak_rules=_tiebreak_rules(league, simulate_module, tiebreak)
+    )
+    return team_positions, home_idx, away_idx, outcome_positions, num_simulations
+
+
+def impact_table(teams, home_idx, away_idx, outcome_positions, positions):
+    """
+    Формирует таблицу значимости матчей для места или группы мест (например, чемпионства или зоны вылета).
+
+    Для каждого матча и каждой команды считается вероятность занять одно из мест positions
+    при победе хозяев, ничьей и победе гостей; размах — разность наибольшей и наименьшей из них.
+    В таблицу попадает команда с наибольшим размахом, матчи отсортированы по размаху.
+
+    Параметры:
+    - teams: список команд.
+    - home_idx, away_idx, outcome_positions: результат fixture_impact.
+    - positions: места, начиная с 1 (например, [1] — чемпионство, range(18, 21) — зона вылета).
+
+    Возвращает:
+    - df: таблица pandas.DataFrame со столбцами Home, Away, Team, Home win, Draw, Away win, Swing
+      (вероятности в процентах; Swing — размах в процентных пунктах).
+    """
+    outcome_counts = outcome_positions[:, :, 0, :].sum(axis=2)  # Сколько раз выпал каждый исход матча
+    hits = outcome_positions[:, :, :, np.asarray(positions) - 1].sum(axis=3)
+    with np.errstate(invalid="ignore"):
+        probs = 100 * hits / outcome_counts[:, :, None]  # (матчи × 3 × N); nan — исход ни разу не выпал
+    swings = np.nanmax(probs, axis=1) - np.nanmin(probs, axis=1)
+    most_affected = np.argmax(swings, axis=1)
+
+    rows = []
+    for f in np.argsort(-swings[np.arange(len(home_idx)), most_affected], kind="stable"):
+        team = most_affected[f]
+        rows.append(
+            [teams[home_idx[f]], teams[away_idx[f]], teams[team]]
+            + [f"{prob:.1f}%" for prob in probs[f, :, team]]
+            + [round(swings[f, team], 1)]
+        )
+
+    return pd.DataFrame(rows, columns=["Home", "Away", "Team", "Home win", "Draw", "Away win", "Swing"])
+
+
+def probabilities_table(teams, team_positions, num_simulations):
+    """
+    Формирует таблицу вероятностей мест в процентах.
+
+    Команды отсортированы по наиболее вероятному итогу сезона (по вероятностям мест).
+
+    Параметры:
+    - teams: список команд.
+    - team_positions: матрица финишных позиций из simulate.
+    - num_simulations: количество симуляций.
+
+    Возвращает:
+    - df: таблица pandas.DataFrame со столбцами Team, Position 1, Position 2, ...
+    """
+    teams_for_print = sorted(
+        teams,
+        key=lambda team: tuple(-p for p in team_positions[teams.index(team)])
+    )
+
+    formatted_results = []
+    for team_name in teams_for_print:
+        probas = 100 * team_positions[teams.index(team_name)] / num_simulations  # Вероятности в процентах
+        formatted_results.append([team_name] + [f"{prob:.1f}%" for prob in probas])
+
+    return pd.DataFrame(
+        formatted_results,
+        columns=["Team"] + [f"Position {i+1}" for i in range(team_positions.shape[1])]
+    )
+
+
+def write_probabilities(df, file_path):
+    """
+    Сохраняет таблицу вероятностей в Excel файл (папка создаётся при необходимости).
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    df.to_excel(file_path, index=False)
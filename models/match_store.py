@@ -0,0 +1,302 @@
+# Набор массивов сыгранных матчей файла чемпионата, его кэш и веса матчей. Всё это не зависит
+# от модели, поэтому общее для всех моделей; data_preprocess.py каждой модели только переводит
+# голы в свои массивы матчей (load_league) и таблицы (process_all_seasons).
+import pandas as pd
+import numpy as np
+import hashlib
+import os
+import re
+
+# Счёт сыгранного матча: голы хозяев, разделитель (":", "-", "–" или "—"), голы гостей
+SCORE_PATTERN = re.compile(r"^\s*(\d+)\s*[:\-–—]\s*(\d+)\s*$")
+
+def parse_score(result):
+    """
+    Разбирает ячейку таблицы сезона на голы хозяев и гостей.
+
+    Аргументы:
+    result : str
+        Строка с результатом матча в формате "X:Y" (или "X-Y", "X–Y"), число голов любое.
+
+    Возвращает:
+    tuple или None
+        Голы двух команд (int, int) или None, если матч не сыгран (пустая ячейка, прочерк).
+    """
+    match = SCORE_PATTERN.match(str(result))
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+# Версия формата кэша: увеличивается при любом изменении набора или смысла массивов
+CACHE_VERSION = 2
+
+def build_match_store(file):
+    """
+    Разбирает Excel файл со всеми сезонами в компактный колоночный набор массивов.
+
+    Аргументы:
+    file : str
+        Путь к Excel файлу с данными сезонов.
+
+    Возвращает:
+    dict
+        - team_names: названия всех команд (индекс в массиве — id команды),
+        - home, away: id хозяев и гостей каждого сыгранного матча (int16),
+        - home_goals, away_goals: голы хозяев и гостей (int8),
+        - season: метка сезона каждого матча (int8, 0 — последний сезон),
+        - last_teams: id команд последнего сезона в порядке таблицы,
+        - last_home_goals, last_away_goals: матрицы голов последнего сезона,
+        - last_played: маска сыгранных матчей последнего сезона.
+    """
+    team_ids = {}
+    home, away, home_goals, away_goals, season = [], [], [], [], []
+
+    with pd.ExcelFile(file) as xls:
+        for idx, sheet_name in enumerate(xls.sheet_names):
+            season_data = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+            teams = season_data.iloc[0, 1:].dropna().tolist()  # Извлечение названий команд
+            data = season_data.iloc[1:, 1:].fillna("").values.tolist()  # Получение матрицы результатов
+            season_label = -len(xls.sheet_names) + idx + 1  # Присваиваем метку сезона (для сортировки)
+
+            ids = [team_ids.setdefault(team, len(team_ids)) for team in teams]
+            num_teams = len(teams)
+            played = np.zeros((num_teams, num_teams), dtype=bool)
+            goals = np.zeros((2, num_teams, num_teams), dtype=np.int8)
+
+            for i in range(num_teams):
+                for j in range(num_teams):
+                    score = parse_score(data[i][j]) if i != j else None  # Исключаем матчи с самим собой
+                    if score is not None:  # и несыгранные
+                        goals[0, i, j], goals[1, i, j] = score
+                        played[i, j] = True
+
+            rows, cols = np.nonzero(played)
+            home.append(np.array(ids, dtype=np.int16)[rows])
+            away.append(np.array(ids, dtype=np.int16)[cols])
+            home_goals.append(goals[0][rows, cols])
+            away_goals.append(goals[1][rows, cols])
+            season.append(np.full(len(rows), season_label, dtype=np.int8))
+
+    return {
+        "team_names": np.array(list(team_ids), dtype=str),
+        "home": np.concatenate(home),
+        "away": np.concatenate(away),
+        "home_goals": np.concatenate(home_goals),
+        "away_goals": np.concatenate(away_goals),
+        "season": np.concatenate(season),
+        "last_teams": np.array(ids, dtype=np.int16),
+        "last_home_goals": goals[0],
+        "last_away_goals": goals[1],
+        "last_played": played,
+    }
+
+def load_match_store(file, cache_dir=None):
+    """
+    Возвращает набор массивов build_match_store, разбирая Excel файл только при изменении.
+
+    Кэш лежит в файле .npz рядом с Excel файлом (или в cache_dir) и хранит время изменения
+    и хэш исходного файла. Если время изменения совпадает, кэш используется сразу; если нет —
+    сравнивается хэш содержимого, и файл разбирается заново только при его изменении.
+
+    Аргументы:
+    file : str
+        Путь к Excel файлу с данными сезонов.
+    cache_dir : str, optional
+        Папка для кэша (по умолчанию ".match_cache" рядом с файлом).
+
+    Возвращает:
+    dict
+        Массивы, описанные в build_match_store.
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file)), ".match_cache")
+    cache_path = os.path.join(cache_dir, os.path.splitext(os.path.basename(file))[0] + ".npz")
+    mtime = os.stat(file).st_mtime_ns
+
+    source_hash = None
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            store = {key: cached[key] for key in cached.files}
+        if int(store.pop("cache_version")) == CACHE_VERSION:
+            cached_mtime, cached_hash = int(store.pop("source_mtime")), str(store.pop("source_hash"))
+            if cached_mtime == mtime:
+                return store
+            with open(file, "rb") as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()
+            if cached_hash == source_hash:
+                return store
+
+    if source_hash is None:
+        with open(file, "rb") as f:
+            source_hash = hashlib.sha256(f.read()).hexdigest()
+    store = build_match_store(file)
+
+    # Записываем во временный файл и переименовываем, чтобы не оставить повреждённый кэш
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, cache_version=CACHE_VERSION, source_mtime=mtime, source_hash=source_hash, **store)
+    os.replace(tmp_path, cache_path)
+
+    return store
+
+def restore_season_data(home_goals, away_goals, played):
+    """
+    Восстанавливает строковую матрицу результатов сезона из массивов голов.
+
+    Аргументы:
+    home_goals, away_goals : numpy.ndarray
+        Матрицы голов хозяев и гостей.
+    played : numpy.ndarray
+        Маска сыгранных матчей.
+
+    Возвращает:
+    list of list
+        Матрица строк "X:Y" для сыгранных матчей, "—" на диагонали и "" для несыгранных.
+    """
+    num_teams = len(played)
+    return [
+        ["—" if i == j else f"{home_goals[i, j]}:{away_goals[i, j]}" if played[i, j] else "" for j in range(num_teams)]
+        for i in range(num_teams)
+    ]
+
+# Даты матчей в файлах не записаны, поэтому время считается по календарю сезона: сезоны начинаются
+# раз в SEASON_DAYS дней, и матчи каждого сезона идут в течение SEASON_LENGTH_DAYS дней
+SEASON_DAYS = 365
+SEASON_LENGTH_DAYS = 280
+
+def decay_weights(season, progress, half_life_days):
+    """
+    Веса сезонов по периоду полураспада: вес дня, прошедшего age дней назад, равен 0.5 ** (age / half_life_days).
+
+    Дата матча внутри сезона неизвестна, поэтому все матчи сезона получают один вес — среднее
+    затухание по дням, в которые шёл сезон. Это не затухание по каждому матчу, как у Диксона и Коулза:
+    форма внутри сезона не учитывается. Текущий сезон сыгран на долю progress, поэтому его вес
+    больше, чем у законченного сезона, а прошлые сезоны старше на то же число дней.
+
+    Аргументы:
+    season : np.ndarray
+        Метка сезона каждого матча (0 — последний сезон, -1 — предыдущий, ...).
+    progress : float
+        Доля сыгранных матчей последнего сезона.
+    half_life_days : float
+        Период полураспада веса в днях.
+
+    Возвращает:
+    np.ndarray
+        Вес каждого матча (1 — матч, сыгранный сегодня).
+    """
+    # Сегодня — progress сезона от начала последнего сезона; возраст начала и конца каждого сезона в днях
+    today = progress * SEASON_LENGTH_DAYS
+    start = season * SEASON_DAYS
+    end = np.where(season == 0, today, start + SEASON_LENGTH_DAYS)
+    newest, oldest = today - end, today - start
+
+    # Среднее 0.5 ** (age / half_life_days) по возрастам от newest до oldest
+    rate = np.log(2) / half_life_days
+    span = np.maximum(oldest - newest, 1e-9)
+    return (np.exp(-rate * newest) - np.exp(-rate * oldest)) / (rate * span)
+
+def season_progress(played):
+    """
+    Доля сыгранных матчей последнего сезона.
+
+    Аргументы:
+    played : np.ndarray
+        Маска сыгранных матчей последнего сезона (команды × команды, диагональ не считается).
+
+    Возвращает:
+    float
+        Доля сыгранных матчей.
+    """
+    return played.sum() / max(played.size - len(played), 1)
+
+def match_weights(season, progress, season_weight_factor, half_life_days=None):
+    """
+    Веса матчей по меткам их сезонов.
+
+    Аргументы:
+    season : np.ndarray
+        Метка сезона каждого матча (0 — последний сезон, -1 — предыдущий, ...).
+    progress : float
+        Доля сыгранных матчей последнего сезона (season_progress).
+    season_weight_factor : float
+        Коэффициент уменьшения веса старых сезонов.
+    half_life_days : float или None
+        Период полураспада веса в днях (decay_weights); тогда season_weight_factor не используется.
+        None — вес season_weight_factor ** (-сезон).
+
+    Возвращает:
+    np.ndarray
+        Вес каждого матча.
+    """
+    season = np.asarray(season, dtype=float)
+    if half_life_days is None:
+        return np.power(season_weight_factor, -season)
+    return decay_weights(season, progress, half_life_days)
+
+def match_seasons(store):
+    """
+    Метки сезонов матчей load_league (в том же порядке, что и массивы матчей).
+
+    Аргументы:
+    store : dict
+        Набор массивов load_match_store файла.
+
+    Возвращает:
+    np.ndarray
+        Метка сезона каждого матча (0 — последний сезон, -1 — предыдущий, ...), int8.
+    """
+    in_last = np.zeros(len(store["team_names"]), dtype=bool)
+    in_last[store["last_teams"]] = True
+    return store["season"][in_last[store["home"]] & in_last[store["away"]]]
+
+def league_matches(file, season_weight_factor, use_cache=True, half_life_days=None, store=None):
+    """
+    Общая часть load_league моделей: матчи всех сезонов между командами последнего сезона с голами и весами.
+
+    Названия команд остаются только в возвращаемом списке: во всех массивах команда
+    задаётся своим индексом (id) в этом списке.
+
+    Аргументы:
+    file : str
+        Путь к Excel файлу с данными сезонов.
+    season_weight_factor : float
+        Коэффициент уменьшения веса старых сезонов.
+    use_cache : bool
+        Использовать кэш разобранного файла (см. load_match_store).
+    half_life_days : float или None
+        Период полураспада в днях, по которому считается вес сезона (decay_weights); тогда
+        season_weight_factor не используется. None — вес season_weight_factor ** (-сезон).
+    store : dict или None
+        Уже загруженный набор массивов load_match_store этого файла (например, при подборе
+        коэффициентов затухания, когда файл загружается один раз). None — загрузить.
+
+    Возвращает:
+    list, tuple, tuple
+        - Список команд последнего сезона,
+        - Матчи: (home, away, home_goals, away_goals, weight)
+          (id хозяев и гостей int16, голы хозяев и гостей int8, вес матча),
+        - Состояние последнего сезона: (home_goals, away_goals, played).
+    """
+    if store is None:
+        store = load_match_store(file) if use_cache else build_match_store(file)
+    last_teams = store["last_teams"]
+
+    # Перевод общих id команд в индексы команд последнего сезона (-1 — команды нет в последнем сезоне)
+    local_index = np.full(len(store["team_names"]), -1, dtype=np.int16)
+    local_index[last_teams] = np.arange(len(last_teams))
+    home, away = local_index[store["home"]], local_index[store["away"]]
+
+    # Отбираем только те матчи, где обе команды играли в последнем сезоне
+    keep = (home >= 0) & (away >= 0)
+    home, away = home[keep], away[keep]
+
+    # Вес матча не зависит от параметров модели, поэтому считается один раз и хранится вместе с матчами
+    weight = match_weights(
+        store["season"][keep], season_progress(store["last_played"]), season_weight_factor, half_life_days
+    )
+
+    teams = store["team_names"][last_teams].tolist()
+    season = (store["last_home_goals"], store["last_away_goals"], store["last_played"])
+    return teams, (home, away, store["home_goals"][keep], store["away_goals"][keep], weight), season
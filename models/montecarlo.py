@@ -0,0 +1,171 @@
+# Оценка точности Монте-Карло для вероятностей мест
+import numpy as np
+
+
+def position_standard_errors(team_positions, num_simulations):
+    """
+    Стандартная ошибка Монте-Карло каждой клетки матрицы финишных позиций.
+
+    Каждая клетка — доля симуляций, в которых команда заняла это место, поэтому её
+    ошибка равна sqrt(p (1 - p) / n).
+
+    Параметры:
+    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    - num_simulations: количество симуляций.
+
+    Возвращает:
+    - errors: матрица стандартных ошибок вероятностей (в долях, не в процентах).
+    """
+    probs = team_positions / num_simulations
+    return np.sqrt(probs * (1 - probs) / num_simulations)
+
+
+def confidence_intervals(team_positions, num_simulations, z=1.96):
+    """
+    Доверительные интервалы Уилсона для вероятностей мест.
+
+    В отличие от интервала p ± z * ошибка, интервал Уилсона не схлопывается в точку
+    для мест, которые ни разу не выпали, и не выходит за [0, 1].
+
+    Параметры:
+    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    - num_simulations: количество симуляций.
+    - z: квантиль нормального распределения (1.96 — интервал 95%).
+
+    Возвращает:
+    - lower, upper: матрицы нижних и верхних границ вероятностей.
+    """
+    probs = team_positions / num_simulations
+    denominator = 1 + z ** 2 / num_simulations
+    center = (probs + z ** 2 / (2 * num_simulations)) / denominator
+    half_width = z * np.sqrt(probs * (1 - probs) / num_simulations + z ** 2 / (4 * num_simulations ** 2)) / denominator
+    return np.clip(center - half_width, 0, 1), np.clip(center + half_width, 0, 1)
+
+
+def balance_positions(position_probs, tolerance=1e-10, max_iterations=1000):
+    """
+    Приводит матрицу вероятностей мест к матрице, у которой суммы всех строк и всех столбцов равны 1
+    (каждая команда занимает какое-то место, и каждое место занято какой-то командой).
+
+    Строки и столбцы по очереди делятся на свои суммы (алгоритм Синкхорна), пока суммы
+    не отличаются от 1 меньше чем на tolerance. Нулевые клетки остаются нулевыми.
+
+    Параметры:
+    - position_probs: матрица, где (i, j) — вероятность места j для команды i.
+    - tolerance: допустимое отклонение сумм строк и столбцов от 1.
+    - max_iterations: наибольшее число проходов.
+
+    Возвращает:
+    - position_probs: сбалансированная матрица.
+    """
+    position_probs = np.array(position_probs, dtype=float)
+    for _ in range(max_iterations):
+        position_probs /= np.maximum(position_probs.sum(axis=0, keepdims=True), 1e-300)
+        position_probs /= np.maximum(position_probs.sum(axis=1, keepdims=True), 1e-300)
+        if np.abs(position_probs.sum(axis=0) - 1).max() < tolerance:
+            break
+    return position_probs
+
+
+# Способы получения равномерных случайных чисел для розыгрыша матчей
+SAMPLING_METHODS = ("plain", "antithetic", "stratified")
+
+
+def draw_uniforms(rng, shape, sampling="plain"):
+    """
+    Равномерные случайные числа для блока симуляций (первая ось — симуляции).
+
+    - "plain": независимые числа;
+    - "antithetic": вторая половина симуляций использует 1 - u первой половины, поэтому исходы
+      каждого матча в паре симуляций отрицательно коррелированы;
+    - "stratified": для каждого матча (каждой клетки остальных осей) интервал [0, 1) делится
+      на num_simulations равных частей, и в каждую попадает ровно одно число (латинский гиперкуб):
+      доли исходов каждого матча в блоке почти точно равны их вероятностям.
+
+    Параметры:
+    - rng: генератор случайных чисел numpy.random.Generator.
+    - shape: форма массива (симуляции, ...).
+    - sampling: способ из SAMPLING_METHODS.
+
+    Возвращает:
+    - u: массив формы shape с числами из [0, 1).
+    """
+    num_simulations = shape[0]
+    if sampling == "plain":
+        return rng.random(shape)
+    if sampling == "antithetic":
+        half = rng.random(((num_simulations + 1) // 2,) + tuple(shape[1:]))
+        return np.concatenate([half, 1 - half])[:num_simulations]
+    if sampling == "stratified":
+        # Номер части для каждой симуляции, независимо перемешанный для каждого матча
+        strata = np.broadcast_to(np.arange(num_simulations).reshape((-1,) + (1,) * (len(shape) - 1)), shape)
+        strata = rng.permuted(strata, axis=0)
+        return (strata + rng.random(shape)) / num_simulations
+    raise ValueError(f"Ошибка: неизвестный способ {sampling}! Доступны: {', '.join(SAMPLING_METHODS)}")
+
+
+def difference_standard_errors(positions_a, positions_b, squared_differences, num_simulations):
+    """
+    Стандартная ошибка разности вероятностей мест двух наборов параметров на общих случайных числах.
+
+    В каждой симуляции разность индикаторов D = [место по a] - [место по b] принимает значения
+    -1, 0 или 1, а ошибка среднего равна sqrt((E[D^2] - E[D]^2) / n). При общих случайных числах
+    D почти всегда равна нулю, и ошибка намного меньше, чем у разности двух независимых прогонов.
+
+    Параметры:
+    - positions_a, positions_b: матрицы финишных позиций обоих прогонов.
+    - squared_differences: матрица сумм D^2 (сколько раз команда заняла это место ровно в одном из прогонов).
+    - num_simulations: количество симуляций.
+
+    Возвращает:
+    - errors: матрица стандартных ошибок разности вероятностей.
+    """
+    difference = (positions_a - positions_b) / num_simulations
+    variance = squared_differences / num_simulations - difference ** 2
+    return np.sqrt(np.maximum(variance, 0) / num_simulations)
+
+
+# Сдвиги рейтинга силы команды, из которых choose_tilt выбирает распределение для выборки по значимости
+IMPORTANCE_TILTS = (-1.5, -1.25, -1.0, -0.75, -0.5, -0.25, 0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5)
+
+
+def importance_estimate(weighted_hits, weighted_hits_squared, num_simulations):
+    """
+    Оценка вероятности события по выборке по значимости и её стандартная ошибка.
+
+    В каждой симуляции считается X = w * [событие], где w — отношение правдоподобий исходов матчей
+    по модели и по сдвинутому распределению. Среднее X — несмещённая оценка вероятности события,
+    а ошибка среднего равна sqrt((E[X^2] - E[X]^2) / n).
+
+    Параметры:
+    - weighted_hits: сумма X по всем симуляциям.
+    - weighted_hits_squared: сумма X^2 по всем симуляциям.
+    - num_simulations: количество симуляций.
+
+    Возвращает:
+    - probability: оценка вероятности события.
+    - error: стандартная ошибка оценки.
+    """
+    probability = weighted_hits / num_simulations
+    variance = weighted_hits_squared / num_simulations - probability ** 2
+    return probability, np.sqrt(max(variance, 0) / num_simulations)
+
+
+def choose_tilt(sample, tilts=IMPORTANCE_TILTS):
+    """
+    Выбирает сдвиг рейтинга с наименьшей относительной ошибкой по короткому пробному прогону.
+
+    Параметры:
+    - sample: функция, которая по сдвигу возвращает массив X = w * [событие] пробных симуляций.
+    - tilts: проверяемые сдвиги.
+
+    Возвращает:
+    - tilt: лучший сдвиг (0, если событие не выпало ни при одном сдвиге).
+    """
+    best_tilt, best_error = 0.0, np.inf
+    for tilt in tilts:
+        values = sample(tilt)
+        probability, error = importance_estimate(values.sum(), (values ** 2).sum(), len(values))
+        if probability > 0 and error / probability < best_error:
+            best_tilt, best_error = tilt, error / probability
+    return best_tilt
@@ -0,0 +1,159 @@
+# Запись исходов каждой симуляции на диск и запросы к ним без повторной симуляции
+import glob
+import json
+import os
+
+import numpy as np
+
+# Файл с описанием прогона в папке исходов
+METADATA_FILE = "outcomes.json"
+
+
+def write_block(prefix, start, places, points):
+    """
+    Сохраняет исходы блока симуляций в два файла .npy (их можно открыть через np.load(..., mmap_mode="r")).
+
+    Параметры:
+    - prefix: путь и начало имени файлов процесса (например, "outcomes/part000").
+    - start: номер первой симуляции блока в процессе.
+    - places: массив (симуляции × N), places[s, i] — место команды i в симуляции s (с нуля).
+    - points: массив (симуляции × N) итоговых очков команд.
+    """
+    np.save(f"{prefix}_{start:010d}_places.npy", places.astype(np.int8))
+    np.save(f"{prefix}_{start:010d}_points.npy", points.astype(np.int16))
+
+
+def prepare_directory(directory):
+    """
+    Создаёт папку для исходов и удаляет из неё исходы и описание прошлого прогона.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*_places.npy")) + glob.glob(os.path.join(directory, "*_points.npy")):
+        os.remove(path)
+    if os.path.exists(os.path.join(directory, METADATA_FILE)):
+        os.remove(os.path.join(directory, METADATA_FILE))
+
+
+def write_metadata(directory, league, num_simulations):
+    """
+    Записывает описание прогона (чемпионат, модель, команды, количество симуляций) рядом с исходами.
+    """
+    metadata = {
+        "name": league["name"],
+        "model": league["model"],
+        "teams": list(league["teams"]),
+        "num_simulations": int(num_simulations),
+    }
+    with open(os.path.join(directory, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=1)
+
+
+def load_metadata(directory):
+    """
+    Загружает описание прогона, записанное write_metadata.
+    """
+    with open(os.path.join(directory, METADATA_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_outcomes(directory):
+    """
+    Перебирает сохранённые блоки исходов, не загружая их в память целиком.
+
+    Параметры:
+    - directory: папка с исходами.
+
+    Возвращает:
+    - генератор пар (places, points) — массивов блока, открытых через np.load(..., mmap_mode="r").
+    """
+    for places_path in sorted(glob.glob(os.path.join(directory, "*_places.npy"))):
+        points_path = places_path[:-len("_places.npy")] + "_points.npy"
+        yield np.load(places_path, mmap_mode="r"), np.load(points_path, mmap_mode="r")
+
+
+def team_index(directory, team):
+    """
+    Индекс команды в массивах исходов по названию (или сам индекс, если передано число).
+    """
+    if isinstance(team, str):
+        teams = load_metadata(directory)["teams"]
+        if team not in teams:
+            raise ValueError(f"Ошибка: команды {team} нет в исходах {directory}!")
+        return teams.index(team)
+    return team
+
+
+def finishes(team, positions, directory=None):
+    """
+    Событие «команда team займёт одно из мест positions» для outcome_probability.
+
+    Параметры:
+    - team: название команды (тогда нужен directory) или её индекс в массивах исходов.
+    - positions: места, начиная с 1 (например, range(18, 21) — зона вылета).
+    - directory: папка с исходами, по описанию которой название переводится в индекс (см. team_index).
+
+    Возвращает:
+    - event: функция (places, points) -> булев массив по симуляциям блока.
+    """
+    if isinstance(team, str):
+        if directory is None:
+            raise ValueError(f"Ошибка: для команды {team} по названию нужна папка с исходами directory!")
+        team = team_index(directory, team)
+    places = np.asarray(positions) - 1
+    return lambda block_places, block_points: np.isin(block_places[:, team], places)
+
+
+def outcome_probability(directory, event, given=None):
+    """
+    Вероятность события по всем сохранённым симуляциям, при условии given (если задано).
+
+    События — функции (places, points) -> булев массив по симуляциям блока, например finishes(...);
+    совместные события записываются как lambda pl, pt: a(pl, pt) & b(pl, pt).
+
+    Параметры:
+    - directory: папка с исходами.
+    - event: событие, вероятность которого нужно найти.
+    - given: условие (None — без условия).
+
+    Возвращает:
+    - probability: доля симуляций с событием среди симуляций, где выполнено условие.
+    - error: стандартная ошибка sqrt(p (1 - p) / n) по n симуляциям с условием.
+    - num_given: количество симуляций, где выполнено условие.
+    """
+    hits = num_given = 0
+    for places, points in iter_outcomes(directory):
+        mask = np.ones(len(places), dtype=bool) if given is None else given(places, points)
+        hits += np.count_nonzero(event(places, points) & mask)
+        num_given += np.count_nonzero(mask)
+
+    if num_given == 0:
+        return np.nan, np.nan, 0
+    probability = hits / num_given
+    return probability, np.sqrt(probability * (1 - probability) / num_given), num_given
+
+
+def points_distribution(directory):
+    """
+    Распределение итоговых очков каждой команды по сохранённым симуляциям.
+
+    Параметры:
+    - directory: папка с исходами (ValueError, если исходов в ней нет).
+
+    Возвращает:
+    - points_probs: матрица, где (i, t) — доля симуляций, в которых команда i набрала t очков.
+    """
+    counts = None
+    for _, points in iter_outcomes(directory):
+        num_teams, max_points = points.shape[1], int(points.max()) + 1
+        block_counts = np.bincount(
+            (np.arange(num_teams) * max_points + points).ravel(), minlength=num_teams * max_points
+        ).reshape(num_teams, max_points)
+        if counts is None:
+            counts = block_counts
+        else:
+            width = max(counts.shape[1], max_points)
+            counts = np.pad(counts, ((0, 0), (0, width - counts.shape[1])))
+            counts[:, :max_points] += block_counts
+    if counts is None:
+        raise ValueError(f"Ошибка: в папке {directory} нет сохранённых исходов симуляций!")
+    return counts / counts.sum(axis=1, keepdims=True)
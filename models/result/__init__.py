@@ -0,0 +1 @@
+"""Модель исходов матчей (П1, X, П2)."""
@@ -1,8 +1,9 @@
 from scipy.stats import poisson  # Распределение Пуассона
 import numpy as np  # Numpy для математических операций
+from scipy.optimize import minimize  # Для оптимизации параметров модели
 
 # Функция расчёта вероятностей исходов матча
-def count_teams_probs(s, h, d, home, away, team_to_index):
+def count_teams_probs(s, h, d, home, away):
     """
     Рассчитывает вероятности исходов (П1, Х, П2) на основе рейтингов силы команд.
     
@@ -10,17 +11,16 @@ def count_teams_probs(s, h, d, home, away, team_to_index):
     - s: массив рейтингов силы команд.
     - h: бонус домашнего поля.
     - d: фактор ничьей.
-    - home: название команды-хозяина.
-    - away: название команды-гостя.
-    - team_to_index: словарь {команда: индекс}.
+    - home: индекс команды-хозяина (или массив индексов).
+    - away: индекс команды-гостя (или массив индексов).
 
     Возвращает:
     - prob_home: вероятность победы хозяев.
     - prob_away: вероятность победы гостей.
     - prob_draw: вероятность ничьей.
     """
-    home_strength = np.exp(s[team_to_index[home]] - s[team_to_index[away]] + h)
-    away_strength = np.exp(s[team_to_index[away]] - s[team_to_index[home]] - h)
+    home_strength = np.exp(s[home] - s[away] + h)
+    away_strength = np.exp(s[away] - s[home] - h)
     draw = np.exp(d)
     
     all_prob = home_strength + away_strength + draw
@@ -29,36 +29,132 @@ def count_teams_probs(s, h, d, home, away, team_to_index):
     return prob_home, prob_away, prob_draw
 
 # Функция потерь для оптимизации предсказания исходов матчей
-def loss_goals(params, season_weight_factor, result_n, team_to_index, num_teams):
+def loss_goals(params, matches, num_teams, league=None):
     """
-    Функция потерь для предсказания исходов матчей (П1, X, П2).
+    Функция потерь для предсказания исходов матчей (П1, X, П2) и её точный градиент.
     
     Параметры:
     - params: массив параметров модели (силы команд + бонус хозяев + фактор ничьей).
-    - season_weight_factor: коэффициент уменьшения веса старых сезонов.
-    - result_n: список матчей (хозяева, гости, исход (1=П1, 0=X, -1=П2), сезон).
-    - team_to_index: словарь {команда: индекс}.
+    - matches: массивы (home, away, result, weight) из data_preprocess.load_league.
     - num_teams: количество команд.
+    - league: для нескольких чемпионатов сразу (см. fit) — номер чемпионата каждого матча; тогда после
+      сил всех команд в params идут бонусы хозяев всех чемпионатов, затем их факторы ничьей. None — один чемпионат.
 
     Возвращает:
     - total_loss: сумму -log(вероятность исхода), которую мы минимизируем.
+    - grad: градиент total_loss по params.
     """
+    home, away, result, weight = matches
     s = params[:num_teams]  # Силы команд
-    h = params[num_teams]   # Бонус домашних матчей
-    d = params[num_teams + 1]  # Фактор ничьей
+    if league is None:
+        h = params[num_teams]   # Бонус домашних матчей
+        d = params[num_teams + 1]  # Фактор ничьей
+    else:
+        num_leagues = (len(params) - num_teams) // 2
+        h, d = params[num_teams:num_teams + num_leagues][league], params[num_teams + num_leagues:][league]
 
-    total_loss = 0  # Ошибка предсказания исходов матчей
-    
-    for home, away, result, season in result_n:
-        p_win_home, p_win_away, p_draw = count_teams_probs(s, h, d, home, away, team_to_index)
-        # Вычисление потерь на основе результата матча
-        season_weight = np.power(season_weight_factor, -season)
-
-        if result == 1:
-            total_loss -= np.log(p_win_home) * season_weight
-        elif result == 0:
-            total_loss -= np.log(p_draw) * season_weight
-        elif result == -1:
-            total_loss -= np.log(p_win_away) * season_weight
-
-    return total_loss
+    # Логиты исходов (П1, П2, Х) для всех матчей сразу
+    logits = np.empty((len(home), 3))
+    logits[:, 0] = s[home] - s[away] + h
+    logits[:, 1] = -logits[:, 0]
+    logits[:, 2] = d
+
+    # Устойчивый логарифм нормировки softmax
+    max_logit = logits.max(axis=1, keepdims=True)
+    log_norm = max_logit[:, 0] + np.log(np.exp(logits - max_logit).sum(axis=1))
+    probs = np.exp(logits - log_norm[:, None])
+
+    # Номер столбца фактического исхода: П1 -> 0, П2 -> 1, Х -> 2
+    column = np.where(result == 1, 0, np.where(result == -1, 1, 2))
+    total_loss = -np.sum((logits[np.arange(len(home)), column] - log_norm) * weight)
+
+    # Производная -log(p) по логитам: p - [исход]
+    probs[np.arange(len(home)), column] -= 1
+    probs *= weight[:, None]
+    g_match = probs[:, 0] - probs[:, 1]  # Логит П1 растёт, логит П2 убывает вместе с s[home] - s[away] + h
+
+    grad = np.zeros_like(params, dtype=float)
+    grad[:num_teams] = np.bincount(home, g_match, num_teams) - np.bincount(away, g_match, num_teams)
+    if league is None:
+        grad[num_teams] = g_match.sum()
+        grad[num_teams + 1] = probs[:, 2].sum()
+    else:
+        grad[num_teams:num_teams + num_leagues] = np.bincount(league, g_match, num_leagues)
+        grad[num_teams + num_leagues:] = np.bincount(league, probs[:, 2], num_leagues)
+
+    return total_loss, grad
+
+
+# Матрица вторых производных функции потерь (для неопределённости параметров)
+def hessian(params, matches, num_teams):
+    """
+    Точная матрица Гессе функции потерь loss_goals.
+
+    Логиты исходов линейны по параметрам: П1 — x · params, П2 — -x · params (x = e_home - e_away + e_h),
+    Х — фактор ничьей. Вклад матча — weight * J^T (diag(p) - p p^T) J, где J — строки логитов.
+
+    Параметры:
+    - params: массив параметров модели (силы команд + бонус хозяев + фактор ничьей), обычно res.x.
+    - matches: массивы (home, away, result, weight) из data_preprocess.load_league.
+    - num_teams: количество команд.
+
+    Возвращает:
+    - hessian: матрица (параметры × параметры), см. uncertainty.laplace_draws.
+    """
+    home, away, _, weight = matches
+    s, h, d = params[:num_teams], params[num_teams], params[num_teams + 1]
+    prob_home, prob_away, prob_draw = count_teams_probs(s, h, d, home, away)
+
+    rows = np.arange(len(home))
+    x = np.zeros((len(home), len(params)))
+    x[rows, home] += 1
+    x[rows, away] -= 1
+    x[:, num_teams] = 1
+
+    # Коэффициенты при x x^T, x e_d^T (и e_d x^T) и e_d e_d^T
+    c_xx = weight * (prob_home + prob_away - (prob_home - prob_away) ** 2)
+    c_xd = weight * prob_draw * (prob_away - prob_home)
+    c_dd = weight * prob_draw * (1 - prob_draw)
+
+    hessian = x.T @ (c_xx[:, None] * x)
+    cross = x.T @ c_xd
+    hessian[:, num_teams + 1] += cross
+    hessian[num_teams + 1, :] += cross
+    hessian[num_teams + 1, num_teams + 1] += c_dd.sum()
+    return hessian
+
+
+# Коэффициент затухания веса сезонов по умолчанию (старые сезоны менее значимы)
+SEASON_WEIGHT_FACTOR = 0.5
+
+
+# Обучение модели
+def fit(matches, num_teams, initial_params=None, callback=None, team_league=None):
+    """
+    Подбирает силы команд, бонус домашнего поля и фактор ничьей, минимизируя функцию потерь.
+
+    Параметры:
+    - matches: массивы матчей из data_preprocess.load_league.
+    - num_teams: количество команд.
+    - initial_params: начальные параметры (None — нули; для тёплого старта — прошлые параметры).
+    - callback: функция, которая вызывается после каждой итерации оптимизатора.
+    - team_league: номер чемпионата каждой команды, если обучаются несколько чемпионатов сразу
+      (см. league.fit_leagues): матчи всех чемпионатов сложены в одни массивы, команды пронумерованы подряд,
+      и одна оптимизация подбирает параметры всех чемпионатов. None — один чемпионат.
+
+    Возвращает:
+    - res: результат scipy.optimize.minimize, оптимизированные параметры в res.x (силы команд, бонус домашнего поля, фактор ничьей;
+      с team_league — силы всех команд, затем бонусы всех чемпионатов, затем их факторы ничьей).
+    """
+    num_leagues = 1 if team_league is None else int(team_league.max()) + 1
+    if initial_params is None:
+        initial_params = np.zeros(num_teams + 2 * num_leagues)
+
+    return minimize(
+        loss_goals,  # Функция потерь
+        initial_params,  # Начальные параметры
+        args=(matches, num_teams, None if team_league is None else team_league[matches[0]]),  # Дополнительные аргументы
+        method="L-BFGS-B",  # Метод оптимизации
+        jac=True,  # Функция потерь сама возвращает точный градиент
+        callback=callback
+    )
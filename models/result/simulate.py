@@ -1,125 +1,300 @@
+# Розыгрыш матчей модели исходов и точный режим simulateExact. Остальные прогоны сезона (simulateScore,
+# simulateAdaptive и другие) общие для всех моделей и находятся в models/drivers.py, которому передаётся этот модуль.
 import numpy as np
-from model import count_teams_probs 
+from .model import count_teams_probs
+from ..tiebreak import rank_teams
+from ..montecarlo import draw_uniforms, balance_positions
 from tqdm import tqdm
 
-def calculate_head_to_head_stats(results_matrix, teams, tied_teams):
+# Количество симуляций по умолчанию
+NUM_SIMULATIONS = 5000
+
+# Дополнительные показатели при равенстве очков (см. tiebreak.CRITERIA). Симулируется только исход,
+# поэтому разница мячей не информативна: очки в личных встречах, общее число побед, рейтинг силы команды
+TIEBREAK_RULES = ("head_to_head_points", "wins", "strength")
+
+def fixture_table(season, team_strengths, home_bonus, draw_factor):
+    """
+    Таблица несыгранных матчей сезона. Параметры модели во время симуляции не меняются, поэтому
+    таблица считается один раз за прогон, и все блоки симуляций берут из неё готовые массивы.
+
+    Параметры:
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - team_strengths: рейтинг силы каждой команды.
+    - home_bonus: дополнительный бонус для домашних матчей.
+    - draw_factor: фактор ничьей.
+
+    Возвращает:
+    - fixtures: словарь с ключами home, away (индексы хозяев и гостей несыгранных матчей),
+      probs (число матчей × 3, вероятности П1, П2, Х) и cdf (число матчей × 2, границы P(П1)
+      и P(П1) + P(П2) для розыгрыша исхода по равномерному числу).
+    """
+    played = season[2]
+    home_idx, away_idx = np.nonzero(~played & ~np.eye(len(played), dtype=bool))
+    probs = np.stack(count_teams_probs(team_strengths, home_bonus, draw_factor, home_idx, away_idx), axis=1)
+
+    return {"home": home_idx, "away": away_idx, "probs": probs, "cdf": np.cumsum(probs[:, :2], axis=1)}
+
+
+def fixture_tables(season, param_draws, num_teams):
+    """
+    Таблицы несыгранных матчей для нескольких наборов параметров сразу (по одной на блок симуляций,
+    см. drivers.simulateScore с hessian): вероятности исходов считаются одним проходом.
+
+    Параметры:
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - param_draws: массив (наборы × параметры), строки — силы команд, бонус домашнего поля и фактор ничьей.
+    - num_teams: количество команд.
+
+    Возвращает:
+    - tables: список таблиц, как у fixture_table, по одной на набор параметров.
+    """
+    played = season[2]
+    home_idx, away_idx = np.nonzero(~played & ~np.eye(len(played), dtype=bool))
+    # Силы команд передаются столбцами (команды × наборы), поэтому вероятности — (матчи × наборы)
+    probs = np.stack(count_teams_probs(
+        param_draws[:, :num_teams].T, param_draws[:, num_teams], param_draws[:, num_teams + 1], home_idx, away_idx
+    ), axis=2).transpose(1, 0, 2)
+
+    return [
+        {"home": home_idx, "away": away_idx, "probs": probs[k], "cdf": np.cumsum(probs[k, :, :2], axis=1)}
+        for k in range(len(param_draws))
+    ]
+
+
+def block_outcomes(cdf, u):
     """
-    Рассчитывает статистику личных встреч между командами из списка tied_teams:
-    - Очки, набранные в матчах друг с другом.
-    - Количество побед в личных встречах.
+    Превращает равномерные случайные числа в исходы матчей.
+
+    Параметры:
+    - cdf: массив (число матчей × 2) границ исходов из fixture_table.
+    - u: массив (симуляции × число матчей) равномерных чисел из [0, 1).
+
+    Возвращает:
+    - home_goals, away_goals: массивы (симуляции × число матчей) с голами хозяев и гостей
+      (победа записывается как 1:0, ничья — 0:0, поражение — 0:1).
     """
-    num_teams = len(teams)
+    home_win = u < cdf[:, 0]
+    away_win = (u >= cdf[:, 0]) & (u < cdf[:, 1])
 
-    # Статистика для личных встреч
-    head_to_head_points = {team: 0 for team in tied_teams}
-    wins = {team: 0 for team in teams}
+    return home_win.astype(np.int8), away_win.astype(np.int8)
 
-    for i in range(num_teams):
-        for j in range(num_teams):
-            if i == j:
-                continue  # Пропускаем матчи против самих себя
-            
-            home_team = teams[i]
-            away_team = teams[j]
-            home_goals, away_goals = int(results_matrix[i][j][0]), int(results_matrix[i][j][-1])
-            if home_goals > away_goals:
-                wins[home_team] += 1
-            elif home_goals < away_goals:
-                wins[away_team] += 1
 
-            # Если обе команды в списке tied_teams, учитываем личные встречи
-            if home_team in tied_teams and away_team in tied_teams:
-                # Очки в личных встречах
-                if home_goals > away_goals:
-                    head_to_head_points[home_team] += 3
-                elif home_goals < away_goals:
-                    head_to_head_points[away_team] += 3
-                else:
-                    head_to_head_points[home_team] += 1
-                    head_to_head_points[away_team] += 1
+def simulate_block(fixtures, num_simulations, rng, sampling="plain"):
+    """
+    Разыгрывает все оставшиеся матчи сразу для целого блока симуляций.
 
-    return head_to_head_points, wins
+    Параметры:
+    - fixtures: таблица несыгранных матчей из fixture_table.
+    - num_simulations: количество симуляций в блоке.
+    - rng: генератор случайных чисел numpy.random.Generator.
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
 
+    Возвращает:
+    - home_goals, away_goals: массивы (num_simulations × число матчей) с голами хозяев и гостей
+      (победа записывается как 1:0, ничья — 0:0, поражение — 0:1).
+    """
+    cdf = fixtures["cdf"]
+    return block_outcomes(cdf, draw_uniforms(rng, (num_simulations, len(cdf)), sampling))
 
+def scenario_goals(goals_home, goals_away):
+    """
+    Счёт матча сценария «что, если» в записи simulate_block: учитывается только исход
+    (победа — 1:0, ничья — 0:0, поражение — 0:1).
+    """
+    return int(goals_home > goals_away), int(goals_home < goals_away)
 
-def simulateScore(data, teams, team_strengths, home_bonus, draw_factor, team_to_index, num_simulations=3500):
+
+def log_likelihood_ratio(fixtures, tilted_fixtures, home, away):
+    """
+    Логарифм отношения правдоподобий разыгранных исходов по модели и по сдвинутой модели
+    (вес симуляции в drivers.simulateImportance).
+
+    Параметры:
+    - fixtures: таблица несыгранных матчей по модели (fixture_table).
+    - tilted_fixtures: таблица тех же матчей со сдвинутыми параметрами, по которой разыграны исходы.
+    - home, away: массивы (симуляции × число матчей) с голами хозяев и гостей из simulate_block.
+
+    Возвращает:
+    - log_weights: массив (симуляции) сумм по матчам log(вероятность исхода по модели / сдвинутая вероятность).
     """
-    Симулирует оставшиеся матчи сезона и определяет распределение вероятностей финишных позиций команд.
+    log_ratio = np.log(fixtures["probs"]) - np.log(tilted_fixtures["probs"])
+    # Номер исхода каждого матча в столбцах probs: 0 — П1, 1 — П2, 2 — Х
+    outcome = np.where(home > away, 0, np.where(home < away, 1, 2))
+    return log_ratio[np.arange(len(fixtures["home"])), outcome].sum(axis=1)
+
+
+def points_distribution(season, fixtures):
+    """
+    Точно считает распределение итоговых очков каждой команды динамическим программированием.
+
+    Исходы оставшихся матчей независимы, поэтому итоговые очки команды — это текущие очки
+    плюс свёртка распределений очков (0, 1 или 3) в каждом её несыгранном матче.
 
     Параметры:
-    - data: матрица текущих результатов матчей (частично заполнена).
-    - teams: список всех команд.
+    - season: состояние текущего сезона (home_goals, away_goals, played).
+    - fixtures: таблица несыгранных матчей из fixture_table.
+
+    Возвращает:
+    - points_probs: матрица, где (i, t) — вероятность того, что команда i наберёт t очков.
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    home_idx, away_idx = fixtures["home"], fixtures["away"]
+
+    # Текущие очки по сыгранным матчам
+    home_points = np.where(played, 3 * (home_goals > away_goals) + (home_goals == away_goals), 0)
+    away_points = np.where(played, 3 * (home_goals < away_goals) + (home_goals == away_goals), 0)
+    current_points = home_points.sum(axis=1) + away_points.sum(axis=0)
+
+    remaining = np.bincount(home_idx, minlength=num_teams) + np.bincount(away_idx, minlength=num_teams)
+    points_probs = np.zeros((num_teams, (current_points + 3 * remaining).max() + 1))
+    points_probs[np.arange(num_teams), current_points] = 1
+
+    # Добавляем матчи по одному: распределение сдвигается на 3 (победа), 1 (ничья) или 0 (поражение)
+    for (p_home, p_away, p_draw), home, away in zip(fixtures["probs"], home_idx, away_idx):
+        for team, p_win, p_loss in ((home, p_home, p_away), (away, p_away, p_home)):
+            dist = points_probs[team]
+            new_dist = p_loss * dist
+            new_dist[1:] += p_draw * dist[:-1]
+            new_dist[3:] += p_win * dist[:-3]
+            points_probs[team] = new_dist
+
+    return points_probs
+
+
+def enumerate_positions(season, fixtures, team_strengths, block_size=2000, tiebreak_rules=TIEBREAK_RULES):
+    """
+    Точно считает вероятности финишных позиций перебором всех исходов оставшихся матчей.
+
+    Подходит для конца сезона: число вариантов равно 3 в степени числа несыгранных матчей.
+
+    Параметры:
+    - season: состояние текущего сезона (home_goals, away_goals, played).
+    - fixtures: таблица несыгранных матчей из fixture_table.
+    - team_strengths: рейтинг силы каждой команды.
+    - block_size: количество вариантов, обрабатываемых за один проход.
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков.
+
+    Возвращает:
+    - position_probs: матрица, где (i, j) — вероятность того, что команда i займёт место j.
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    home_idx, away_idx, probs = fixtures["home"], fixtures["away"], fixtures["probs"]
+    num_matches = len(home_idx)
+    num_variants = 3 ** num_matches
+    position_probs = np.zeros((num_teams, num_teams))
+    powers = 3 ** np.arange(num_matches)
+
+    for start in range(0, num_variants, block_size):
+        variants = np.arange(start, min(start + block_size, num_variants))
+
+        # Исход каждого матча в варианте: 0 — П1, 1 — П2, 2 — Х; вероятность варианта — произведение
+        outcomes = (variants[:, None] // powers) % 3
+        weights = np.prod(probs[np.arange(num_matches), outcomes], axis=1)
+
+        sim_home_goals = np.repeat(home_goals[None], len(variants), axis=0)
+        sim_away_goals = np.repeat(away_goals[None], len(variants), axis=0)
+        sim_home_goals[:, home_idx, away_idx] = outcomes == 0
+        sim_away_goals[:, home_idx, away_idx] = outcomes == 1
+
+        order = rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, team_strengths)
+        position_probs += np.bincount(
+            (order * num_teams + np.arange(num_teams)).ravel(),
+            weights=np.repeat(weights, num_teams), minlength=num_teams * num_teams
+        ).reshape(num_teams, num_teams)
+
+    return position_probs
+
+
+def simulateExact(season, team_strengths, home_bonus, draw_factor, num_simulations=5000, block_size=2000, seed=None,
+                  max_variants=3 ** 10, tiebreak_rules=TIEBREAK_RULES, sampling="plain"):
+    """
+    Считает вероятности финишных позиций с точными распределениями очков.
+
+    Распределение итоговых очков каждой команды считается точно (points_distribution).
+    Монте-Карло используется только для того, чтобы узнать, какое место занимает команда
+    при данном количестве своих очков (это зависит от соперников и дополнительных показателей):
+    P(место k) = сумма по t точной P(очки = t) * оценённой P(место k | очки = t).
+    Поэтому часть разброса, связанная с очками самой команды, исчезает, и для той же точности
+    нужно намного меньше симуляций. Если место команды полностью определяется её очками,
+    результат точный.
+
+    Оценки P(место | очки) разных команд независимы, поэтому суммы столбцов (вероятность того,
+    что место кем-то занято) отличаются от 1 (при 5000 симуляций — до 1%). В конце матрица
+    балансируется (montecarlo.balance_positions), и суммы её строк и столбцов равны 1.
+
+    Если вариантов исходов оставшихся матчей не больше max_variants, все они перебираются
+    (enumerate_positions) и вероятности мест точные, включая дополнительные показатели.
+
+    Параметры:
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
     - team_strengths: рейтинг силы каждой команды.
     - home_bonus: дополнительный бонус для домашних матчей.
-    - team_to_index: словарь соответствия команд их индексам.
-    - num_simulations: количество симуляций.
+    - draw_factor: фактор ничьей.
+    - num_simulations: количество симуляций для оценки P(место | очки).
+    - block_size: количество симуляций, обрабатываемых за один проход.
+    - seed: зерно генератора случайных чисел (None — случайное).
+    - max_variants: наибольшее число вариантов исходов, при котором они перебираются полностью.
+    - tiebreak_rules: порядок дополнительных показателей при равенстве очков (см. tiebreak.LEAGUE_RULES).
+    - sampling: способ получения случайных чисел для оценки P(место | очки).
 
     Возвращает:
-    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
-    """
-    results = np.copy(data)  # Копируем матрицу матчей, чтобы не изменять оригинал
-    team_positions = np.zeros((len(teams), len(teams)))  # Матрица финишных позиций команд
-    
-    for _ in tqdm(range(num_simulations), desc="Прогресс", unit="шаг", ncols=100):
-        sim_results = np.copy(results)  # Копируем текущие результаты
-
-        # Симулируем каждый незаконченный матч
-        for i, home_team in enumerate(teams):
-            for j, away_team in enumerate(teams):
-                if i != j and len(sim_results[i][j]) < 3:
-                    # Рассчитываем ожидаемые голы для обеих команд
-                    home_pr, away_pr, draw_pr = count_teams_probs(team_strengths, home_bonus, draw_factor, home_team, away_team, team_to_index)
-                    outcomes = [1, -1, 0]
-                    probabilities = [home_pr, away_pr, draw_pr]
-                    
-                    match_result = np.random.choice(outcomes, p=probabilities)
-                    if match_result==1:
-                        home_goals = 1
-                        away_goals = 0
-                    elif match_result==0:
-                        home_goals = 0
-                        away_goals = 0
-                    else:
-                        home_goals = 0
-                        away_goals = 1
-
-                    # Записываем результат матча
-                    sim_results[i][j] = f"{home_goals}:{away_goals}"
-                
-        # Подсчёт очков для каждой команды
-        team_points = np.zeros(len(teams))
-        for i, team in enumerate(teams):
-            team_points[i] += np.sum([3 if sim_results[i][j][0] > sim_results[i][j][-1] else 0 for j in range(len(teams))])
-            team_points[i] += np.sum([1 if sim_results[i][j][0] == sim_results[i][j][-1] else 0 for j in range(len(teams))])
-            team_points[i] += np.sum([3 if sim_results[j][i][0] < sim_results[j][i][-1] else 0 for j in range(len(teams))])
-            team_points[i] += np.sum([1 if sim_results[j][i][0] == sim_results[j][i][-1] else 0 for j in range(len(teams))])
-
-        # Получаем уникальные значения очков и сортируем их по убыванию
-        unique_points = np.unique(team_points)[::-1]
-        sorted_teams = []
-
-        # Разрешаем ситуации, когда несколько команд набрали одинаковое количество очков
-        for points in unique_points:
-            tied_teams = [teams[i] for i in range(len(teams)) if team_points[i] == points]
-
-            if len(tied_teams) > 1:
-                # Подсчитываем дополнительные параметры для сортировки
-                head_to_head_points, total_wins = calculate_head_to_head_stats(sim_results, teams, tied_teams)
-
-                # Сортируем команды по дополнительным критериям
-                tied_teams.sort(
-                    key=lambda team: (
-                        -head_to_head_points[team],  # Очки в личных встречах
-                        -total_wins[team],
-                        -team_strengths[team_to_index[team]] 
-                    )
-                )
-
-            sorted_teams.extend(tied_teams)
-
-        # Обновляем матрицу финишных позиций
-        for idx, team in enumerate(sorted_teams):
-            team_idx = teams.index(team)
-            team_positions[team_idx][idx] += 1  # Засчитываем место, которое команда заняла в симуляции
-    
-    return team_positions
+    - team_positions: матрица той же формы и нормировки, что у drivers.simulateScore
+      ((i, j) — вероятность места j для команды i, умноженная на num_simulations).
+    - points_probs: точное распределение итоговых очков (см. points_distribution).
+    """
+    home_goals, away_goals, played = season
+    num_teams = len(played)
+    rng = np.random.default_rng(seed)
+
+    # Список оставшихся матчей (хозяева, гости) и вероятности их исходов
+    fixtures = fixture_table(season, team_strengths, home_bonus, draw_factor)
+    home_idx, away_idx = fixtures["home"], fixtures["away"]
+
+    points_probs = points_distribution(season, fixtures)
+    if 3 ** len(home_idx) <= max_variants:
+        position_probs = enumerate_positions(season, fixtures, team_strengths, block_size, tiebreak_rules)
+        return position_probs * num_simulations, points_probs
+
+    max_points = points_probs.shape[1]
+
+    # counts[i, t, k] — сколько раз команда i набрала t очков и заняла место k
+    counts = np.zeros((num_teams, max_points, num_teams))
+    positions = np.arange(num_teams)
+    off_diagonal = ~np.eye(num_teams, dtype=bool)
+
+    with tqdm(total=num_simulations, desc="Прогресс", unit="шаг", ncols=100) as pbar:
+        for start in range(0, num_simulations, block_size):
+            n = min(block_size, num_simulations - start)
+
+            sim_home_goals = np.repeat(home_goals[None], n, axis=0)
+            sim_away_goals = np.repeat(away_goals[None], n, axis=0)
+            sim_home_goals[:, home_idx, away_idx], sim_away_goals[:, home_idx, away_idx] = simulate_block(
+                fixtures, n, rng, sampling
+            )
+
+            order = rank_teams(sim_home_goals, sim_away_goals, tiebreak_rules, team_strengths)
+            home_win = sim_home_goals > sim_away_goals
+            away_win = sim_home_goals < sim_away_goals
+            draw = (sim_home_goals == sim_away_goals) & off_diagonal
+            points = 3 * home_win.sum(axis=2) + 3 * away_win.sum(axis=1) + draw.sum(axis=2) + draw.sum(axis=1)
+            team_points = np.take_along_axis(points, order, axis=1)  # Очки команды, занявшей место k
+
+            counts += np.bincount(
+                ((order * max_points + team_points) * num_teams + positions).ravel(),
+                minlength=num_teams * max_points * num_teams
+            ).reshape(num_teams, max_points, num_teams)
+            pbar.update(n)
+
+    # Оценка P(место | очки); для ни разу не встреченных значений очков берём ближайшее встреченное
+    seen = counts.sum(axis=2)
+    team_positions = np.zeros((num_teams, num_teams))
+    for team in range(num_teams):
+        seen_points = np.nonzero(seen[team])[0]
+        nearest = seen_points[np.abs(np.arange(max_points)[:, None] - seen_points[None, :]).argmin(axis=1)]
+        conditional = counts[team, nearest] / seen[team, nearest][:, None]
+        team_positions[team] = points_probs[team] @ conditional
+
+    return balance_positions(team_positions) * num_simulations, points_probs
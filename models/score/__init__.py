@@ -0,0 +1 @@
+"""Модель счёта матчей (распределение Пуассона)."""
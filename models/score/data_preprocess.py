@@ -1,5 +1,5 @@
 import pandas as pd
-import numpy as np
+from ..match_store import parse_score, build_match_store, load_match_store, restore_season_data, league_matches
 
 def return_score(result):
     """
@@ -8,13 +8,12 @@ def return_score(result):
     Аргументы:
     result : str
         Строка с результатом матча в формате "X-Y", где X — количество голов первой команды, Y — количество голов второй команды.
-        Обязательно меньше 9.5 голов!!
         
     Возвращает:
     int, int : 
         Голы двух команд
     """
-    score1, score2 = int(result[0]), int(result[-1])
+    score1, score2 = parse_score(result)
     return score1, score2
 
 def process_season_data(data, teams, season_label):
@@ -35,13 +34,12 @@ def process_season_data(data, teams, season_label):
         - Список команд для сезона,
         - Оригинальные данные сезона.
     """
-    df = pd.DataFrame(data, columns=teams, index=teams)
     comparison_data = []
     
-    for i in range(len(df)):
-        for j in range(len(df.columns)):
-            if i != j and len(df.iloc[i, j]) == 3:  # Исключаем матчи с самим собой
-                score1, score2 = return_score(df.iloc[i, j])
+    for i in range(len(teams)):
+        for j in range(len(teams)):
+            if i != j and parse_score(data[i][j]) is not None:  # Исключаем матчи с самим собой и несыгранные
+                score1, score2 = return_score(data[i][j])
                 comparison_data.append([
                     teams[i],       # Команда из строки
                     teams[j],       # Команда из столбца
@@ -52,13 +50,15 @@ def process_season_data(data, teams, season_label):
                 
     return pd.DataFrame(comparison_data, columns=["Домашняя команда", "Гостевая команда", "Голы хозяев", "Голы гостей", "Сезон"]), teams, data
 
-def process_all_seasons(file):
+def process_all_seasons(file, use_cache=True):
     """
     Обрабатывает все сезоны из Excel файла, объединяя данные всех сезонов в один DataFrame.
 
     Аргументы:
     file : str
         Путь к Excel файлу с данными сезонов.
+    use_cache : bool
+        Использовать кэш разобранного файла (см. match_store.load_match_store).
 
     Возвращает:
     DataFrame, list, list
@@ -66,28 +66,51 @@ def process_all_seasons(file):
         - Список команд последнего сезона,
         - Данные последнего сезона.
     """
-    all_seasons_data = []
-    last_season_teams = None
-    last_season_data = None
-
-    # Открытие Excel файла для обработки
-    with pd.ExcelFile(file) as xls:
-        for idx, sheet_name in enumerate(xls.sheet_names):
-            # Чтение данных из каждого сезона
-            season_data = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-            teams = season_data.iloc[0, 1:].dropna().tolist()  # Извлечение названий команд
-            data = season_data.iloc[1:, 1:].fillna("").values.tolist()  # Получение матрицы результатов
-            season_label = -len(xls.sheet_names) + idx + 1  # Присваиваем метку сезона (для сортировки)
-            
-            # Обработка данных для текущего сезона
-            season_df, current_teams, current_data = process_season_data(data, teams, season_label)
-            all_seasons_data.append(season_df)
-
-            # Сохраняем данные последнего сезона
-            if idx == len(xls.sheet_names) - 1:
-                last_season_teams = current_teams
-                last_season_data = current_data
+    store = load_match_store(file) if use_cache else build_match_store(file)
+    team_names = store["team_names"].astype(object)
 
     # Объединяем данные всех сезонов в один DataFrame
-    combined_df = pd.concat(all_seasons_data, ignore_index=True)
+    combined_df = pd.DataFrame({
+        "Домашняя команда": team_names[store["home"]],
+        "Гостевая команда": team_names[store["away"]],
+        "Голы хозяев": store["home_goals"].astype(int),
+        "Голы гостей": store["away_goals"].astype(int),
+        "Сезон": store["season"].astype(int),
+    })
+
+    last_season_teams = team_names[store["last_teams"]].tolist()
+    last_season_data = restore_season_data(store["last_home_goals"], store["last_away_goals"], store["last_played"])
     return combined_df, last_season_teams, last_season_data
+
+def load_league(file, season_weight_factor, use_cache=True, half_life_days=None, store=None):
+    """
+    Загружает чемпионат в виде целочисленных массивов, с которыми работают модель и симуляция.
+
+    Отбор матчей и веса общие для всех моделей (match_store.league_matches); здесь голы
+    переводятся в массивы матчей модели.
+
+    Аргументы:
+    file : str
+        Путь к Excel файлу с данными сезонов.
+    season_weight_factor : float
+        Коэффициент уменьшения веса старых сезонов.
+    use_cache : bool
+        Использовать кэш разобранного файла (см. match_store.load_match_store).
+    half_life_days : float или None
+        Период полураспада в днях, по которому считается вес сезона (match_store.decay_weights); тогда
+        season_weight_factor не используется. None — вес season_weight_factor ** (-сезон).
+    store : dict или None
+        Уже загруженный набор массивов match_store.load_match_store этого файла (например, при подборе
+        коэффициентов затухания, когда файл загружается один раз). None — загрузить.
+
+    Возвращает:
+    list, tuple, tuple
+        - Список команд последнего сезона,
+        - Матчи всех сезонов между командами последнего сезона: (home, away, goal_home, goal_away, weight)
+          (id хозяев и гостей int16, голы хозяев, голы гостей int8, вес матча),
+        - Состояние последнего сезона: (home_goals, away_goals, played).
+    """
+    teams, (home, away, home_goals, away_goals, weight), season = league_matches(
+        file, season_weight_factor, use_cache, half_life_days, store
+    )
+    return teams, (home, away, home_goals, away_goals, weight), season
@@ -1,65 +1,149 @@
-from scipy.stats import poisson  # Импортируем распределение Пуассона из scipy.stats
+from scipy.special import gammaln  # Логарифм гамма-функции для логарифма вероятности Пуассона
 import numpy as np  # Импортируем библиотеку numpy для работы с массивами и математическими операциями
+from scipy.optimize import minimize  # Для оптимизации параметров модели
 
 # Функция для расчёта вероятности ожидаемого количества голов для хозяев и гостей с помощью модели Пуассона
-def count_teams_rating(s, h, home, away, team_to_index):
+def count_teams_rating(s, h, home, away):
     """
     Рассчитывает силу в определенном матче хозяев и гостей на основе рейтингов силы команд.
     
     Параметры:
     - s: массив, содержащий рейтинги силы каждой команды.
     - h: бонус для домашнего поля (число, добавляемое к силе хозяев).
-    - home: название команды-хозяина.
-    - away: название команды-гостя.
-    - team_to_index: словарь, сопоставляющий название команды с её индексом в массиве s.
+    - home: индекс команды-хозяина в массиве s (или массив индексов).
+    - away: индекс команды-гостя в массиве s (или массив индексов).
     
     Возвращает:
     - home_strength: ожидаемое количество голов команды-хозяина.
     - away_strength: ожидаемое количество голов команды-гостя.
     """
     # Рассчитываем силу в матче для хозяев (экспонента разницы рейтингов плюс бонус за домашний стадион)
-    home_strength = np.exp(s[team_to_index[home]] - s[team_to_index[away]] + h)
+    home_strength = np.exp(s[home] - s[away] + h)
     
     # Рассчитываем силу в матче для гостей (экспонента разницы рейтингов, без бонуса)
-    away_strength = np.exp(s[team_to_index[away]] - s[team_to_index[home]])
+    away_strength = np.exp(s[away] - s[home])
     
     return home_strength, away_strength  # Возвращаем рассчитанные вероятности голов
 
 # Функция потерь для оптимизации разницы голов в матчах
-def loss_goals(params, season_weight_factor, result_n, team_to_index, num_teams):
+def loss_goals(params, matches, num_teams, league=None):
     """
-    Функция потерь для модели предсказания разницы голов. Будем ее минимизировать.
+    Функция потерь для модели предсказания счёта и её точный градиент. Будем ее минимизировать.
     
     Параметры:
     - params: массив параметров модели (силы команд + бонус для хозяев поля).
-    - season_weight_factor: коэффициент, уменьшающий вес старых сезонов в расчётах.
-    - result_n: список матчей с информацией (хозяева, гости, разница мячей, сезон).
-    - team_to_index: словарь соответствия названия команды её индексу.
+    - matches: массивы (home, away, goal_home, goal_away, weight) из data_preprocess.load_league.
     - num_teams: количество команд в лиге.
+    - league: для нескольких чемпионатов сразу (см. fit) — номер чемпионата каждого матча; тогда после
+      сил всех команд в params идут бонусы хозяев всех чемпионатов. None — один чемпионат.
     
     Возвращает:
     - total_loss: общее значение функции потерь (чем меньше, тем лучше модель).
+    - grad: градиент total_loss по params.
     """
+    home, away, goal_home, goal_away, weight = matches
+
     # Разбираем параметры: первые num_teams элементов — это силы команд, последний элемент — бонус хозяев
     s = params[:num_teams]  # Вытаскиваем силы команд
-    h = params[num_teams]   # Вытаскиваем бонус для домашних матчей
+    h = params[num_teams] if league is None else params[num_teams:][league]  # Бонус для домашних матчей
 
-    total_loss = 0  # Инициализируем суммарную ошибку
-    
-    # Перебираем все матчи из набора данных
-    for home, away, goal_home, goal_away, season in result_n:
-        # Получаем силу хозяев и гостей в очном матче с учетом домашнего преимущества
-        lambda_home, lambda_away = count_teams_rating(s, h, home, away, team_to_index)
+    # Логарифмы ожидаемых голов хозяев и гостей во всех матчах сразу
+    log_lambda_home = s[home] - s[away] + h
+    log_lambda_away = s[away] - s[home]
+    lambda_home, lambda_away = np.exp(log_lambda_home), np.exp(log_lambda_away)
+
+    # Логарифм вероятности именно получившегося счёта
+    log_prob = (goal_home * log_lambda_home - lambda_home - gammaln(goal_home + 1)
+                + goal_away * log_lambda_away - lambda_away - gammaln(goal_away + 1))
+
+    # Защита от log(0): вероятность не меньше 1e-8, в этой области градиент нулевой
+    clipped = log_prob < np.log(1e-8)
+    log_prob = np.where(clipped, np.log(1e-8), log_prob)
+
+    total_loss = -np.sum(log_prob * weight)
+
+    # Производные -log(prob) по логарифмам ожидаемых голов
+    g_home = np.where(clipped, 0.0, (lambda_home - goal_home) * weight)
+    g_away = np.where(clipped, 0.0, (lambda_away - goal_away) * weight)
+    g_match = g_home - g_away  # Вклад в s[home]; в s[away] входит с обратным знаком
+
+    grad = np.zeros_like(params, dtype=float)
+    grad[:num_teams] = np.bincount(home, g_match, num_teams) - np.bincount(away, g_match, num_teams)
+    if league is None:
+        grad[num_teams] = g_home.sum()
+    else:
+        grad[num_teams:] = np.bincount(league, g_home, len(params) - num_teams)
+
+    return total_loss, grad
+
+
+# Матрица вторых производных функции потерь (для неопределённости параметров)
+def hessian(params, matches, num_teams):
+    """
+    Точная матрица Гессе функции потерь loss_goals.
+
+    Логарифмы ожидаемых голов линейны по параметрам (log lambda = x · params), поэтому вклад матча
+    равен weight * (lambda_home * x_home x_home^T + lambda_away * x_away x_away^T).
+
+    Параметры:
+    - params: массив параметров модели (силы команд + бонус для хозяев поля), обычно res.x.
+    - matches: массивы (home, away, goal_home, goal_away, weight) из data_preprocess.load_league.
+    - num_teams: количество команд в лиге.
+
+    Возвращает:
+    - hessian: матрица (параметры × параметры), см. uncertainty.laplace_draws.
+    """
+    home, away, goal_home, goal_away, weight = matches
+    s, h = params[:num_teams], params[num_teams]
+    lambda_home, lambda_away = count_teams_rating(s, h, home, away)
+
+    # Строки x_away = e_away - e_home; x_home отличается от -x_away только бонусом хозяев
+    rows = np.arange(len(home))
+    x_away = np.zeros((len(home), len(params)))
+    x_away[rows, away] += 1
+    x_away[rows, home] -= 1
+    x_home = -x_away
+    x_home[:, num_teams] = 1
+
+    # Матчи с обрезанной вероятностью (см. loss_goals) не дают вклада
+    log_prob = (goal_home * np.log(lambda_home) - lambda_home - gammaln(goal_home + 1)
+                + goal_away * np.log(lambda_away) - lambda_away - gammaln(goal_away + 1))
+    weight = np.where(log_prob < np.log(1e-8), 0.0, weight)
+
+    return x_home.T @ ((weight * lambda_home)[:, None] * x_home) + x_away.T @ ((weight * lambda_away)[:, None] * x_away)
 
-        # Вероятность именно получившегося исхода
-        prob = poisson.pmf(goal_home, lambda_home) * poisson.pmf(goal_away, lambda_away)
 
-        prob = max(prob, 1e-8)  # Защита от log(0), так как log(0) не определён
+# Коэффициент затухания веса сезонов по умолчанию (старые сезоны менее значимы)
+SEASON_WEIGHT_FACTOR = 0.5
 
-        # Учитываем сезонный вес, уменьшая влияние старых данных
-        season_weight = np.power(season_weight_factor, -season)
-        
-        # Уменьшаем функцию потерь (используем логарифм вероятности для лучшей числовой стабильности)
-        total_loss -= np.log(prob) * season_weight
 
-    return total_loss  # Возвращаем общее значение функции потерь
+# Обучение модели
+def fit(matches, num_teams, initial_params=None, callback=None, team_league=None):
+    """
+    Подбирает силы команд и бонус домашнего поля, минимизируя функцию потерь.
+
+    Параметры:
+    - matches: массивы матчей из data_preprocess.load_league.
+    - num_teams: количество команд.
+    - initial_params: начальные параметры (None — нули; для тёплого старта — прошлые параметры).
+    - callback: функция, которая вызывается после каждой итерации оптимизатора.
+    - team_league: номер чемпионата каждой команды, если обучаются несколько чемпионатов сразу
+      (см. league.fit_leagues): матчи всех чемпионатов сложены в одни массивы, команды пронумерованы подряд,
+      и одна оптимизация подбирает параметры всех чемпионатов. None — один чемпионат.
+
+    Возвращает:
+    - res: результат scipy.optimize.minimize, оптимизированные параметры в res.x (силы команд, бонус домашнего поля;
+      с team_league — силы всех команд, затем бонусы всех чемпионатов).
+    """
+    num_leagues = 1 if team_league is None else int(team_league.max()) + 1
+    if initial_params is None:
+        initial_params = np.zeros(num_teams + num_leagues)
+
+    return minimize(
+        loss_goals,  # Функция потерь
+        initial_params,  # Начальные параметры
+        args=(matches, num_teams, None if team_league is None else team_league[matches[0]]),  # Дополнительные аргументы
+        method="L-BFGS-B",  # Метод оптимизации
+        jac=True,  # Функция потерь сама возвращает точный градиент
+        callback=callback
+    )
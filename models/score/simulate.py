@@ -1,141 +1,148 @@
+# Розыгрыш матчей модели счёта. Прогоны сезона (simulateScore, simulateAdaptive и другие) общие
+# для всех моделей и находятся в models/drivers.py, которому передаётся этот модуль.
 import numpy as np
-from model import count_teams_rating 
-from tqdm import tqdm
+from .model import count_teams_rating
+from ..montecarlo import draw_uniforms
+from scipy.stats import poisson
 
-def calculate_head_to_head_points(results_matrix, teams, tied_teams):
-    """
-    Рассчитывает статистику личных встреч между командами из списка tied_teams:
-    - Очки, набранные в матчах друг с другом.
-    - Разницу голов в этих матчах.
-    - Количество забитых мячей.
-    
-    Также рассчитывает общую разницу голов и общее количество забитых мячей во всех матчах.
-    """
-    num_teams = len(teams)
-    
-    # Статистика для личных встреч
-    head_to_head_points = {team: 0 for team in tied_teams}
-    goal_difference = {team: 0 for team in tied_teams}
-    goals_scored = {team: 0 for team in tied_teams}
-
-    # Статистика для всех матчей
-    total_goal_difference = {team: 0 for team in teams}
-    total_goals_scored = {team: 0 for team in teams}
-
-    for i in range(num_teams):
-        for j in range(num_teams):
-            if i == j:
-                continue  # Пропускаем матчи против самих себя
-            
-            home_team = teams[i]
-            away_team = teams[j]
-            home_goals, away_goals = int(results_matrix[i][j][0]), int(results_matrix[i][j][-1])
-
-            # Подсчёт общей разницы голов
-            total_goal_difference[home_team] += (home_goals - away_goals)
-            total_goal_difference[away_team] += (away_goals - home_goals)
-
-            # Подсчёт общего количества забитых голов
-            total_goals_scored[home_team] += home_goals
-            total_goals_scored[away_team] += away_goals
-
-            # Если обе команды в списке tied_teams, учитываем личные встречи
-            if home_team in tied_teams and away_team in tied_teams:
-                # Очки в личных встречах
-                if home_goals > away_goals:
-                    head_to_head_points[home_team] += 3
-                elif home_goals < away_goals:
-                    head_to_head_points[away_team] += 3
-                else:
-                    head_to_head_points[home_team] += 1
-                    head_to_head_points[away_team] += 1
-
-                # Разница голов в личных встречах
-                goal_difference[home_team] += (home_goals - away_goals)
-                goal_difference[away_team] += (away_goals - home_goals)
-
-                # Забитые голы в личных встречах
-                goals_scored[home_team] += home_goals
-                goals_scored[away_team] += away_goals
-
-    return head_to_head_points, goal_difference, goals_scored, total_goal_difference, total_goals_scored
-
-
-def simulateScore(data, teams, team_strengths, home_bonus, team_to_index, num_simulations=3500):
+# Количество симуляций по умолчанию
+NUM_SIMULATIONS = 100000
+
+# Дополнительные показатели при равенстве очков (см. tiebreak.CRITERIA): очки, разница и забитые голы
+# в личных встречах, общая разница голов, общее число забитых голов
+TIEBREAK_RULES = (
+    "head_to_head_points", "head_to_head_goal_difference", "head_to_head_goals_scored", "goal_difference",
+    "goals_scored",
+)
+
+# Наибольшее число голов одной команды в симулированном матче
+MAX_GOALS = 9
+
+def fixture_table(season, team_strengths, home_bonus):
     """
-    Симулирует оставшиеся матчи сезона и определяет распределение вероятностей финишных позиций команд.
+    Таблица несыгранных матчей сезона. Параметры модели во время симуляции не меняются, поэтому
+    таблица считается один раз за прогон, и все блоки симуляций берут из неё готовые массивы.
 
     Параметры:
-    - data: матрица текущих результатов матчей (частично заполнена).
-    - teams: список всех команд.
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
     - team_strengths: рейтинг силы каждой команды.
     - home_bonus: дополнительный бонус для домашних матчей.
-    - team_to_index: словарь соответствия команд их индексам.
-    - num_simulations: количество симуляций.
 
     Возвращает:
-    - team_positions: матрица, где (i, j) показывает, сколько раз команда i заняла место j.
+    - fixtures: словарь с ключами home, away (индексы хозяев и гостей несыгранных матчей),
+      lambdas (число матчей × 2, ожидаемые голы хозяев и гостей) и cdf (число матчей × 2 × MAX_GOALS,
+      функция распределения Пуассона P(голов <= g) для g = 0..MAX_GOALS-1).
+    """
+    played = season[2]
+    home_idx, away_idx = np.nonzero(~played & ~np.eye(len(played), dtype=bool))
+    lambdas = np.stack(count_teams_rating(team_strengths, home_bonus, home_idx, away_idx), axis=1)
+
+    return {
+        "home": home_idx,
+        "away": away_idx,
+        "lambdas": lambdas,
+        "cdf": poisson.cdf(np.arange(MAX_GOALS), lambdas[..., None]),
+    }
+
+
+def fixture_tables(season, param_draws, num_teams):
+    """
+    Таблицы несыгранных матчей для нескольких наборов параметров сразу (по одной на блок симуляций,
+    см. drivers.simulateScore с hessian): ожидаемые голы и функции распределения считаются одним проходом.
+
+    Параметры:
+    - season: состояние текущего сезона (home_goals, away_goals, played) из data_preprocess.load_league.
+    - param_draws: массив (наборы × параметры), строки — силы команд и бонус домашнего поля.
+    - num_teams: количество команд.
+
+    Возвращает:
+    - tables: список таблиц, как у fixture_table, по одной на набор параметров.
+    """
+    played = season[2]
+    home_idx, away_idx = np.nonzero(~played & ~np.eye(len(played), dtype=bool))
+    # Силы команд передаются столбцами (команды × наборы), поэтому ожидаемые голы — (матчи × наборы)
+    lambdas = np.stack(count_teams_rating(
+        param_draws[:, :num_teams].T, param_draws[:, num_teams], home_idx, away_idx
+    ), axis=1).transpose(2, 0, 1)
+    cdf = poisson.cdf(np.arange(MAX_GOALS), lambdas[..., None])
+
+    return [
+        {"home": home_idx, "away": away_idx, "lambdas": lambdas[k], "cdf": cdf[k]} for k in range(len(param_draws))
+    ]
+
+
+def block_goals(cdf, u):
+    """
+    Превращает равномерные случайные числа в голы методом обратной функции распределения Пуассона.
+
+    Распределение обрезано на MAX_GOALS: все значения больше MAX_GOALS считаются равными MAX_GOALS.
+
+    Параметры:
+    - cdf: массив (число матчей × 2 × MAX_GOALS) функции распределения из fixture_table.
+    - u: массив (симуляции × число матчей × 2) равномерных чисел из [0, 1).
+
+    Возвращает:
+    - home_goals, away_goals: массивы (симуляции × число матчей) с голами хозяев и гостей.
+    """
+    # Число голов — количество порогов P(голов <= g), которые u превысило; цикл по порогам
+    # не создаёт промежуточный массив (симуляции × матчи × 2 × MAX_GOALS)
+    goals = np.zeros(u.shape, dtype=np.int8)
+    for g in range(MAX_GOALS):
+        goals += u >= cdf[..., g]
+
+    return goals[:, :, 0], goals[:, :, 1]
+
+
+def simulate_block(fixtures, num_simulations, rng, sampling="plain"):
+    """
+    Разыгрывает все оставшиеся матчи сразу для целого блока симуляций.
+
+    Голы получаются из равномерных чисел draw_uniforms по таблице функции распределения
+    (block_goals): это быстрее, чем rng.poisson, и работает с любым способом sampling.
+
+    Параметры:
+    - fixtures: таблица несыгранных матчей из fixture_table.
+    - num_simulations: количество симуляций в блоке.
+    - rng: генератор случайных чисел numpy.random.Generator.
+    - sampling: способ получения случайных чисел (см. montecarlo.SAMPLING_METHODS).
+
+    Возвращает:
+    - home_goals, away_goals: массивы (num_simulations × число матчей) с голами хозяев и гостей.
+    """
+    cdf = fixtures["cdf"]
+    return block_goals(cdf, draw_uniforms(rng, (num_simulations, len(cdf), 2), sampling))
+
+
+def truncated_log_pmf(lambdas):
+    """
+    Логарифмы вероятностей числа голов 0..MAX_GOALS распределения Пуассона, обрезанного на MAX_GOALS
+    (как в block_goals: вероятность MAX_GOALS включает все большие значения).
+
+    Параметры:
+    - lambdas: массив (число матчей × 2) ожидаемых голов хозяев и гостей.
+
+    Возвращает:
+    - log_pmf: массив (число матчей × 2 × (MAX_GOALS + 1)).
+    """
+    goals = np.arange(MAX_GOALS + 1)
+    return np.where(
+        goals < MAX_GOALS, poisson.logpmf(goals, lambdas[..., None]), poisson.logsf(MAX_GOALS - 1, lambdas[..., None])
+    )
+
+
+def log_likelihood_ratio(fixtures, tilted_fixtures, home, away):
+    """
+    Логарифм отношения правдоподобий разыгранных голов по модели и по сдвинутой модели
+    (вес симуляции в drivers.simulateImportance).
+
+    Параметры:
+    - fixtures: таблица несыгранных матчей по модели (fixture_table).
+    - tilted_fixtures: таблица тех же матчей со сдвинутыми параметрами, по которой разыграны голы.
+    - home, away: массивы (симуляции × число матчей) с голами хозяев и гостей из simulate_block.
+
+    Возвращает:
+    - log_weights: массив (симуляции) сумм по матчам разности truncated_log_pmf по модели и по сдвигу.
     """
-    results = np.copy(data)  # Копируем матрицу матчей, чтобы не изменять оригинал
-    team_positions = np.zeros((len(teams), len(teams)))  # Матрица финишных позиций команд
-    
-    for _ in tqdm(range(num_simulations), desc="Прогресс", unit="шаг", ncols=100):
-        sim_results = np.copy(results)  # Копируем текущие результаты
-
-        # Симулируем каждый незаконченный матч
-        for i, home_team in enumerate(teams):
-            for j, away_team in enumerate(teams):
-                if i != j and len(sim_results[i][j]) < 3:
-                    # Рассчитываем ожидаемые голы для обеих команд
-                    lambda_home, lambda_away = count_teams_rating(team_strengths, home_bonus, home_team, away_team, team_to_index)
-
-                    # Генерируем количество голов по распределению Пуассона
-                    home_goals = np.random.poisson(lambda_home)
-                    away_goals = np.random.poisson(lambda_away)
-
-                    # Ограничиваем максимальное число голов
-                    home_goals = min(9, home_goals)
-                    away_goals = min(9, away_goals)
-
-                    # Записываем результат матча
-                    sim_results[i][j] = f"{home_goals}:{away_goals}"
-                
-        # Подсчёт очков для каждой команды
-        team_points = np.zeros(len(teams))
-        for i, team in enumerate(teams):
-            team_points[i] += np.sum([3 if sim_results[i][j][0] > sim_results[i][j][-1] else 0 for j in range(len(teams))])
-            team_points[i] += np.sum([1 if sim_results[i][j][0] == sim_results[i][j][-1] else 0 for j in range(len(teams))])
-            team_points[i] += np.sum([3 if sim_results[j][i][0] < sim_results[j][i][-1] else 0 for j in range(len(teams))])
-            team_points[i] += np.sum([1 if sim_results[j][i][0] == sim_results[j][i][-1] else 0 for j in range(len(teams))])
-
-        # Получаем уникальные значения очков и сортируем их по убыванию
-        unique_points = np.unique(team_points)[::-1]
-        sorted_teams = []
-
-        # Разрешаем ситуации, когда несколько команд набрали одинаковое количество очков
-        for points in unique_points:
-            tied_teams = [teams[i] for i in range(len(teams)) if team_points[i] == points]
-
-            if len(tied_teams) > 1:
-                # Подсчитываем дополнительные параметры для сортировки
-                head_to_head_points, head_to_head_goal_diff, head_to_head_goals, total_goal_difference, total_goals_scored = calculate_head_to_head_points(sim_results, teams, tied_teams)
-
-                # Сортируем команды по дополнительным критериям
-                tied_teams.sort(
-                    key=lambda team: (
-                        -head_to_head_points[team],  # Очки в личных встречах
-                        -head_to_head_goal_diff[team],  # Разница голов в личных встречах
-                        -head_to_head_goals[team],  # Забитые голы в личных встречах
-                        -total_goal_difference[team],  # Общая разница голов
-                        -total_goals_scored[team]  # Общее количество забитых голов
-                    )
-                )
-
-            sorted_teams.extend(tied_teams)
-
-        # Обновляем матрицу финишных позиций
-        for idx, team in enumerate(sorted_teams):
-            team_idx = teams.index(team)
-            team_positions[team_idx][idx] += 1  # Засчитываем место, которое команда заняла в симуляции
-    
-    return team_positions
+    log_ratio = truncated_log_pmf(fixtures["lambdas"]) - truncated_log_pmf(tilted_fixtures["lambdas"])
+    matches = np.arange(len(fixtures["home"]))
+    return log_ratio[matches, 0, home].sum(axis=1) + log_ratio[matches, 1, away].sum(axis=1)
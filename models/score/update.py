@@ -0,0 +1,200 @@
+# Инкрементальное обновление прогноза после новых результатов тура
+from .data_preprocess import load_league  # Функции для обработки данных
+from ..match_store import load_match_store, match_seasons, match_weights, season_progress  # Кэш и веса матчей
+from . import simulate  # Розыгрыш матчей модели
+from ..drivers import simulateScore  # Симуляция сезона (общая для всех моделей)
+from .model import fit  # Функции для расчёта силы команд
+
+import numpy as np  # Для работы с массивами
+import os
+import sys
+
+# Модель, для которой сохраняется состояние (проверяется при загрузке: массивы матчей и параметры у моделей разные)
+MODEL_TYPE = "score"
+
+# Файл состояния по умолчанию (создаётся main.py и обновляется этим скриптом), у каждой модели свой
+STATE_FILE = os.path.join("results", f"state_{MODEL_TYPE}.npz")
+
+
+def save_state(path, teams, matches, match_season, season, params, team_positions, num_simulations, season_weight_factor,
+               half_life_days=None):
+    """
+    Сохраняет всё, что нужно для следующего обновления, в один файл .npz.
+
+    Параметры:
+    - path: путь к файлу состояния.
+    - teams: список команд последнего сезона.
+    - matches: массивы матчей (home, away, goal_home, goal_away, weight) из data_preprocess.load_league.
+    - match_season: метка сезона каждого матча (match_store.match_seasons).
+    - season: состояние текущего сезона (home_goals, away_goals, played).
+    - params: оптимизированные параметры модели.
+    - team_positions: последняя матрица финишных позиций.
+    - num_simulations: количество симуляций, по которому посчитана team_positions.
+    - season_weight_factor: коэффициент затухания веса сезонов.
+    - half_life_days: период полураспада в днях для веса сезонов (None — по season_weight_factor).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            model=MODEL_TYPE, teams=np.array(teams, dtype=str),
+            season_home_goals=season[0], season_away_goals=season[1], season_played=season[2],
+            params=params, team_positions=team_positions,
+            num_simulations=num_simulations, season_weight_factor=season_weight_factor,
+            half_life_days=np.nan if half_life_days is None else half_life_days,
+            match_season=match_season,
+            **{f"matches_{k}": array for k, array in enumerate(matches)},
+        )
+    os.replace(tmp_path, path)
+
+
+def _half_life(f):
+    """
+    Период полураспада из файла состояния (None — затухание по сезонам).
+    """
+    if np.isnan(f["half_life_days"]):
+        return None
+    return float(f["half_life_days"])
+
+
+def load_state(path):
+    """
+    Загружает состояние, сохранённое save_state этой модели (состояние другой модели — ValueError).
+
+    Параметры:
+    - path: путь к файлу состояния.
+
+    Возвращает:
+    - state: словарь с ключами teams, matches, match_season, season, params, team_positions,
+      num_simulations, season_weight_factor, half_life_days.
+    """
+    with np.load(path) as f:
+        if "model" not in f.files:
+            raise ValueError(f"Ошибка: в файле состояния {path} не указана модель, запустите main.py заново!")
+        if str(f["model"]) != MODEL_TYPE:
+            raise ValueError(f"Ошибка: файл состояния {path} сохранён моделью {f['model']}, а не {MODEL_TYPE}!")
+        if "match_season" not in f.files:
+            raise ValueError(f"Ошибка: в файле состояния {path} нет меток сезонов матчей, запустите main.py заново!")
+        num_arrays = len([key for key in f.files if key.startswith("matches_")])
+        return {
+            "teams": f["teams"].tolist(),
+            "matches": tuple(f[f"matches_{k}"] for k in range(num_arrays)),
+            "match_season": f["match_season"],
+            "season": (f["season_home_goals"], f["season_away_goals"], f["season_played"]),
+            "params": f["params"],
+            "team_positions": f["team_positions"],
+            "num_simulations": int(f["num_simulations"]),
+            "season_weight_factor": float(f["season_weight_factor"]),
+            "half_life_days": _half_life(f),
+        }
+
+
+def add_results(teams, matches, match_season, season, new_results, season_weight_factor, half_life_days=None):
+    """
+    Добавляет новые результаты текущего сезона в массивы матчей и состояние сезона.
+
+    Веса всех матчей пересчитываются (match_store.match_weights): при затухании по времени
+    вес зависит от сыгранной доли текущего сезона, которая растёт с каждым туром.
+
+    Параметры:
+    - teams: список команд последнего сезона.
+    - matches: массивы матчей (home, away, goal_home, goal_away, weight).
+    - match_season: метка сезона каждого матча (match_store.match_seasons).
+    - season: состояние текущего сезона (home_goals, away_goals, played).
+    - new_results: список (хозяева, гости, голы хозяев, голы гостей) с названиями команд.
+    - season_weight_factor: коэффициент затухания веса сезонов.
+    - half_life_days: период полураспада в днях для веса сезонов (None — по season_weight_factor).
+
+    Возвращает:
+    - matches, match_season, season: обновлённые копии массивов.
+    """
+    team_to_index = {name: i for i, name in enumerate(teams)}
+    home_goals, away_goals, played = (array.copy() for array in season)
+    new_home, new_away, new_goal_home, new_goal_away = [], [], [], []
+
+    for home, away, goals_home, goals_away in new_results:
+        i, j = team_to_index[home], team_to_index[away]
+        if played[i, j]:
+            raise ValueError(f"Ошибка: матч {home} - {away} уже сыгран!")
+        home_goals[i, j], away_goals[i, j], played[i, j] = goals_home, goals_away, True
+        new_home.append(i)
+        new_away.append(j)
+        new_goal_home.append(goals_home)
+        new_goal_away.append(goals_away)
+
+    # Новые матчи относятся к текущему сезону (метка сезона 0)
+    match_season = np.concatenate([match_season, np.zeros(len(new_home), dtype=match_season.dtype)])
+    weight = match_weights(match_season, season_progress(played), season_weight_factor, half_life_days)
+    home, away, goal_home, goal_away, _ = matches
+    matches = (
+        np.concatenate([home, np.array(new_home, dtype=home.dtype)]),
+        np.concatenate([away, np.array(new_away, dtype=away.dtype)]),
+        np.concatenate([goal_home, np.array(new_goal_home, dtype=goal_home.dtype)]),
+        np.concatenate([goal_away, np.array(new_goal_away, dtype=goal_away.dtype)]),
+        weight,
+    )
+    return matches, match_season, (home_goals, away_goals, played)
+
+
+def update(new_results=(), file_path=None, state_path=STATE_FILE, num_simulations=None, seed=None, num_workers=1):
+    """
+    Обновляет прогноз после новых результатов, не начиная всё с нуля.
+
+    Параметры модели дообучаются из сохранённой точки (тёплый старт model.fit), а симулируются
+    только ещё не сыгранные матчи. Новое состояние сохраняется обратно в state_path.
+
+    Параметры:
+    - new_results: список (хозяева, гости, голы хозяев, голы гостей) с названиями команд.
+    - file_path: Excel файл, из которого нужно заново взять данные (None — берём из состояния).
+    - state_path: путь к файлу состояния.
+    - num_simulations: количество симуляций (None — как в прошлый раз).
+    - seed: зерно генератора случайных чисел.
+    - num_workers: количество процессов для simulateScore.
+
+    Возвращает:
+    - teams: список команд.
+    - params: новые параметры модели.
+    - team_positions: новая матрица финишных позиций.
+    """
+    state = load_state(state_path)
+    season_weight_factor, half_life_days = state["season_weight_factor"], state["half_life_days"]
+    num_simulations = num_simulations or state["num_simulations"]
+
+    if file_path is not None:
+        store = load_match_store(file_path)
+        teams, matches, season = load_league(file_path, season_weight_factor, half_life_days=half_life_days, store=store)
+        match_season = match_seasons(store)
+        if teams != state["teams"]:
+            raise ValueError("Ошибка: состав команд в файле не совпадает с сохранённым состоянием!")
+    else:
+        teams, matches, match_season, season = state["teams"], state["matches"], state["match_season"], state["season"]
+    matches, match_season, season = add_results(
+        teams, matches, match_season, season, new_results, season_weight_factor, half_life_days
+    )
+    num_teams = len(teams)
+
+    # Тёплый старт из прошлых параметров: после одного тура оптимум почти не сдвигается
+    res = fit(matches, num_teams, initial_params=state["params"])
+
+    team_positions = simulateScore(
+        simulate, season, res.x, num_simulations, seed=seed, num_workers=num_workers
+    )
+
+    save_state(state_path, teams, matches, match_season, season, res.x, team_positions, num_simulations, season_weight_factor,
+               half_life_days)
+    return teams, res.x, team_positions
+
+
+# Запуск из корня репозитория: python -m models.score.update "ХОЗЯЕВА ГОСТИ X:Y" ["ХОЗЯЕВА ГОСТИ X:Y" ...]
+if __name__ == "__main__":
+    new_results = []
+    for arg in sys.argv[1:]:
+        home, away, score = arg.rsplit(maxsplit=2)
+        goals_home, goals_away = (int(goals) for goals in score.split(":"))
+        new_results.append((home, away, goals_home, goals_away))
+
+    teams, params, team_positions = update(new_results)
+    probas = 100 * team_positions / team_positions.sum(axis=1, keepdims=True)
+    for team_idx in np.lexsort(-probas.T[::-1]):
+        print(teams[team_idx], " ".join(f"{prob:.1f}%" for prob in probas[team_idx]))
@@ -0,0 +1 @@
+"""Модель разницы мячей."""
@@ -1,130 +1,109 @@
 # Импорт необходимых модулей и функций
-from data_preprocess import process_all_seasons  # Функции для обработки данных
-from simulate import simulateScore  # Функции для симуляции матчей
-from model import loss_goals  # Функции для расчёта силы команд
+from .data_preprocess import load_league  # Функции для обработки данных
+from ..match_store import load_match_store, match_seasons  # Кэш разобранного файла и метки сезонов матчей
+from . import simulate  # Розыгрыш матчей модели
+from .simulate import NUM_SIMULATIONS  # Количество симуляций по умолчанию
+from ..drivers import simulateScore  # Симуляция сезона (общая для всех моделей)
+from .model import fit  # Функции для расчёта силы команд
+from .update import save_state, STATE_FILE  # Состояние для быстрого обновления (update.py)
+from ..league import default_weighting, probabilities_table, write_probabilities  # Таблица вероятностей мест и настройки затухания
 
-import numpy as np  # Для работы с массивами
-import pandas as pd  # Для создания таблицы с результатами
-from scipy.optimize import minimize  # Для оптимизации параметров модели
 import os
 from tqdm import tqdm # Для отслеживания прогресса
 
-#------------------------------------------------------------------------------------------
+# Запуск из корня репозитория: python -m models.score_diff.main
+# (без вопросов и для нескольких чемпионатов сразу: python -m models --help)
+# Только при выполнении файла как скрипта: процессы симуляции импортируют модули заново
+if __name__ == "__main__":
+    #------------------------------------------------------------------------------------------
 
 
-# Получаем список всех .xlsx файлов в текущей папкеimport os
-script_dir = os.path.dirname(os.path.abspath(__file__))  # Директория текущего скрипта
-xlsx_files = [f for f in os.listdir(script_dir) if f.endswith(".xlsx")]
+    # Получаем список всех .xlsx файлов в папке модели
+    script_dir = os.path.dirname(os.path.abspath(__file__))  # Директория текущего скрипта
+    xlsx_files = [f for f in os.listdir(script_dir) if f.endswith(".xlsx")]
 
-# Проверяем, что найден ровно один файл
-if len(xlsx_files) == 1:
-    file_path = os.path.join(script_dir, xlsx_files[0])  # Создаём полный путь к файлу
-else:
-    raise ValueError("Ошибка: В папке должен быть ровно один .xlsx файл!")
+    # Проверяем, что найден ровно один файл
+    if len(xlsx_files) == 1:
+        file_path = os.path.join(script_dir, xlsx_files[0])  # Создаём полный путь к файлу
+    else:
+        raise ValueError("Ошибка: В папке должен быть ровно один .xlsx файл!")
 
 
-# Обрабатываем данные из файла: 
-# - all_games: все матчи всех сезонов
-# - last_teams: список команд последнего сезона
-# - last_data: матрица результатов матчей последнего сезона
-all_games, last_teams, last_data = process_all_seasons(file_path)
+    # Коэффициент затухания веса сезонов (старые сезоны менее значимы) и период полураспада веса матча:
+    # подобранные python -m models.tune (файл model_config.json), иначе значения модели по умолчанию
+    season_weight_factor, half_life_days = default_weighting("score_diff")
 
-# Отбираем только те матчи, где обе команды играли в последнем сезоне
-need_games = np.array([
-    row for row in np.array(all_games) if row[0] in last_teams and row[1] in last_teams
-])
+    # Обрабатываем данные из файла: 
+    # - last_teams: список команд последнего сезона (дальше команды задаются индексами в нём)
+    # - matches: массивы матчей всех сезонов между командами последнего сезона (хозяева, гости, исход, вес)
+    # - season: матрицы голов и маска сыгранных матчей последнего сезона
+    # Метки сезонов матчей (match_season) нужны update.py, чтобы пересчитывать веса после каждого тура
+    store = load_match_store(file_path)
+    last_teams, matches, season = load_league(file_path, season_weight_factor, half_life_days=half_life_days, store=store)
+    match_season = match_seasons(store)
 
-# Создаём словарь, сопоставляющий название команды с её индексом
-team_to_index = {name: i for i, name in enumerate(last_teams)}
+    # Определяем количество команд в последнем сезоне
+    num_teams = len(last_teams)
+    print("Обработали данные")
 
-# Определяем количество команд в последнем сезоне
-num_teams = len(last_teams)
-print("Обработали данные")
 
+    #------------------------------------------------------------------------------------------
 
-#------------------------------------------------------------------------------------------
 
+    # Способ расчёта вероятности разницы мячей:
+    # - "skellam" — точная формула распределения Скеллама
+    # - "poisson_sum" — сумма по счетам с 0-7 голами хозяев (исходный вариант)
+    likelihood = "skellam"
 
-# Задаём начальные параметры для оптимизации: 
-# - первые num_teams элементов — начальные значения силы команд (нулевые)
-# - последний элемент — бонус домашнего поля (тоже ноль)
-initial_params = np.zeros(num_teams + 1)
+    # Объединять одинаковые матчи (хозяева, гости, разница) в одну строку с суммарным весом
+    use_lookup_table = True
 
-# Коэффициент затухания веса сезонов (старые сезоны менее значимы)
-season_weight_factor = 0.45
+    # Оптимизируем параметры модели, минимизируя функцию потерь (начальные параметры — нули)
+    # Оборачиваем tqdm для отслеживания прогресса
+    with tqdm(total=20, desc="Оптимизация", ncols=100) as pbar:
+        res = fit(matches, num_teams, callback=lambda xk: pbar.update(1), likelihood=likelihood,
+                  use_lookup_table=use_lookup_table)
 
-def tqdm_callback(xk):
-    pbar.update(1)
+    # Получаем оптимизированные параметры:
+    # - team_strengths — рассчитанные силы команд
+    # - home_bonus — бонус домашнего поля
+    optimized_params = res.x
+    team_strengths = optimized_params[:num_teams]
+    home_bonus = optimized_params[num_teams]
 
-# Оптимизируем параметры модели, минимизируя функцию потерь loss_goals
-# Оборачиваем tqdm для отслеживания прогресса
-with tqdm(total=20, desc="Оптимизация", ncols=100) as pbar:
-    # Функция callback для обновления прогресса
-    def callback(xk):
-        tqdm_callback(xk)  # Вызываем функцию с обновлением прогресса
 
-    # Выполнение оптимизации с использованием callback для обновления прогресса
-    res = minimize(
-        loss_goals,  # Функция потерь
-        initial_params,  # Начальные параметры
-        args=(season_weight_factor, need_games, team_to_index, num_teams),  # Дополнительные аргументы
-        method="L-BFGS-B",  # Метод оптимизации
-        callback=callback
-    )
-
-# Получаем оптимизированные параметры:
-# - team_strengths — рассчитанные силы команд
-# - home_bonus — бонус домашнего поля
-optimized_params = res.x
-team_strengths = optimized_params[:num_teams]
-home_bonus = optimized_params[num_teams]
-
-
-print("Закончили обучение модели")
-#------------------------------------------------------------------------------------------
+    print("Закончили обучение модели")
+    #------------------------------------------------------------------------------------------
 
 
-# Количество симуляций
-num_simulations = input("Введите количество симуляций (по умолчанию 100000): ")
-num_simulations = int(num_simulations) if num_simulations.strip() else 100000
+    # Количество симуляций
+    num_simulations = input(f"Введите количество симуляций (по умолчанию {NUM_SIMULATIONS}): ")
+    num_simulations = int(num_simulations) if num_simulations.strip() else NUM_SIMULATIONS
 
+    # Количество процессов для симуляции (симуляции делятся между ними поровну)
+    num_workers = input(f"Введите количество процессов (по умолчанию {os.cpu_count()}): ")
+    num_workers = int(num_workers) if num_workers.strip() else os.cpu_count()
 
-# Запускаем симуляцию оставшихся матчей сезона и получаем вероятности занятых мест
-team_positions = simulateScore(
-    last_data, last_teams, team_strengths, home_bonus, team_to_index, num_simulations
-)
-
-# Сортируем команды по наиболее вероятному итогу сезона (по вероятностям мест)
-teams_for_print = sorted(
-    last_teams, 
-    key=lambda team: tuple(-p for p in team_positions[last_teams.index(team)])  # Сортируем по вероятностям
-)
-
-print("Закончили симуляцию")
-#------------------------------------------------------------------------------------------
 
+    # Запускаем симуляцию оставшихся матчей сезона и получаем вероятности занятых мест
+    team_positions = simulateScore(
+        simulate, season, optimized_params, num_simulations,
+        num_workers=num_workers
+    )
 
-# Создаём список для хранения отформатированных результатов
-formatted_results = []
+    # Сохраняем состояние, чтобы после следующего тура запустить update.py вместо полного пересчёта
+    save_state(STATE_FILE, last_teams, matches, match_season, season, optimized_params, team_positions, num_simulations,
+               season_weight_factor, half_life_days)
 
-# Формируем таблицу вероятностей для каждой команды
-for team_name in teams_for_print:
-    team_idx = last_teams.index(team_name)  # Получаем индекс команды
-    probas = 100 * team_positions[team_idx] / num_simulations  # Рассчитываем вероятности в процентах
-    formatted_probs = [f"{prob:.1f}%" for prob in probas]  # Округляем и форматируем
-    formatted_results.append([team_name] + formatted_probs)  # Добавляем в список
+    print("Закончили симуляцию")
+    #------------------------------------------------------------------------------------------
 
-# Создаём DataFrame (таблицу) для красивого представления результатов
-df = pd.DataFrame(
-    formatted_results, 
-    columns=["Team"] + [f"Position {i+1}" for i in range(team_positions.shape[1])]
-)
 
-# Указываем путь для сохранения таблицы с результатами
-folder = "results"
-os.makedirs(folder, exist_ok=True)  # Создаст папку, если её нет
+    # Таблица вероятностей мест: команды отсортированы по наиболее вероятному итогу сезона
+    df = probabilities_table(last_teams, team_positions, num_simulations)
 
-file_path = os.path.join(folder, "probabilities.xlsx")
-df.to_excel(file_path, index=False)
+    # Указываем путь для сохранения таблицы с результатами
+    file_path = os.path.join("results", "probabilities.xlsx")
+    write_probabilities(df, file_path)
 
-# В итоге в файле "probabilities.xlsx" будет таблица с командами и вероятностями их мест в чемпионате
\ No newline at end of file
+    # В итоге в файле "probabilities.xlsx" будет таблица с командами и вероятностями их мест в чемпионате
\ No newline at end of file
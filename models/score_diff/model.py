@@ -1,71 +1,244 @@
-from scipy.stats import poisson  # Импортируем распределение Пуассона из scipy.stats
+from scipy.special import gammaln, ive  # Логарифм гамма-функции и масштабированная функция Бесселя
 import numpy as np  # Импортируем библиотеку numpy для работы с массивами и математическими операциями
+from scipy.optimize import minimize  # Для оптимизации параметров модели
+from ..uncertainty import numerical_hessian  # Матрица Гессе разностями градиента
 
 # Функция для расчёта вероятности ожидаемого количества голов для хозяев и гостей с помощью модели Пуассона
-def count_teams_rating(s, h, home, away, team_to_index):
+def count_teams_rating(s, h, home, away):
     """
     Рассчитывает силу в определенном матче хозяев и гостей на основе рейтингов команд.
     
     Параметры:
     - s: массив, содержащий рейтинги силы каждой команды.
     - h: бонус для домашнего поля (число, добавляемое к силе хозяев).
-    - home: название команды-хозяина.
-    - away: название команды-гостя.
-    - team_to_index: словарь, сопоставляющий название команды с её индексом в массиве s.
+    - home: индекс команды-хозяина в массиве s (или массив индексов).
+    - away: индекс команды-гостя в массиве s (или массив индексов).
     
     Возвращает:
     - home_strength: ожидаемое количество голов команды-хозяина.
     - away_strength: ожидаемое количество голов команды-гостя.
     """
     # Рассчитываем силу в матче для хозяев (экспонента разницы рейтингов плюс бонус за домашний стадион)
-    home_strength = np.exp(s[team_to_index[home]] - s[team_to_index[away]] + h)
+    home_strength = np.exp(s[home] - s[away] + h)
     
     # Рассчитываем силу в матче для гостей (экспонента разницы рейтингов, без бонуса)
-    away_strength = np.exp(s[team_to_index[away]] - s[team_to_index[home]])
+    away_strength = np.exp(s[away] - s[home])
     
     return home_strength, away_strength  # Возвращаем рассчитанные вероятности голов
 
+# Функция группировки одинаковых матчей
+def group_matches(matches):
+    """
+    Объединяет матчи с одинаковыми (хозяева, гости, разница мячей) в одну строку с суммарным весом.
+
+    Функция потерь линейна по весам матчей, поэтому значение и градиент не меняются,
+    а число строк, обрабатываемых при каждом вычислении, уменьшается.
+
+    Параметры:
+    - matches: массивы (home, away, goal_diff, weight) из data_preprocess.load_league.
+
+    Возвращает:
+    - home, away, goal_diff, weight: массивы уникальных матчей и их суммарные веса.
+    """
+    home, away, goal_diff, weight = matches
+    keys, inverse = np.unique(np.stack([home, away, goal_diff]), axis=1, return_inverse=True)
+    total_weight = np.bincount(inverse.ravel(), weight, keys.shape[1])
+
+    return keys[0].astype(np.intp), keys[1].astype(np.intp), keys[2], total_weight
+
 # Функция потерь для оптимизации разницы голов в матчах
-def loss_goals(params, season_weight_factor, result_n, team_to_index, num_teams):
+def loss_goals(params, matches, num_teams, league=None):
     """
-    Функция потерь для модели предсказания разницы голов. Будем ее минимизировать.
+    Функция потерь для модели предсказания разницы голов и её точный градиент. Будем ее минимизировать.
     
     Параметры:
     - params: массив параметров модели (силы команд + бонус для хозяев поля).
-    - season_weight_factor: коэффициент, уменьшающий вес старых сезонов в расчётах.
-    - result_n: список матчей с информацией (хозяева, гости, разница мячей, сезон).
-    - team_to_index: словарь соответствия названия команды её индексу.
+    - matches: массивы (home, away, goal_diff, weight) из data_preprocess.load_league.
     - num_teams: количество команд в лиге.
+    - league: для нескольких чемпионатов сразу (см. fit) — номер чемпионата каждого матча; тогда после
+      сил всех команд в params идут бонусы хозяев всех чемпионатов. None — один чемпионат.
     
     Возвращает:
     - total_loss: общее значение функции потерь (чем меньше, тем лучше модель).
+    - grad: градиент total_loss по params.
     """
+    home, away, goal_diff, weight = matches
+
     # Разбираем параметры: первые num_teams элементов — это силы команд, последний элемент — бонус хозяев
     s = params[:num_teams]  # Вытаскиваем силы команд
-    h = params[num_teams]   # Вытаскиваем бонус для домашних матчей
+    h = params[num_teams] if league is None else params[num_teams:][league]  # Бонус для домашних матчей
 
-    total_loss = 0  # Инициализируем суммарную ошибку
-    
-    # Перебираем все матчи из набора данных
-    for home, away, goal_diff, season in result_n:
-        # Получаем силу хозяев и гостей в очном матче с учетом домашнего преимущества
-        lambda_home, lambda_away = count_teams_rating(s, h, home, away, team_to_index)
-
-        prob = 0  # Инициализируем вероятность данной разницы голов
-        
-        # Проходим по всем возможным результатам с такой разницей
-        for home_goals in range(8):
-            away_goals = home_goals - goal_diff
-            if 0 <= away_goals:
-                # Считаем вероятность такой разницы в матче
-                prob += poisson.pmf(home_goals, lambda_home) * poisson.pmf(away_goals, lambda_away)
-
-        prob = max(prob, 1e-8)  # Защита от log(0), так как log(0) не определён
-
-        # Учитываем сезонный вес, уменьшая влияние старых данных
-        season_weight = np.power(season_weight_factor, -season)
-        
-        # Уменьшаем функцию потерь (используем логарифм вероятности для лучшей числовой стабильности)
-        total_loss -= np.log(prob) * season_weight
-
-    return total_loss  # Возвращаем общее значение функции потерь
+    # Логарифмы ожидаемых голов хозяев и гостей во всех матчах сразу
+    log_lambda_home = (s[home] - s[away] + h)[:, None]
+    log_lambda_away = (s[away] - s[home])[:, None]
+    lambda_home, lambda_away = np.exp(log_lambda_home), np.exp(log_lambda_away)
+
+    # Все счета с такой разницей, где у хозяев от 0 до 7 голов
+    home_goals = np.arange(8)[None, :]
+    away_goals = home_goals - goal_diff[:, None]
+    possible = away_goals >= 0
+    away_goals = np.where(possible, away_goals, 0)
+
+    # Вероятности каждого из этих счетов
+    terms = np.exp(home_goals * log_lambda_home - lambda_home - gammaln(home_goals + 1)
+                   + away_goals * log_lambda_away - lambda_away - gammaln(away_goals + 1)) * possible
+    prob = terms.sum(axis=1)
+
+    # Защита от log(0): вероятность не меньше 1e-8, в этой области градиент нулевой
+    clipped = prob < 1e-8
+    prob = np.maximum(prob, 1e-8)
+
+    total_loss = -np.sum(np.log(prob) * weight)
+
+    # Производные -log(prob) по логарифмам ожидаемых голов
+    scale = np.where(clipped, 0.0, weight / prob)
+    g_home = -scale * (terms * (home_goals - lambda_home)).sum(axis=1)
+    g_away = -scale * (terms * (away_goals - lambda_away)).sum(axis=1)
+    g_match = g_home - g_away  # Вклад в s[home]; в s[away] входит с обратным знаком
+
+    grad = np.zeros_like(params, dtype=float)
+    grad[:num_teams] = np.bincount(home, g_match, num_teams) - np.bincount(away, g_match, num_teams)
+    if league is None:
+        grad[num_teams] = g_home.sum()
+    else:
+        grad[num_teams:] = np.bincount(league, g_home, len(params) - num_teams)
+
+    return total_loss, grad
+
+# Функция потерь на основе распределения Скеллама
+def loss_goals_skellam(params, matches, num_teams, league=None):
+    """
+    Функция потерь для модели предсказания разницы голов через распределение Скеллама и её точный градиент.
+
+    Разница двух независимых пуассоновских величин имеет распределение Скеллама:
+    P(d) = exp(-(lambda_home + lambda_away)) * (lambda_home / lambda_away)^(d/2) * I_|d|(2 * sqrt(lambda_home * lambda_away)),
+    поэтому сумма по счетам не нужна и не обрезается на 8 голах хозяев.
+    Произведение lambda_home * lambda_away = exp(h) одинаково для всех матчей, так что функции
+    Бесселя считаются один раз на каждое |d| (таблица на одно вычисление функции потерь).
+
+    Параметры:
+    - params: массив параметров модели (силы команд + бонус для хозяев поля).
+    - matches: массивы (home, away, goal_diff, weight) из data_preprocess.load_league или group_matches.
+    - num_teams: количество команд в лиге.
+    - league: номер чемпионата каждого матча, как у loss_goals (None — один чемпионат).
+
+    Возвращает:
+    - total_loss: общее значение функции потерь (чем меньше, тем лучше модель).
+    - grad: градиент total_loss по params.
+    """
+    home, away, goal_diff, weight = matches
+
+    # Разбираем параметры: первые num_teams элементов — это силы команд, последний элемент — бонус хозяев
+    s = params[:num_teams]  # Вытаскиваем силы команд
+    bonus = params[num_teams:]  # Бонусы для домашних матчей (по одному на чемпионат)
+    match_league = 0 if league is None else league
+    h = bonus[match_league]
+
+    # Логарифмы ожидаемых голов хозяев и гостей во всех матчах сразу
+    log_lambda_home = s[home] - s[away] + h
+    log_lambda_away = s[away] - s[home]
+    lambda_home, lambda_away = np.exp(log_lambda_home), np.exp(log_lambda_away)
+    half_log_ratio = (log_lambda_home - log_lambda_away) / 2
+
+    # Таблица log I_k(z) для всех нужных порядков k и каждого чемпионата;
+    # z = 2 * sqrt(lambda_home * lambda_away) = 2 * exp(h / 2)
+    z = 2 * np.exp(bonus / 2)[:, None]
+    abs_diff = np.abs(goal_diff).astype(np.intp)
+    with np.errstate(divide="ignore"):
+        log_bessel = np.log(ive(np.arange(abs_diff.max() + 2), z)) + z
+
+    # Логарифм вероятности разницы d и соседних разниц d - 1, d + 1 (нужны для градиента)
+    def log_skellam(d, order):
+        return -(lambda_home + lambda_away) + d * half_log_ratio + log_bessel[match_league, order]
+
+    log_prob = log_skellam(goal_diff, abs_diff)
+    log_prob_minus = log_skellam(goal_diff - 1, np.abs(goal_diff - 1).astype(np.intp))
+    log_prob_plus = log_skellam(goal_diff + 1, np.abs(goal_diff + 1).astype(np.intp))
+
+    # Защита от log(0): вероятность не меньше 1e-8, в этой области градиент нулевой
+    clipped = log_prob < np.log(1e-8)
+    total_loss = -np.sum(np.where(clipped, np.log(1e-8), log_prob) * weight)
+
+    # dP(d)/d(lambda_home) = P(d - 1) - P(d), dP(d)/d(lambda_away) = P(d + 1) - P(d)
+    with np.errstate(invalid="ignore", over="ignore"):
+        g_home = -weight * lambda_home * (np.exp(log_prob_minus - log_prob) - 1)
+        g_away = -weight * lambda_away * (np.exp(log_prob_plus - log_prob) - 1)
+    g_home = np.where(clipped, 0.0, g_home)
+    g_away = np.where(clipped, 0.0, g_away)
+    g_match = g_home - g_away  # Вклад в s[home]; в s[away] входит с обратным знаком
+
+    grad = np.zeros_like(params, dtype=float)
+    grad[:num_teams] = np.bincount(home, g_match, num_teams) - np.bincount(away, g_match, num_teams)
+    if league is None:
+        grad[num_teams] = g_home.sum()
+    else:
+        grad[num_teams:] = np.bincount(league, g_home, len(params) - num_teams)
+
+    return total_loss, grad
+
+
+# Доступные способы расчёта вероятности разницы мячей
+LOSS_BACKENDS = {
+    "poisson_sum": loss_goals,  # Сумма по счетам с 0-7 голами хозяев
+    "skellam": loss_goals_skellam,  # Точная формула распределения Скеллама
+}
+
+
+# Матрица вторых производных функции потерь (для неопределённости параметров)
+def hessian(params, matches, num_teams, likelihood="skellam"):
+    """
+    Матрица Гессе функции потерь центральными разностями её точного градиента
+    (у распределения Скеллама вторые производные громоздки).
+
+    Параметры:
+    - params: массив параметров модели (силы команд + бонус для хозяев поля), обычно res.x.
+    - matches: массивы матчей из data_preprocess.load_league.
+    - num_teams: количество команд в лиге.
+    - likelihood: способ расчёта вероятности разницы мячей (ключ LOSS_BACKENDS), как у fit.
+
+    Возвращает:
+    - hessian: матрица (параметры × параметры), см. uncertainty.laplace_draws.
+    """
+    return numerical_hessian(LOSS_BACKENDS[likelihood], params, (group_matches(matches), num_teams))
+
+
+# Коэффициент затухания веса сезонов по умолчанию (старые сезоны менее значимы)
+SEASON_WEIGHT_FACTOR = 0.45
+
+
+# Обучение модели
+def fit(matches, num_teams, initial_params=None, callback=None, likelihood="skellam", use_lookup_table=True,
+        team_league=None):
+    """
+    Подбирает силы команд и бонус домашнего поля, минимизируя функцию потерь.
+
+    Параметры:
+    - matches: массивы матчей из data_preprocess.load_league.
+    - num_teams: количество команд.
+    - initial_params: начальные параметры (None — нули; для тёплого старта — прошлые параметры).
+    - callback: функция, которая вызывается после каждой итерации оптимизатора.
+    - likelihood: способ расчёта вероятности разницы мячей (ключ LOSS_BACKENDS).
+    - use_lookup_table: объединять одинаковые матчи (хозяева, гости, разница) в одну строку с суммарным весом.
+    - team_league: номер чемпионата каждой команды, если обучаются несколько чемпионатов сразу
+      (см. league.fit_leagues): матчи всех чемпионатов сложены в одни массивы, команды пронумерованы подряд,
+      и одна оптимизация подбирает параметры всех чемпионатов. None — один чемпионат.
+
+    Возвращает:
+    - res: результат scipy.optimize.minimize, оптимизированные параметры в res.x (силы команд, бонус домашнего поля;
+      с team_league — силы всех команд, затем бонусы всех чемпионатов).
+    """
+    num_leagues = 1 if team_league is None else int(team_league.max()) + 1
+    if initial_params is None:
+        initial_params = np.zeros(num_teams + num_leagues)
+
+    # Объединяем одинаковые матчи для функции потерь (чемпионат матча определяется командой хозяев)
+    fit_matches = group_matches(matches) if use_lookup_table else matches
+
+    return minimize(
+        LOSS_BACKENDS[likelihood],  # Функция потерь
+        initial_params,  # Начальные параметры
+        args=(fit_matches, num_teams, None if team_league is None else team_league[fit_matches[0]]),  # Дополнительные аргументы
+        method="L-BFGS-B",  # Метод оптимизации
+        jac=True,  # Функция потерь сама возвращает точный градиент
+        callback=callback
+    )
@@ -0,0 +1,219 @@
+# Распределение мест в итоговой таблице с дополнительными показателями (правила разных лиг)
+import numpy as np
+
+# Дополнительные показатели, которые применяются по порядку при равенстве очков:
+# - head_to_head_*: личные встречи, считаются только матчи с соперниками, которые равны с командой
+#   по очкам и по всем предыдущим показателям (мини-таблица группы, которую они ещё не разделили);
+# - wins, goal_difference, goals_scored: показатели всего сезона;
+# - strength: рейтинг силы команды из модели (нужен team_strengths).
+CRITERIA = (
+    "head_to_head_points",
+    "head_to_head_wins",
+    "head_to_head_goal_difference",
+    "head_to_head_goals_scored",
+    "head_to_head_away_goals",
+    "wins",
+    "goal_difference",
+    "goals_scored",
+    "strength",
+)
+
+# Порядок дополнительных показателей в регламентах лиг
+LEAGUE_RULES = {
+    # Серия А: личные встречи (очки, разница), общая разница, общее число забитых
+    "serie_a": ("head_to_head_points", "head_to_head_goal_difference", "goal_difference", "goals_scored"),
+    # Ла Лига: личные встречи (очки, разница), общая разница, общее число забитых
+    "la_liga": ("head_to_head_points", "head_to_head_goal_difference", "goal_difference", "goals_scored"),
+    # РПЛ: число побед, личные встречи (очки, победы, разница, забитые, забитые в гостях),
+    # общая разница, общее число забитых
+    "rpl": (
+        "wins", "head_to_head_points", "head_to_head_wins", "head_to_head_goal_difference",
+        "head_to_head_goals_scored", "head_to_head_away_goals", "goal_difference", "goals_scored",
+    ),
+}
+
+# Правила по коду чемпионата в названии файла данных (ITA22.xlsx -> ITA)
+LEAGUE_CODES = {"ITA": "serie_a", "ESP": "la_liga", "RUS": "rpl"}
+
+
+def league_rules(name):
+    """
+    Возвращает набор правил по названию из LEAGUE_RULES или по коду чемпионата (например, "ITA22").
+    """
+    if name in LEAGUE_RULES:
+        return LEAGUE_RULES[name]
+    code = name[:3].upper()
+    if code in LEAGUE_CODES:
+        return LEAGUE_RULES[LEAGUE_CODES[code]]
+    raise ValueError(f"Ошибка: неизвестные правила {name}! Доступны: {', '.join(LEAGUE_RULES)}")
+
+
+def season_tables(home_goals, away_goals):
+    """
+    Считает таблицы сезона для блока симуляций один раз для всех показателей.
+
+    Параметры:
+    - home_goals, away_goals: массивы (симуляции × N × N) голов во всех матчах сезона
+      (диагональ не учитывается).
+
+    Возвращает:
+    - tables: словарь массивов (симуляции × N × N) по парам команд (i, j) — pair_points, pair_wins,
+      pair_scored, pair_away_scored (очки, победы, забитые и забитые в гостях командой i в матчах с j)
+      и массивов (симуляции × N) — points, wins, goal_difference, goals_scored.
+    """
+    num_teams = home_goals.shape[-1]
+    off_diagonal = ~np.eye(num_teams, dtype=bool)
+
+    home_wins = (home_goals > away_goals) & off_diagonal
+    away_wins = (home_goals < away_goals) & off_diagonal
+    draws = (home_goals == away_goals) & off_diagonal
+
+    # Матч (j, i) с точки зрения команды i — транспонированная матрица
+    pair_wins = home_wins.astype(np.int16) + away_wins.transpose(0, 2, 1)
+    pair_points = 3 * pair_wins + draws + draws.transpose(0, 2, 1)
+    pair_away_scored = away_goals.transpose(0, 2, 1).astype(np.int16) * off_diagonal
+    pair_scored = home_goals.astype(np.int16) * off_diagonal + pair_away_scored
+    goal_difference = pair_scored.sum(axis=2) - pair_scored.sum(axis=1)
+
+    return {
+        "pair_points": pair_points,
+        "pair_wins": pair_wins,
+        "pair_scored": pair_scored,
+        "pair_away_scored": pair_away_scored,
+        "points": pair_points.sum(axis=2),
+        "wins": pair_wins.sum(axis=2),
+        "goal_difference": goal_difference,
+        "goals_scored": pair_scored.sum(axis=2),
+    }
+
+
+def criterion_values(name, tables, tied, team_strengths=None):
+    """
+    Значения одного дополнительного показателя (больше — выше в таблице).
+
+    Параметры:
+    - name: название показателя из CRITERIA.
+    - tables: таблицы сезона из season_tables.
+    - tied: маска (симуляции × N × N) пар команд, равных по очкам и всем предыдущим показателям.
+    - team_strengths: рейтинг силы каждой команды (нужен только для "strength").
+
+    Возвращает:
+    - values: массив (симуляции × N).
+    """
+    if name == "head_to_head_points":
+        return (tables["pair_points"] * tied).sum(axis=2)
+    if name == "head_to_head_wins":
+        return (tables["pair_wins"] * tied).sum(axis=2)
+    if name == "head_to_head_goal_difference":
+        scored = tables["pair_scored"] * tied
+        return scored.sum(axis=2) - scored.sum(axis=1)
+    if name == "head_to_head_goals_scored":
+        return (tables["pair_scored"] * tied).sum(axis=2)
+    if name == "head_to_head_away_goals":
+        return (tables["pair_away_scored"] * tied).sum(axis=2)
+    if name in ("wins", "goal_difference", "goals_scored"):
+        return tables[name]
+    if name == "strength":
+        if team_strengths is None:
+            raise ValueError("Ошибка: для показателя strength нужен team_strengths!")
+        return np.broadcast_to(team_strengths, tables["points"].shape)
+    raise ValueError(f"Ошибка: неизвестный показатель {name}! Доступны: {', '.join(CRITERIA)}")
+
+
+def season_points(home_goals, away_goals):
+    """
+    Итоговые очки каждой команды в каждой симуляции блока.
+
+    Параметры:
+    - home_goals, away_goals: массивы (симуляции × N × N) голов во всех матчах сезона.
+
+    Возвращает:
+    - points: массив (симуляции × N).
+    """
+    off_diagonal = ~np.eye(home_goals.shape[-1], dtype=bool)
+    home_points = np.where(home_goals > away_goals, 3, 0) + ((home_goals == away_goals) & off_diagonal)
+    away_points = np.where(home_goals < away_goals, 3, 0) + ((home_goals == away_goals) & off_diagonal)
+    return home_points.sum(axis=2) + away_points.sum(axis=1)
+
+
+def team_places(order):
+    """
+    Переводит порядок команд из rank_teams в места команд.
+
+    Параметры:
+    - order: массив (симуляции × N), order[s, k] — индекс команды на месте k в симуляции s.
+
+    Возвращает:
+    - places: массив (симуляции × N), places[s, i] — место команды i в симуляции s (с нуля).
+    """
+    places = np.empty_like(order)
+    np.put_along_axis(places, order, np.arange(order.shape[1])[None], axis=1)
+    return places
+
+
+def rank_teams(home_goals, away_goals, rules, team_strengths=None):
+    """
+    Упорядочивает команды в каждой симуляции блока: очки, затем дополнительные показатели rules.
+
+    Таблицы сезона считаются один раз на блок, а мини-таблицы личных встреч всех групп
+    равных команд — одним умножением на маску tied, без цикла по группам. После каждого показателя
+    маска сужается до пар, равных и по нему: если, например, число побед уже разделило трёх команд
+    с равными очками, личные встречи двух оставшихся считаются только между ними.
+    Сортировка — одна np.lexsort по всем показателям сразу.
+
+    Параметры:
+    - home_goals, away_goals: массивы (симуляции × N × N) голов во всех матчах сезона.
+    - rules: последовательность названий показателей из CRITERIA (например, LEAGUE_RULES["serie_a"]).
+    - team_strengths: рейтинг силы каждой команды (нужен только для показателя "strength").
+
+    Возвращает:
+    - order: массив (симуляции × N), order[s, k] — индекс команды на месте k в симуляции s.
+    """
+    tables = season_tables(home_goals, away_goals)
+    points = tables["points"]
+
+    # Личные встречи: учитываем только соперников, равных по очкам и всем предыдущим показателям
+    tied = points[:, :, None] == points[:, None, :]
+
+    keys = [points]
+    for name in rules:
+        values = criterion_values(name, tables, tied, team_strengths)
+        keys.append(values)
+        tied = tied & (values[:, :, None] == values[:, None, :])
+
+    # np.lexsort сортирует по последнему ключу в первую очередь
+    return np.lexsort([-key for key in reversed(keys)], axis=-1)
+
+
+# Проверка на сезонах, где ответ известен: python -m models.tiebreak
+if __name__ == "__main__":
+    def season_goals(results, num_teams):
+        """
+        Массивы голов (1 × N × N) по списку матчей (хозяева, гости, голы хозяев, голы гостей).
+        """
+        home_goals = np.zeros((1, num_teams, num_teams), dtype=np.int8)
+        away_goals = np.zeros((1, num_teams, num_teams), dtype=np.int8)
+        for home, away, goals_home, goals_away in results:
+            home_goals[0, home, away], away_goals[0, home, away] = goals_home, goals_away
+        return home_goals, away_goals
+
+    # Серия А: у команд 0 и 1 по 7 очков, выше 0 — она выиграла личные встречи, хотя разница мячей хуже
+    home_goals, away_goals = season_goals([(0, 1, 1, 0), (1, 2, 5, 0), (2, 1, 0, 1), (0, 2, 1, 0), (2, 0, 1, 0)], 3)
+    assert season_points(home_goals, away_goals)[0].tolist() == [7, 7, 3]
+    order = rank_teams(home_goals, away_goals, LEAGUE_RULES["serie_a"])[0].tolist()
+    assert order == [0, 1, 2]
+
+    # РПЛ: у команд 0, 1, 2 по 10 очков, но у команды 2 меньше побед (остальные матчи — ничьи 0:0).
+    # Число побед её отделяет, и личные встречи 0 и 1 считаются только между ними (4 очка у 0 против 1).
+    # В мини-таблице всех трёх команд (4 очка у 0 против 7 у 1) выше оказалась бы команда 1
+    results = [
+        (0, 1, 1, 0), (1, 2, 1, 0), (2, 1, 0, 1), (2, 0, 1, 0), (0, 2, 0, 1),
+        (0, 3, 1, 0), (0, 4, 1, 0), (3, 0, 1, 0), (4, 0, 1, 0),
+        (1, 3, 1, 0), (3, 1, 1, 0), (4, 1, 1, 0), (1, 4, 0, 1),
+        (4, 3, 1, 0), (3, 4, 0, 1),
+    ]
+    home_goals, away_goals = season_goals(results, 5)
+    assert season_points(home_goals, away_goals)[0].tolist() == [10, 10, 10, 8, 17]
+    order = rank_teams(home_goals, away_goals, LEAGUE_RULES["rpl"])[0].tolist()
+    assert order == [4, 0, 1, 2, 3]
+    print("Проверка пройдена")
@@ -0,0 +1,235 @@
+# Подбор затухания весов матчей по кросс-валидации на матчах текущего сезона
+# Запуск из корня репозитория: python -m models.tune [--help]
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .league import CONFIG_FILE, MODEL_TYPES, _load_modules, load_config
+from .match_store import load_match_store, match_seasons
+
+# Чемпионаты по умолчанию
+DATA_FILES = (os.path.join("data", "ESP22.xlsx"), os.path.join("data", "ITA22.xlsx"), os.path.join("data", "RUS21.xlsx"))
+
+# Проверяемые коэффициенты затухания веса сезонов и количество частей кросс-валидации
+FACTOR_GRID = (0.3, 0.4, 0.45, 0.5, 0.55, 0.6, 0.7, 0.8, 1.0)
+NUM_FOLDS = 5
+
+
+def _heldout_loss(model_type, model, params, matches, num_teams):
+    """
+    Сумма -log(вероятность) отложенных матчей (у всех вес 1) и тем же способом, которым их оценивает model.fit.
+    """
+    matches = matches[:-1] + (np.ones(len(matches[0])),)
+    if model_type == "score_diff":
+        return model.LOSS_BACKENDS["skellam"](params, matches, num_teams)[0]
+    return model.loss_goals(params, matches, num_teams)[0]
+
+
+def make_folds(match_season, num_folds=NUM_FOLDS, seed=0):
+    """
+    Делит сыгранные матчи текущего сезона на num_folds случайных частей примерно одного размера.
+
+    Параметры:
+    - match_season: метка сезона каждого матча (match_store.match_seasons, 0 — текущий сезон).
+    - num_folds: количество частей.
+    - seed: зерно генератора случайных чисел.
+
+    Возвращает:
+    - fold: номер части каждого матча (-1 — матч прошлого сезона, он всегда в обучающей выборке).
+    """
+    fold = np.full(len(match_season), -1)
+    current = np.flatnonzero(match_season == 0)
+    fold[current] = np.random.default_rng(seed).permutation(len(current)) % num_folds
+    return fold
+
+
+def _tune_chain(model_type, file_path, store, candidates, fold):
+    """
+    Кросс-валидация цепочки соседних кандидатов одного чемпионата. Лучше вызывать в отдельном процессе.
+
+    Кандидаты идут по возрастанию, поэтому оптимум каждой части почти не сдвигается от кандидата
+    к кандидату, и обучение начинается с параметров предыдущего кандидата (тёплый старт model.fit).
+
+    Параметры:
+    - model_type: название модели ("result", "score" или "score_diff").
+    - file_path: Excel файл с сезонами чемпионата.
+    - store: набор массивов match_store.load_match_store этого файла (разобран один раз для всех кандидатов).
+    - candidates: пары (season_weight_factor, half_life_days), как у league.fit.
+    - fold: номера частей матчей (make_folds).
+
+    Возвращает:
+    - rows: список словарей league, model, season_weight_factor, half_life_days, log_loss, num_matches.
+    """
+    data_preprocess, model, _ = _load_modules(model_type)
+    num_folds = fold.max() + 1
+    params = [None] * num_folds
+
+    rows = []
+    for season_weight_factor, half_life_days in candidates:
+        teams, matches, _ = data_preprocess.load_league(
+            file_path, season_weight_factor, half_life_days=half_life_days, store=store
+        )
+        # Функции потерь линейны по весам, поэтому отложенная часть просто получает вес 0
+        total_loss = 0.0
+        for k in range(num_folds):
+            train = matches[:-1] + (np.where(fold == k, 0.0, matches[-1]),)
+            params[k] = model.fit(train, len(teams), initial_params=params[k]).x
+            heldout = tuple(array[fold == k] for array in matches)
+            total_loss += _heldout_loss(model_type, model, params[k], heldout, len(teams))
+
+        num_matches = np.count_nonzero(fold >= 0)
+        rows.append({
+            "league": os.path.splitext(os.path.basename(file_path))[0],
+            "model": model_type,
+            "season_weight_factor": season_weight_factor,
+            "half_life_days": half_life_days,
+            "log_loss": total_loss / num_matches,
+            "num_matches": num_matches,
+        })
+    return rows
+
+
+def _chains(candidates, num_chains):
+    """
+    Делит отсортированных кандидатов на num_chains цепочек соседних значений примерно одной длины.
+    """
+    return [list(chain) for chain in np.array_split(np.arange(len(candidates)), num_chains) if len(chain)]
+
+
+def run_tuning(file_paths=DATA_FILES, model_types=MODEL_TYPES, factors=FACTOR_GRID, half_lives=(), num_folds=NUM_FOLDS,
+               seed=0, num_workers=None):
+    """
+    Кросс-валидирует всех кандидатов для всех моделей и чемпионатов в пуле процессов.
+
+    Каждый файл разбирается один раз (match_store.load_match_store), и его массивы передаются
+    всем процессам. Кандидаты каждой пары (модель, чемпионат) делятся на цепочки соседних значений,
+    по одному процессу на цепочку.
+
+    Параметры:
+    - file_paths: Excel файлы чемпионатов.
+    - model_types: модели.
+    - factors: коэффициенты затухания веса сезонов.
+    - half_lives: периоды полураспада в днях для веса сезонов (вместо затухания по сезонам).
+    - num_folds: количество частей кросс-валидации.
+    - seed: зерно генератора случайных чисел для деления на части.
+    - num_workers: количество процессов (None — os.cpu_count()).
+
+    Возвращает:
+    - results: таблица pandas.DataFrame со строками _tune_chain всех чемпионатов.
+    """
+    num_workers = num_workers or os.cpu_count()
+    # Сезонные кандидаты и кандидаты с полураспадом — две отдельные цепочки значений
+    groups = [[(factor, None) for factor in sorted(factors)]]
+    if half_lives:
+        groups.append([(None, half_life) for half_life in sorted(half_lives)])
+    num_cases = len(file_paths) * len(model_types) * len(groups)
+    num_chains = max(num_workers // num_cases, 1)
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = []
+        for model_type in model_types:
+            for file_path in file_paths:
+                store = load_match_store(file_path)
+                fold = make_folds(match_seasons(store), num_folds, seed)
+                for group in groups:
+                    futures += [
+                        executor.submit(_tune_chain, model_type, file_path, store, [group[i] for i in chain], fold)
+                        for chain in _chains(group, num_chains)
+                    ]
+        rows = [row for future in futures for row in future.result()]
+    return pd.DataFrame(rows)
+
+
+def summarize(results):
+    """
+    Средняя по всем отложенным матчам всех чемпионатов ошибка log-loss каждого кандидата каждой модели.
+    """
+    results = results.assign(total_loss=results["log_loss"] * results["num_matches"])
+    summary = results.groupby(["model", "season_weight_factor", "half_life_days"], as_index=False, dropna=False)[
+        ["total_loss", "num_matches"]
+    ].sum()
+    summary["log_loss"] = summary["total_loss"] / summary["num_matches"]
+    return summary.drop(columns="total_loss").sort_values(["model", "log_loss"], ignore_index=True)
+
+
+def best_settings(results):
+    """
+    Кандидат с наименьшей log-loss для каждой модели.
+
+    Возвращает:
+    - settings: словарь модель -> {"season_weight_factor", "half_life_days"} (формат league.load_config).
+    """
+    settings = {}
+    for model_type, group in summarize(results).groupby("model"):
+        best = group.iloc[0]
+        half_life_days = None if pd.isna(best["half_life_days"]) else float(best["half_life_days"])
+        settings[model_type] = {
+            # С полураспадом коэффициент сезонов не используется
+            "season_weight_factor": float(best["season_weight_factor"]) if half_life_days is None else None,
+            "half_life_days": half_life_days,
+        }
+    return settings
+
+
+def write_config(settings, path=CONFIG_FILE):
+    """
+    Записывает подобранные настройки в файл, который читают league.fit и main.py моделей
+    (настройки других моделей в файле сохраняются).
+    """
+    config = load_config(path)
+    config.update(settings)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m models.tune",
+        description="Подбирает затухание весов матчей по log-loss на отложенных матчах текущего сезона "
+                    "и записывает лучшие значения в файл настроек.",
+    )
+    parser.add_argument("data", nargs="*", default=list(DATA_FILES), help="Excel файлы чемпионатов")
+    parser.add_argument("-m", "--model", action="append", choices=MODEL_TYPES, default=None,
+                        help="модель (можно указать несколько раз; по умолчанию все)")
+    parser.add_argument("--factors", type=float, nargs="+", default=list(FACTOR_GRID),
+                        help="коэффициенты затухания веса сезонов")
+    parser.add_argument("--half-lives", type=float, nargs="*", default=[],
+                        help="периоды полураспада в днях для веса сезонов (по умолчанию не проверяются)")
+    parser.add_argument("--folds", type=int, default=NUM_FOLDS, help="количество частей кросс-валидации")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="зерно генератора для деления на части")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="количество процессов")
+    parser.add_argument("--config", default=CONFIG_FILE, help="файл настроек (по умолчанию model_config.json)")
+    parser.add_argument("--dry-run", action="store_true", help="не записывать файл настроек")
+    parser.add_argument("-o", "--output", default=os.path.join("results", "tuning.csv"),
+                        help="файл с результатами по каждому чемпионату")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ["TQDM_DISABLE"] = "1"  # Полосы прогресса параллельных процессов только мешают
+
+    results = run_tuning(
+        args.data, args.model or MODEL_TYPES, args.factors, args.half_lives, args.folds, args.seed, args.workers
+    )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    print(summarize(results).to_string(index=False))
+    print(f"Результаты по чемпионатам записаны в {args.output}")
+
+    settings = best_settings(results)
+    for model_type, setting in settings.items():
+        print(f"{model_type}: {setting}")
+    if not args.dry_run:
+        write_config(settings, args.config)
+        print(f"Настройки записаны в {args.config}")
+
+
+# Запуск только при выполнении как скрипта: процессы цепочек импортируют модуль заново
+if __name__ == "__main__":
+    main()
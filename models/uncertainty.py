@@ -0,0 +1,72 @@
+# Неопределённость обученных параметров моделей
+import numpy as np
+
+
+def numerical_hessian(loss, params, args=(), step=1e-5):
+    """
+    Матрица Гессе функции потерь центральными разностями её точного градиента.
+
+    Параметры:
+    - loss: функция потерь, которая возвращает (значение, градиент), как loss_goals моделей.
+    - params: точка, в которой считается матрица (обычно res.x).
+    - args: дополнительные аргументы loss.
+    - step: шаг разностей.
+
+    Возвращает:
+    - hessian: симметричная матрица вторых производных (параметры × параметры).
+    """
+    params = np.asarray(params, dtype=float)
+    hessian = np.empty((len(params), len(params)))
+    for k in range(len(params)):
+        shift = np.zeros_like(params)
+        shift[k] = step
+        hessian[k] = (loss(params + shift, *args)[1] - loss(params - shift, *args)[1]) / (2 * step)
+    return (hessian + hessian.T) / 2
+
+
+def laplace_draws(params, hessian, num_draws, rng):
+    """
+    Наборы параметров из нормального приближения (приближения Лапласа) к апостериорному распределению:
+    среднее — оптимум params, ковариация — обратная матрица Гессе функции потерь.
+
+    Силы команд входят в модели только разностями, поэтому сдвиг всех сил на одно число не меняет
+    функцию потерь, и матрица Гессе вырождена. Обращение идёт только по направлениям с положительной
+    кривизной: вдоль вырожденных направлений параметры не меняются.
+
+    Параметры:
+    - params: оптимальные параметры модели (res.x).
+    - hessian: матрица Гессе функции потерь в params (hessian моделей).
+    - num_draws: количество наборов параметров.
+    - rng: генератор случайных чисел numpy.random.Generator.
+
+    Возвращает:
+    - draws: массив (num_draws × параметры).
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(hessian)
+    curved = eigenvalues > 1e-8 * eigenvalues.max()
+    scales = eigenvectors[:, curved] / np.sqrt(eigenvalues[curved])
+    return np.asarray(params) + rng.standard_normal((num_draws, curved.sum())) @ scales.T
+
+
+def bootstrap_weights(weight, season, rng):
+    """
+    Веса матчей одной бутстрэп-выборки: матчи каждого сезона выбираются с возвращением столько раз,
+    сколько матчей в сезоне, поэтому доля сезонов и их веса в выборке сохраняются.
+
+    Функции потерь моделей линейны по весам матчей, поэтому выборку не нужно собирать из копий
+    матчей: матч, выбранный k раз, получает вес k * weight.
+
+    Параметры:
+    - weight: массив весов матчей (последний массив matches из data_preprocess.load_league).
+    - season: метка сезона каждого матча (match_store.match_seasons). Сезоны различаются по меткам,
+      а не по весам: при коэффициенте затухания 1 веса всех сезонов одинаковы.
+    - rng: генератор случайных чисел numpy.random.Generator.
+
+    Возвращает:
+    - weight: массив весов матчей выборки.
+    """
+    counts = np.zeros(len(weight))
+    for label in np.unique(season):
+        rows = np.flatnonzero(season == label)
+        counts[rows] = rng.multinomial(len(rows), np.full(len(rows), 1 / len(rows)))
+    return counts * weight